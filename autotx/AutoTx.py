@@ -1,25 +1,48 @@
+import asyncio
+from collections import Counter
+from contextvars import ContextVar
+import threading
 from typing import Optional, Callable
 from dataclasses import dataclass
 from typing import Optional
 from crewai import Agent, Crew, Process, Task
 from autotx.utils.PreparedTx import PreparedTx
-from autotx.utils.agent.build_goal import build_goal
-from autotx.utils.agent.define_tasks import define_tasks
-from langchain_core.tools import StructuredTool
+from autotx.utils.TxBundle import TxBundle
+from autotx.utils.agent.agents_information import build_agents_information, build_uncompacted_agents_information
+from autotx.utils.agent.build_goal import build_analyze_prompt_messages, build_goal
+from autotx.utils.agent.define_plan import build_define_plan_messages, define_plan
+from autotx.utils.agent.define_tasks import build_define_tasks_messages, define_tasks
+from autotx.utils.agent.fast_path import build_intent_transactions, parse_intents
+from autotx.utils.agent.prompt_tokens import count_tokens, print_token_report
+from autotx.utils.agent.task_graph import DEFAULT_MAX_PARALLEL_TASKS, chain_tasks_without_context, run_task_graph
 from crewai import Agent, Crew, Process, Task
 from autotx.utils.ethereum import SafeManager
 from autotx.utils.ethereum.constants import NetworkInfo
+from autotx.utils.ethereum.ens_cache import ens_cache, find_ens_names
+from autotx.utils.ethereum.provider_registry import provider_registry
 from autotx.utils.llm import open_ai_llm
+from autotx.utils.llm_telemetry import RunTelemetry, llm_telemetry
 
 @dataclass(kw_only=True)
 class Config:
     verbose: bool
+    max_parallel_tasks: int = DEFAULT_MAX_PARALLEL_TASKS
+    # Simple send, swap and balance prompts are handled without the LLM
+    fast_path: bool = False
+    # "combined" defines the goal and its tasks in one completion, "two_step" uses build_goal and then define_tasks
+    planning: str = "two_step"
+    # Planning responses are streamed, so missing info is reported and tasks are created before the response is complete
+    stream: bool = False
+    # Latency, tokens and cost of the run's LLM calls are printed and saved after every run
+    llm_telemetry: bool = False
+
+# The bundle of the task running in the current thread, so concurrent runs never share one
+current_bundle: ContextVar[Optional[TxBundle]] = ContextVar("current_bundle", default=None)
 
 class AutoTx:
     manager: SafeManager
     agents: list[Agent]
     config: Config = Config(verbose=False)
-    transactions: list[PreparedTx] = []
     network: NetworkInfo
 
     def __init__(
@@ -30,44 +53,199 @@ class AutoTx:
         if config:
             self.config = config
         self.agents = [factory(self) for factory in agent_factories]
+        self.agents_information = build_agents_information(self.agents)
+        self.agents_information_key = agents_information_key(self.agents)
+        # An agent is shared by all runs of this instance, but can only execute one task at a time
+        self.agent_locks = {id(agent): threading.Lock() for agent in self.agents}
+        # Transactions added by code that doesn't run in a task, they are sent with the next run's batch
+        self.outside_bundle = TxBundle()
+        self.outside_bundle_lock = threading.Lock()
+        self.last_run_telemetry: RunTelemetry | None = None
+
+    @property
+    def transactions(self) -> TxBundle:
+        # Tools of a running task write to that task's own bundle, see run_tasks
+        bundle = current_bundle.get()
+        return self.outside_bundle if bundle is None else bundle
 
     def run(self, prompt: str, non_interactive: bool):
+        run_telemetry = None
+        rpc_calls = provider_registry.total_request_counts()
+        try:
+            with llm_telemetry.run(prompt) as run_telemetry:
+                self.run_prompt(prompt, non_interactive)
+        finally:
+            self.report_run_telemetry(run_telemetry, rpc_calls)
+
+    async def arun(self, prompt: str, non_interactive: bool):
+        # Planning, crewAI's kickoff and safe-eth-py are synchronous, the run goes through a worker thread
+        await asyncio.to_thread(self.run, prompt, non_interactive)
+
+    def run_prompt(self, prompt: str, non_interactive: bool):
         print(f"Defining goal for prompt: '{prompt}'")
+
+        self.resolve_ens_names(prompt)
+
+        transactions = self.fast_path_transactions(prompt)
+        if transactions is not None:
+            with llm_telemetry.timing("transactions"):
+                self.manager.send_tx_batch(transactions, require_approval=not non_interactive)
+            return
        
         agents_information = self.get_agents_information()
+        if self.config.verbose:
+            print_token_report(self.get_prompt_token_report(prompt))
 
-        goal = build_goal(prompt, agents_information, self.manager.address, non_interactive)
+        tasks: list[Task]
+        if self.config.planning == "combined":
+            with llm_telemetry.phase("plan"), llm_telemetry.timing("plan"):
+                (goal, tasks) = define_plan(prompt, agents_information, self.manager.address, self.agents, non_interactive, self.config.stream)
+            print(f"Defined tasks for goal: '{goal}'")
+        else:
+            with llm_telemetry.phase("goal"), llm_telemetry.timing("goal"):
+                goal = build_goal(prompt, agents_information, self.manager.address, non_interactive, self.config.stream)
 
-        print(f"Defining tasks for goal: '{goal}'")
-        tasks: list[Task] = define_tasks(goal, agents_information, self.agents)
+            print(f"Defining tasks for goal: '{goal}'")
+            with llm_telemetry.phase("tasks"), llm_telemetry.timing("tasks"):
+                tasks = define_tasks(goal, agents_information, self.agents, self.config.stream)
    
         self.run_for_tasks(tasks, non_interactive)
 
+    def fast_path_transactions(self, prompt: str) -> list[PreparedTx] | None:
+        # Returns None when the prompt has to go through the agents
+        if not self.config.fast_path:
+            return None
+
+        intents = parse_intents(prompt, self.network.tokens)
+        if intents is None:
+            return None
+
+        try:
+            transactions = build_intent_transactions(intents, self.manager, self.network.tokens)
+        except Exception as e:
+            print(f"Prompt could not be handled directly, falling back to the agents: {e}")
+            return None
+
+        print(f"Prompt handled directly: {intents}")
+        return transactions
+
     def run_for_tasks(self, tasks: list[Task], non_interactive: bool):
         print(f"Running tasks...")
-        Crew(
-            agents=self.agents,
+        with llm_telemetry.timing("agents"):
+            transactions = self.run_tasks(tasks)
+
+        with llm_telemetry.timing("transactions"):
+            self.manager.send_tx_batch(transactions, require_approval=not non_interactive)
+
+    def run_tasks(self, tasks: list[Task]) -> list[PreparedTx]:
+        # Tasks whose context is done run concurrently, a task whose context is None waits for the one before it.
+        # Their transactions are added to the run's bundle in task order once all are done. The sealed bundle is what gets sent
+        bundle = TxBundle()
+        task_bundles = [TxBundle() for _ in tasks]
+
+        def run_task(i: int, task: Task):
+            token = current_bundle.set(task_bundles[i])
+            try:
+                with self.agent_lock(task.agent), llm_telemetry.phase(agent_phase(task.agent)):
+                    self.build_crew([task]).kickoff()
+            finally:
+                current_bundle.reset(token)
+
+        chain_tasks_without_context(tasks)
+        run_task_graph(tasks, run_task, self.config.max_parallel_tasks)
+
+        bundle.extend(self.take_outside_transactions())
+        for task_bundle in task_bundles:
+            bundle.extend(task_bundle.seal())
+
+        return bundle.seal()
+
+    def take_outside_transactions(self) -> list[PreparedTx]:
+        with self.outside_bundle_lock:
+            outside_bundle = self.outside_bundle
+            self.outside_bundle = TxBundle()
+        return outside_bundle.seal()
+
+    def report_run_telemetry(self, run_telemetry: RunTelemetry | None, rpc_calls_before: Counter[str]):
+        if run_telemetry is None:
+            return
+
+        # The counters are shared by the process, calls of concurrent runs are counted for each of them
+        rpc_calls = provider_registry.total_request_counts()
+        rpc_calls.subtract(rpc_calls_before)
+        run_telemetry.rpc_calls = {method: count for (method, count) in rpc_calls.items() if count > 0}
+
+        self.last_run_telemetry = run_telemetry
+        if not self.config.llm_telemetry:
+            return
+
+        run_telemetry.print_report()
+        try:
+            print(f"LLM telemetry saved to {run_telemetry.save()}")
+        except Exception as e:
+            print(f"Failed to save LLM telemetry: {e}")
+
+    def agent_lock(self, agent: Agent) -> threading.Lock:
+        # Agents of tasks defined by hand might not be known to this instance yet
+        return self.agent_locks.setdefault(id(agent), threading.Lock())
+
+    def build_crew(self, tasks: list[Task]) -> Crew:
+        return Crew(
+            agents=list({id(task.agent): task.agent for task in tasks}.values()),
             tasks=tasks,
             verbose=self.config.verbose,
             process=Process.sequential,
             function_calling_llm=open_ai_llm,
-        ).kickoff()
+        )
 
-        self.manager.send_tx_batch(self.transactions, require_approval=not non_interactive)
-        self.transactions.clear()
+    def resolve_ens_names(self, prompt: str):
+        # Resolves the ENS names of the prompt up front so the tools find them cached
+        names = find_ens_names(prompt)
+        if not names:
+            return
+        try:
+            ens_cache.resolve_many(self.manager.client, names)
+        except Exception as e:
+            print(f"Failed to resolve ENS names in advance: {e}")
 
     def get_agents_information(self) -> str:
-        agent_descriptions = []
-        for agent in self.agents:
-            agent_default_tools: list[StructuredTool] = agent.tools
-            tools_available = "\n".join(
-                [
-                    f"  - Name: {tool.name}\n  - Description: {tool.description} \n"
-                    for tool in agent_default_tools
-                ]
-            )
-            description = f"Agent name: {agent.name}\nRole: {agent.role}\nTools available:\n{tools_available}"
-            agent_descriptions.append(description)
-
-        agents_information = "\n".join(agent_descriptions)
-        return agents_information
\ No newline at end of file
+        # Built once and only rebuilt when agents or their tools were replaced
+        key = agents_information_key(self.agents)
+        if key != self.agents_information_key:
+            self.agents_information = build_agents_information(self.agents)
+            self.agents_information_key = key
+        return self.agents_information
+
+    def get_prompt_token_report(self, prompt: str) -> dict[str, int]:
+        # Tokens of the planning prompts of a run, with the savings of the compact agents information
+        agents_information = self.get_agents_information()
+        chat_history = f"User: {prompt}"
+        if self.config.planning == "combined":
+            messages = build_define_plan_messages(chat_history, agents_information, self.manager.address)
+            prompts = 1
+        else:
+            # The tasks prompt embeds the goal instead of the chat history, the prompt stands in for it
+            messages = build_analyze_prompt_messages(chat_history, agents_information, self.manager.address)
+            messages += build_define_tasks_messages(prompt, agents_information)
+            prompts = 2
+
+        total_tokens = sum(count_tokens(message["content"]) for message in messages)
+        agents_information_tokens = count_tokens(agents_information) * prompts
+        chat_history_tokens = count_tokens(chat_history) * prompts
+        uncompacted_tokens = count_tokens(build_uncompacted_agents_information(self.agents)) * prompts
+
+        return {
+            "instructions": total_tokens - agents_information_tokens - chat_history_tokens,
+            "chat_history": chat_history_tokens,
+            "agents_information": agents_information_tokens,
+            "total": total_tokens,
+            "agents_information_uncompacted": uncompacted_tokens,
+            "saved": uncompacted_tokens - agents_information_tokens,
+        }
+
+def agents_information_key(agents: list[Agent]) -> tuple:
+    return tuple((id(agent), tuple(id(tool) for tool in agent.tools)) for agent in agents)
+
+def agent_phase(agent: Agent) -> str:
+    # Agents of tasks defined by hand might be plain crewAI agents without a name
+    return f"agent:{getattr(agent, 'name', None) or getattr(agent, 'role', 'unknown')}"
@@ -10,7 +10,6 @@ from autotx.utils.ethereum import (
     build_transfer_erc20,
     get_erc20_balance,
 )
-from autotx.utils.ethereum import load_w3
 from autotx.utils.ethereum.build_transfer_eth import build_transfer_eth
 from web3.constants import ADDRESS_ZERO
 
@@ -38,7 +37,7 @@ class TransferERC20TokenTool(AutoTxTool):
     ) -> str:
         tokens = self.autotx.network.tokens
         token_address = tokens[token.lower()]
-        web3 = load_w3()
+        web3 = self.autotx.manager.client.w3
 
         receiver_addr = ETHAddress(receiver, web3)
         
@@ -66,7 +65,7 @@ class TransferETHTool(AutoTxTool):
     def _run(
         self, amount: float, receiver: str
     ) -> str:
-        web3 = load_w3()
+        web3 = self.autotx.manager.client.w3
       
         receiver_addr = ETHAddress(receiver, web3)
     
@@ -92,7 +91,7 @@ class GetERC20BalanceTool(AutoTxTool):
     def _run(
         self, token: str, owner: str
     ) -> float:
-        web3 = load_w3()
+        web3 = self.autotx.manager.client.w3
         tokens = self.autotx.network.tokens
         token_address = ETHAddress(tokens[token.lower()], web3)
         owner_addr = ETHAddress(owner, web3)
@@ -114,7 +113,7 @@ class GetETHBalanceTool(AutoTxTool):
     def _run(
         self, owner: str
     ) -> float:
-        web3 = load_w3()
+        web3 = self.autotx.manager.client.w3
         owner_addr = ETHAddress(owner, web3)
 
         eth_balance = web3.eth.get_balance(owner_addr.hex)
@@ -1,6 +1,10 @@
+from functools import wraps
+from typing import Any
+from langchain_core.tools import StructuredTool
 from pydantic import ConfigDict, Field
 from crewai_tools import BaseTool
 from autotx.AutoTx import AutoTx
+from autotx.utils.llm_telemetry import llm_telemetry
 
 class AutoTxTool(BaseTool):
     model_config = ConfigDict(arbitrary_types_allowed=True)
@@ -8,4 +12,17 @@ class AutoTxTool(BaseTool):
 
     def __init__(self, autotx: AutoTx):
         super().__init__()
-        self.autotx = autotx
\ No newline at end of file
+        self.autotx = autotx
+
+    def to_langchain(self) -> StructuredTool:
+        # The agents call tools through langchain, their latency is recorded in the telemetry of the run
+        tool = super().to_langchain()
+        run = tool.func
+
+        @wraps(run)
+        def recorded_run(*args: Any, **kwargs: Any) -> Any:
+            with llm_telemetry.tool(self.name):
+                return run(*args, **kwargs)
+
+        tool.func = recorded_run
+        return tool
@@ -1,38 +1,228 @@
+import hashlib
+import os
+import shutil
+import signal
 import subprocess
 import sys
+import time
+import requests
+from dotenv import load_dotenv
+from web3 import Web3
+from autotx.utils.ethereum.cache import cache
 from autotx.utils.ethereum.cached_safe_address import delete_cached_safe_address
+from autotx.utils.ethereum.constants import FORK_PORT
 
 container_name = "autotx_chain_fork"
+image_name = "autotx_chain_fork"
+FORK_START_TIMEOUT = 60
+# The RPC URL can contain an API key, anvil is given this alias of foundry.toml instead, which reads it from CHAIN_RPC_URL.
+# This keeps it out of the command lines of anvil and docker
+FORK_RPC_ALIAS = "autotx_fork"
 
 
-def start():
-    delete_cached_safe_address()
+class ChainFork:
+    # A local anvil fork, run directly when anvil is installed and in docker otherwise.
+    # Forks on different ports are independent, each one has its own container or process
+    port: int
+    fork_block_number: int | None
+    cache_dir: str
+
+    def __init__(self, port: int = FORK_PORT, fork_block_number: int | None = None, cache_dir: str | None = None):
+        self.port = port
+        block_number = os.getenv("FORK_BLOCK_NUMBER")
+        self.fork_block_number = fork_block_number if fork_block_number is not None else int(block_number) if block_number else None
+        self.cache_dir = os.path.abspath(cache_dir or os.getenv("FORK_CACHE_DIR") or os.path.join(cache.folder, "anvil"))
+        self.rpc_url = f"http://localhost:{port}"
+        self.container_name = container_name if port == 8545 else f"{container_name}_{port}"
+        self.process: subprocess.Popen | None = None
+        self.in_container = False
+
+    def start(self) -> bool:
+        # Returns False when a fork was already running on the port
+        if is_ready(self.rpc_url):
+            print(f"Reusing the local fork running at {self.rpc_url}")
+            return False
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if shutil.which("anvil"):
+            self.start_anvil()
+        else:
+            self.start_container()
+
+        deadline = time.monotonic() + int(os.getenv("FORK_START_TIMEOUT") or FORK_START_TIMEOUT)
+        while not is_ready(self.rpc_url):
+            if time.monotonic() > deadline or (self.process and self.process.poll() is not None):
+                self.stop()
+                logs = self.log_path() if self.process else f"docker logs {self.container_name}"
+                sys.exit(f"Local node at {self.rpc_url} did not become ready, see {logs}")
+            time.sleep(0.2)
+
+        return True
+
+    def stop(self):
+        pid = self.read_pid()
+        if pid is not None:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+            os.remove(self.pid_path())
+            if self.process:
+                self.process.wait()
 
-    build = subprocess.run(
-        ["docker", "build", "-t", "autotx_chain_fork", "."], capture_output=True
-    )
+        # The container is kept, so the next start doesn't have to create it again
+        if self.in_container:
+            subprocess.run(["docker", "container", "stop", self.container_name], capture_output=True)
 
-    if build.returncode != 0:
-        sys.exit(
-            "Local node start up has failed. Make sure you have docker desktop installed and running"
+    def anvil_args(self) -> list[str]:
+        # Exits early when CHAIN_RPC_URL is not set, anvil would only report an unknown alias
+        chain_rpc_url()
+        args = ["--fork-url", FORK_RPC_ALIAS, "--host", "0.0.0.0"]
+        # Anvil only caches the forked state on disk when the block is pinned
+        if self.fork_block_number is not None:
+            args += ["--fork-block-number", str(self.fork_block_number)]
+        return args
+
+    def start_anvil(self):
+        # Anvil keeps its RPC cache under $HOME/.foundry/cache, a separate home keeps it in the cache folder
+        self.write_foundry_config()
+        with open(self.log_path(), "w") as log:
+            self.process = subprocess.Popen(
+                ["anvil", "--port", str(self.port)] + self.anvil_args(),
+                stdout=log,
+                stderr=subprocess.STDOUT,
+                cwd=self.cache_dir,
+                env={**os.environ, "HOME": self.cache_dir, "FOUNDRY_CONFIG": self.foundry_config_path()},
+                start_new_session=True,
+            )
+        with open(self.pid_path(), "w") as file:
+            file.write(str(self.process.pid))
+
+    def start_container(self):
+        if not shutil.which("docker"):
+            sys.exit("Local node start up has failed. Install anvil or make sure you have docker desktop installed and running")
+        self.in_container = True
+
+        # Only built once, the image only contains anvil
+        if subprocess.run(["docker", "image", "inspect", image_name], capture_output=True).returncode != 0:
+            build = subprocess.run(["docker", "build", "-t", image_name, "."], capture_output=True)
+            if build.returncode != 0:
+                sys.exit(
+                    "Local node start up has failed. Make sure you have docker desktop installed and running"
+                )
+
+        # A stopped container of a previous run is restarted if it forks the same block of the same RPC URL.
+        # The URL is hashed, it can contain an API key
+        fork_block = str(self.fork_block_number) if self.fork_block_number is not None else "latest"
+        fork = f"{hashlib.sha256(chain_rpc_url().encode()).hexdigest()[:16]}@{fork_block}"
+        inspect = subprocess.run(
+            ["docker", "container", "inspect", "-f", '{{ index .Config.Labels "autotx.fork" }}', self.container_name],
+            capture_output=True,
+            text=True,
         )
+        if inspect.returncode == 0 and inspect.stdout.strip() == fork:
+            subprocess.run(["docker", "container", "start", self.container_name], check=True, capture_output=True)
+            return
+
+        subprocess.run(["docker", "container", "rm", self.container_name, "-f"], capture_output=True)
+        self.write_foundry_config()
+        # CHAIN_RPC_URL is passed on from this process' environment, only its name is on the command line
+        subprocess.run(
+            [
+                "docker",
+                "run",
+                "-d",
+                "--name",
+                self.container_name,
+                "-p",
+                f"{self.port}:8545",
+                "-v",
+                f"{self.cache_dir}:/fork-cache",
+                "-w",
+                "/fork-cache",
+                "-e",
+                "HOME=/fork-cache",
+                "-e",
+                "FOUNDRY_CONFIG=/fork-cache/foundry.toml",
+                "-e",
+                "CHAIN_RPC_URL",
+                "--label",
+                f"autotx.fork={fork}",
+                "--entrypoint",
+                "anvil",
+                image_name,
+            ] + self.anvil_args(),
+            check=True,
+            capture_output=True,
+        )
+
+    def write_foundry_config(self):
+        with open(self.foundry_config_path(), "w") as file:
+            file.write(f'[rpc_endpoints]\n{FORK_RPC_ALIAS} = "${{CHAIN_RPC_URL}}"\n')
+
+    def foundry_config_path(self) -> str:
+        return os.path.join(self.cache_dir, "foundry.toml")
 
-    subprocess.run(
-        [
-            "docker",
-            "run",
-            "-d",
-            "--name",
-            container_name,
-            "-p",
-            "8545:8545",
-            "--env-file",
-            ".env",
-            "autotx_chain_fork",
-        ],
-        check=True,
-    )
+    def read_pid(self) -> int | None:
+        try:
+            with open(self.pid_path(), "r") as file:
+                return int(file.read().strip())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def pid_path(self) -> str:
+        return os.path.join(self.cache_dir, f"anvil-{self.port}.pid")
+
+    def log_path(self) -> str:
+        return os.path.join(self.cache_dir, f"anvil-{self.port}.log")
+
+
+def chain_rpc_url() -> str:
+    rpc_url = os.getenv("CHAIN_RPC_URL")
+    if not rpc_url:
+        sys.exit("CHAIN_RPC_URL is required to start the local fork")
+    return rpc_url
+
+
+def is_ready(rpc_url: str) -> bool:
+    try:
+        response = requests.post(rpc_url, json={"jsonrpc": "2.0", "id": 1, "method": "eth_chainId", "params": []}, timeout=2)
+        return "result" in response.json()
+    except Exception:
+        return False
+
+
+def wait_until_ready(rpc_url: str, timeout: float) -> bool:
+    deadline = time.monotonic() + timeout
+    while not is_ready(rpc_url):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.2)
+    return True
+
+
+def start():
+    load_dotenv()
+    delete_cached_safe_address()
+    ChainFork().start()
 
 
 def stop():
-    subprocess.run(["docker", "container", "rm", container_name, "-f"], check=True)
+    fork = ChainFork()
+    # The fork was started by another process, forks run directly have a pid file and the others run in docker
+    fork.in_container = fork.read_pid() is None and shutil.which("docker") is not None
+    fork.stop()
+
+
+def snapshot(web3: Web3) -> str:
+    # Snapshots of anvil can only be reverted to once, a new one is needed for every revert
+    response = web3.provider.make_request("evm_snapshot", [])
+    if "result" not in response:
+        raise Exception(f"Failed to snapshot the local fork: {response.get('error')}")
+    return response["result"]
+
+
+def revert(web3: Web3, snapshot_id: str):
+    response = web3.provider.make_request("evm_revert", [snapshot_id])
+    if not response.get("result"):
+        raise Exception(f"Failed to revert the local fork to snapshot {snapshot_id}: {response.get('error')}")
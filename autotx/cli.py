@@ -6,7 +6,7 @@ from autotx.utils.ethereum.eth_address import ETHAddress
 from autotx.utils.ethereum.helpers.get_dev_account import get_dev_account
 load_dotenv()
 from autotx.agents import ResearchTokensAgent, SwapTokensAgent, SendTokensAgent
-from autotx.AutoTx import AutoTx
+from autotx.AutoTx import AutoTx, Config
 from autotx.patch import patch_langchain
 from autotx.utils.ethereum.agent_account import get_agent_account, create_agent_account, delete_agent_account
 from autotx.utils.ethereum.SafeManager import SafeManager
@@ -58,17 +58,17 @@ def run(prompt: str, non_interactive: bool):
         print(f"Sent 10 ETH to smart account for testing purposes")
 
     print("Starting smart account balances:")
-    show_address_balances(web3, network_info, manager.address)
+    show_address_balances(client, network_info, manager.address)
 
     autotx = AutoTx(manager, network_info, [
         SendTokensAgent.build_agent_factory(),
         SwapTokensAgent.build_agent_factory(client, manager.address),
         ResearchTokensAgent.build_agent_factory()
-    ], None)
+    ], Config(verbose=False, stream=True, llm_telemetry=True))
     autotx.run(prompt, non_interactive)
 
     print("Final smart account balances:")
-    show_address_balances(web3, network_info, manager.address)
+    show_address_balances(client, network_info, manager.address)
 
 @main.group()
 def agent():
@@ -7,29 +7,57 @@ from autotx.utils.ethereum.helpers.get_dev_account import get_dev_account
 
 load_dotenv()
 
+import os
+import re
+
 import pytest
 from autotx.agents import SendTokensAgent
 from autotx.agents import SwapTokensAgent
-from autotx.AutoTx import AutoTx
-from autotx.chain_fork import stop, start
+from autotx.AutoTx import AutoTx, Config
+from autotx.chain_fork import ChainFork, revert, snapshot
 from autotx.utils.configuration import get_configuration
+from autotx.utils.llm_cassette import llm_cassette
 from autotx.utils.ethereum import (
     SafeManager,
     deploy_mock_erc20,
+    load_w3,
     send_eth,
     transfer_erc20,
 )
 
+@pytest.fixture(scope="session")
+def local_fork():
+    fork = ChainFork()
+    # A fork that was already running on the port, e.g. one started with start-fork, is left running
+    started = fork.start()
+
+    yield
+
+    if started:
+        fork.stop()
+
+# Tests that don't need a fork override this fixture. The fork is only started once, every test
+# runs on a snapshot of it that is reverted afterwards, including what the session fixtures set up
 @pytest.fixture(autouse=True)
-def start_and_stop_local_fork():
-    start()
+def start_and_stop_local_fork(local_fork):
+    web3 = load_w3()
+    snapshot_id = snapshot(web3)
 
     yield
 
-    stop()
+    revert(web3, snapshot_id)
 
-@pytest.fixture()
-def configuration():
+@pytest.fixture(autouse=True)
+def llm_cassettes(request):
+    # Set LLM_CASSETTE_MODE to record or replay the LLM calls of each test, see .env.example
+    tests_folder = os.path.dirname(__file__)
+    test_file = os.path.splitext(os.path.relpath(request.node.path, tests_folder))[0]
+    test_name = re.sub(r"[^\w.-]", "_", request.node.name)
+    with llm_cassette.use(os.path.join(tests_folder, "cassettes", test_file, f"{test_name}.json")):
+        yield
+
+@pytest.fixture(scope="session")
+def session_configuration(local_fork):
     (_, agent, client) = get_configuration()
     dev_account = get_dev_account()
     delete_cached_safe_address()
@@ -41,6 +69,19 @@ def configuration():
     # Send 10 ETH to the smart account for tests
     send_eth(dev_account, manager.address, 10, client.w3)
 
+    # The smart account depends on the agent account of the machine, recordings of its prompts are replayed everywhere
+    llm_cassette.set_placeholder("smart_account_address", manager.address.hex)
+
+    return (dev_account, agent, client, manager)
+
+@pytest.fixture()
+def configuration(session_configuration):
+    (dev_account, agent, client, session_manager) = session_configuration
+
+    # A new manager for every test, the safe nonce tracked by a manager is wrong once the fork is reverted
+    manager = SafeManager.connect(client, session_manager.address, agent)
+    manager.dev_account = dev_account
+
     return (dev_account, agent, client, manager)
 
 @pytest.fixture()
@@ -48,23 +89,32 @@ def auto_tx(configuration):
     (_, _, client, manager) = configuration
     network_info = SUPPORTED_NETWORKS.get(client.w3.eth.chain_id)
 
+    # Benchmarks read the LLM telemetry saved by the runs of every test, see benchmarks.py
+    llm_telemetry = (os.getenv("LLM_TELEMETRY") or "false").lower() in ["1", "true"]
+
     return AutoTx(manager, network_info, [
         SendTokensAgent.build_agent_factory(),
         SwapTokensAgent.build_agent_factory(client, manager.address)
-    ], None)
+    ], Config(verbose=False, llm_telemetry=llm_telemetry))
 
-@pytest.fixture()
-def mock_erc20(configuration) -> ETHAddress:
-    (user, _, client, manager) = configuration
+@pytest.fixture(scope="session")
+def session_mock_erc20(session_configuration) -> ETHAddress:
+    (user, _, client, manager) = session_configuration
     mock_erc20 = deploy_mock_erc20(client.w3, user)
     transfer_tx = transfer_erc20(
         client.w3, mock_erc20, user, manager.address, 100
     )
     manager.wait(transfer_tx)
 
+    return mock_erc20
+
+@pytest.fixture()
+def mock_erc20(configuration, session_mock_erc20) -> ETHAddress:
+    (_, _, client, _) = configuration
+
     chain_id = client.w3.eth.chain_id
     network = SUPPORTED_NETWORKS.get(chain_id)
 
-    network.tokens["ttok"] = mock_erc20.hex
+    network.tokens["ttok"] = session_mock_erc20.hex
 
-    return mock_erc20
+    return session_mock_erc20
@@ -0,0 +1,50 @@
+from autotx.utils.ethereum.cache import Cache
+from autotx.utils.ethereum.ens_cache import EnsCache
+
+VITALIK_ADDRESS = "0xd8dA6BF26964aF9D7eEd9e03E53415D37aA96045"
+
+
+def test_resolve_is_cached(configuration, tmp_path, monkeypatch):
+    (_, _, client, _) = configuration
+    ens_cache = EnsCache(Cache(str(tmp_path)))
+
+    assert ens_cache.resolve(client.w3, "vitalik.eth") == VITALIK_ADDRESS
+
+    # Cached entries are served without touching ENS, also from a new instance reading the persisted cache
+    monkeypatch.setattr(client.w3.ens, "address", lambda name: None)
+
+    assert ens_cache.resolve(client.w3, "vitalik.eth") == VITALIK_ADDRESS
+    assert EnsCache(Cache(str(tmp_path))).resolve(client.w3, "Vitalik.eth") == VITALIK_ADDRESS
+
+
+def test_unresolved_names_are_cached_for_negative_ttl(configuration, tmp_path):
+    (_, _, client, _) = configuration
+    name = "autotx-unregistered-name-for-tests.eth"
+    ens_cache = EnsCache(Cache(str(tmp_path)), negative_ttl=0)
+
+    assert ens_cache.resolve(client.w3, name) is None
+    assert ens_cache.lookup(ens_cache.chain_id(client.w3), name) == (False, None)
+
+    ens_cache.negative_ttl = 60
+    assert ens_cache.lookup(ens_cache.chain_id(client.w3), name) == (True, None)
+
+
+def test_resolve_many(configuration, tmp_path, monkeypatch):
+    (_, _, client, _) = configuration
+    ens_cache = EnsCache(Cache(str(tmp_path)))
+    fallback_names: list[str] = []
+    address = client.w3.ens.address
+
+    def fallback_address(name):
+        fallback_names.append(name)
+        return address(name)
+
+    monkeypatch.setattr(client.w3.ens, "address", fallback_address)
+
+    addresses = ens_cache.resolve_many(client, ["vitalik.eth", "nick.eth", "vitalik.eth"])
+
+    assert addresses["vitalik.eth"] == VITALIK_ADDRESS
+    assert addresses["nick.eth"] is not None
+    # Both names have their own resolver, so they were resolved in the batch
+    assert fallback_names == []
+    assert ens_cache.resolve(client.w3, "nick.eth") == addresses["nick.eth"]
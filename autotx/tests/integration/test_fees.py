@@ -0,0 +1,53 @@
+from autotx.utils.ethereum import send_eth
+from autotx.utils.ethereum.eth_address import ETHAddress
+from autotx.utils.ethereum.fee_oracle import fee_oracle
+
+
+def test_send_eth_with_eip1559_fees(configuration):
+    (user, _, client, _) = configuration
+    receiver = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+
+    fee_oracle.mode = "eip1559"
+    try:
+        tx_hash, receipt = send_eth(user, receiver, 1, client.w3)
+    finally:
+        fee_oracle.mode = None
+
+    tx = client.w3.eth.get_transaction(tx_hash)
+
+    assert receipt["status"] == 1
+    assert tx["type"] == 2
+    assert tx["maxFeePerGas"] >= client.w3.eth.get_block(receipt["blockNumber"])["baseFeePerGas"]
+
+
+def test_send_eth_with_legacy_fees(configuration):
+    (user, _, client, _) = configuration
+    receiver = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+
+    fee_oracle.mode = "legacy"
+    try:
+        tx_hash, receipt = send_eth(user, receiver, 1, client.w3)
+    finally:
+        fee_oracle.mode = None
+
+    tx = client.w3.eth.get_transaction(tx_hash)
+
+    assert receipt["status"] == 1
+    assert tx["type"] == 0
+
+
+def test_safe_tx_with_eip1559_fees(configuration):
+    (_, _, client, manager) = configuration
+    receiver = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+
+    fee_oracle.mode = "eip1559"
+    try:
+        tx_hash = manager.send_tx({"to": receiver.hex, "value": client.w3.to_wei(1, "ether"), "data": b""})
+    finally:
+        fee_oracle.mode = None
+
+    receipt = manager.wait(tx_hash)
+    tx = client.w3.eth.get_transaction(tx_hash)
+
+    assert receipt["status"] == 1
+    assert tx["type"] == 2
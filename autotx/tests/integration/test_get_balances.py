@@ -0,0 +1,28 @@
+from autotx.utils.ethereum import get_balances, get_erc20_balance, get_eth_balance
+from autotx.utils.ethereum.constants import SUPPORTED_NETWORKS
+from autotx.utils.ethereum.eth_address import ETHAddress
+
+
+def test_get_balances_with_multicall(configuration, mock_erc20):
+    (user, _, client, manager) = configuration
+    network_info = SUPPORTED_NETWORKS.get(client.w3.eth.chain_id)
+    user_addr = ETHAddress(user.address, client.w3)
+
+    balances = get_balances(client, network_info, [manager.address, user_addr])
+
+    assert balances[manager.address.hex]["eth"] == get_eth_balance(client.w3, manager.address)
+    assert balances[manager.address.hex]["ttok"] == 100
+    assert balances[user_addr.hex]["ttok"] == get_erc20_balance(client.w3, mock_erc20, user_addr)
+
+
+def test_get_balances_with_batch_request(configuration, mock_erc20, monkeypatch):
+    (_, _, client, manager) = configuration
+    network_info = SUPPORTED_NETWORKS.get(client.w3.eth.chain_id)
+
+    # The client is shared through the provider registry, so it's restored after the test
+    monkeypatch.setattr(client, "multicall", None)
+
+    balances = get_balances(client, network_info, [manager.address])
+
+    assert balances[manager.address.hex]["eth"] == get_eth_balance(client.w3, manager.address)
+    assert balances[manager.address.hex]["ttok"] == 100
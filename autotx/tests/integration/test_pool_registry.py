@@ -0,0 +1,69 @@
+from gnosis.eth.oracles.uniswap_v3 import UniswapV3Oracle
+
+from autotx.utils.ethereum.cache import Cache
+from autotx.utils.ethereum.constants import SUPPORTED_NETWORKS
+from autotx.utils.ethereum.uniswap import pool_registry as pool_registry_module
+from autotx.utils.ethereum.uniswap.pool_registry import PoolRegistry
+
+
+def count_queries(monkeypatch) -> list[tuple[str, str]]:
+    queries: list[tuple[str, str]] = []
+    query_fee_tiers = pool_registry_module.query_fee_tiers
+
+    def counting_query_fee_tiers(uniswap, pairs):
+        queries.extend(pairs)
+        return query_fee_tiers(uniswap, pairs)
+
+    monkeypatch.setattr(pool_registry_module, "query_fee_tiers", counting_query_fee_tiers)
+    return queries
+
+
+def test_fee_tiers_are_cached_per_pair(configuration, tmp_path, monkeypatch):
+    (_, _, client, _) = configuration
+    tokens = SUPPORTED_NETWORKS.get(client.w3.eth.chain_id).tokens
+    uniswap = UniswapV3Oracle(client)
+    queries = count_queries(monkeypatch)
+
+    registry = PoolRegistry(Cache(str(tmp_path)))
+    fee_tiers = registry.fee_tiers(uniswap, tokens["weth"], tokens["usdc"])
+
+    assert 500 in fee_tiers and 3000 in fee_tiers
+    assert registry.fee_tiers(uniswap, tokens["usdc"], tokens["weth"]) == fee_tiers
+    assert len(queries) == 1
+
+    # A new registry reads the persisted entries instead of querying again
+    assert PoolRegistry(Cache(str(tmp_path))).fee_tiers(uniswap, tokens["weth"], tokens["usdc"]) == fee_tiers
+    assert len(queries) == 1
+
+
+def test_stale_fee_tiers_are_used_when_refresh_fails(configuration, tmp_path, monkeypatch):
+    (_, _, client, _) = configuration
+    tokens = SUPPORTED_NETWORKS.get(client.w3.eth.chain_id).tokens
+    uniswap = UniswapV3Oracle(client)
+
+    registry = PoolRegistry(Cache(str(tmp_path)), ttl=0)
+    fee_tiers = registry.fee_tiers(uniswap, tokens["weth"], tokens["usdc"])
+
+    def failing_query_fee_tiers(uniswap, pairs):
+        raise Exception("Connection refused")
+
+    monkeypatch.setattr(pool_registry_module, "query_fee_tiers", failing_query_fee_tiers)
+
+    assert registry.fee_tiers(uniswap, tokens["weth"], tokens["usdc"]) == fee_tiers
+
+
+def test_fee_tiers_for_pairs_are_queried_together(configuration, tmp_path, monkeypatch):
+    (_, _, client, _) = configuration
+    tokens = SUPPORTED_NETWORKS.get(client.w3.eth.chain_id).tokens
+    uniswap = UniswapV3Oracle(client)
+    queries = count_queries(monkeypatch)
+
+    registry = PoolRegistry(Cache(str(tmp_path)))
+    registry.fee_tiers(uniswap, tokens["weth"], tokens["usdc"])
+    fee_tiers = registry.fee_tiers_for_pairs(
+        uniswap, [(tokens["weth"], tokens["usdc"]), (tokens["wbtc"], tokens["weth"]), (tokens["dai"], tokens["usdc"])]
+    )
+
+    assert len(fee_tiers) == 3
+    # Only the two pairs that were not cached yet were queried
+    assert len(queries) == 3
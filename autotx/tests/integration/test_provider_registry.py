@@ -0,0 +1,74 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+
+import pytest
+
+from autotx.utils.ethereum.provider_registry import ProviderRegistry
+
+RPC_RESULTS = {"eth_chainId": "0x1", "eth_blockNumber": "0x10", "eth_getBalance": "0x0"}
+
+class StubRpcHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        if isinstance(payload, list):
+            response = [self.result(request) for request in payload]
+        else:
+            response = self.result(payload)
+
+        body = json.dumps(response).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def result(self, request: dict) -> dict:
+        return {"jsonrpc": "2.0", "id": request["id"], "result": RPC_RESULTS[request["method"]]}
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+@pytest.fixture()
+def rpc_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubRpcHandler)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+
+    server.shutdown()
+
+def test_client_is_shared_per_rpc_url(rpc_url):
+    registry = ProviderRegistry(pool_size=2)
+
+    client = registry.get_client(rpc_url)
+
+    assert registry.get_client(rpc_url) is client
+    assert registry.get_web3(rpc_url) is client.w3
+    assert client.http_session.get_adapter(rpc_url)._pool_maxsize == 2
+
+    registry.close()
+
+def test_request_counters(rpc_url):
+    registry = ProviderRegistry()
+    web3 = registry.get_web3(rpc_url)
+    registry.reset_counters()
+
+    web3.eth.block_number
+    web3.eth.get_balance("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1")
+    list(registry.get_client(rpc_url).raw_batch_request([
+        {"jsonrpc": "2.0", "method": "eth_getBalance", "params": ["0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", "latest"], "id": 0},
+        {"jsonrpc": "2.0", "method": "eth_getBalance", "params": ["0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", "latest"], "id": 1},
+    ]))
+
+    assert registry.request_counts(rpc_url) == {"eth_blockNumber": 1, "eth_getBalance": 3}
+    assert registry.http_requests[rpc_url] == 3
+
+    registry.close()
@@ -0,0 +1,58 @@
+from gnosis.eth.oracles.uniswap_v3 import UniswapV3Oracle
+
+from autotx.utils.ethereum.constants import SUPPORTED_NETWORKS
+from autotx.utils.ethereum.uniswap.route_finder import encode_path, find_best_route, find_candidate_routes
+
+
+def test_encode_path():
+    weth = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+    usdc = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+    dai = "0x6B175474E89094C44Da98b954EedeAC495271d0F"
+
+    path = encode_path([weth, usdc, dai], [500, 100])
+
+    assert path.hex() == weth[2:].lower() + "0001f4" + usdc[2:].lower() + "000064" + dai[2:].lower()
+
+
+def test_find_best_route(configuration):
+    (_, _, client, _) = configuration
+    tokens = SUPPORTED_NETWORKS.get(client.w3.eth.chain_id).tokens
+    uniswap = UniswapV3Oracle(client)
+    wbtc = client.w3.to_checksum_address(tokens["wbtc"])
+    dai = client.w3.to_checksum_address(tokens["dai"])
+
+    route = find_best_route(uniswap, wbtc, dai, 10**7, True)
+
+    assert route.tokens[0] == wbtc and route.tokens[-1] == dai
+    assert len(route.fees) == len(route.tokens) - 1
+    assert route.amount_in == 10**7
+    assert route.amount_out > 0
+
+    route = find_best_route(uniswap, wbtc, dai, 1000 * 10**18, False)
+
+    assert route.tokens[0] == wbtc and route.tokens[-1] == dai
+    assert route.amount_out == 1000 * 10**18
+    assert route.amount_in > 0
+
+
+def test_find_candidate_routes():
+    token_in = "0x0000000000000000000000000000000000000001"
+    hub = "0x0000000000000000000000000000000000000002"
+    token_out = "0x0000000000000000000000000000000000000003"
+
+    candidates = find_candidate_routes(
+        token_in,
+        token_out,
+        [hub],
+        {
+            (token_in, token_out): [3000],
+            (token_in, hub): [500, 3000],
+            (hub, token_out): [100],
+        },
+    )
+
+    assert candidates == [
+        ([token_in, token_out], [3000]),
+        ([token_in, hub, token_out], [500, 100]),
+        ([token_in, hub, token_out], [3000, 100]),
+    ]
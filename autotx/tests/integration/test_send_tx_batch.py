@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from autotx.utils.PreparedTx import PreparedTx
+from autotx.utils.ethereum import build_transfer_eth, get_erc20_balance, get_eth_balance
+from autotx.utils.ethereum.erc20_abi import ERC20_ABI
+from autotx.utils.ethereum.eth_address import ETHAddress
+
+
+def test_send_tx_batch_as_multisend(configuration):
+    (_, _, client, manager) = configuration
+
+    receiver_one = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+    receiver_two = ETHAddress("0x20f8Bf6a479F320EaD074411a4b0e7944eA8c9C1", client.w3)
+
+    txs = [
+        PreparedTx("Transfer 1 ETH", build_transfer_eth(client.w3, manager.address, receiver_one, 1)),
+        PreparedTx("Transfer 2 ETH", build_transfer_eth(client.w3, manager.address, receiver_two, 2)),
+    ]
+
+    nonce = manager.nonce()
+
+    manager.send_tx_batch(txs, require_approval=False)
+
+    assert manager.nonce() == nonce + 1
+    assert get_eth_balance(client.w3, receiver_one) == 1
+    assert get_eth_balance(client.w3, receiver_two) == 2
+
+
+def test_send_tx_batch_without_multisend(configuration):
+    (_, _, client, manager) = configuration
+
+    receiver = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+
+    txs = [
+        PreparedTx("Transfer 1 ETH", build_transfer_eth(client.w3, manager.address, receiver, 1)),
+        PreparedTx("Transfer 1 ETH", build_transfer_eth(client.w3, manager.address, receiver, 1)),
+    ]
+
+    manager.use_multisend = False
+    nonce = manager.nonce()
+
+    manager.send_tx_batch(txs, require_approval=False)
+
+    assert manager.nonce() == nonce + 2
+    assert get_eth_balance(client.w3, receiver) == 2
+
+
+def test_send_tx_batch_pipeline_reports_revert(configuration):
+    (_, _, client, manager) = configuration
+
+    receiver = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+
+    # Each transfer fits in the balance on its own, but not after the first one is executed
+    txs = [
+        PreparedTx("Transfer 9 ETH", build_transfer_eth(client.w3, manager.address, receiver, 9)),
+        PreparedTx("Transfer 5 ETH", build_transfer_eth(client.w3, manager.address, receiver, 5)),
+    ]
+
+    manager.use_multisend = False
+    start_nonce = manager.nonce()
+
+    results = manager.execute_tx_pipeline(manager.group_txs(txs), start_nonce)
+
+    assert [result.status for result in results] == ["success", "reverted"]
+    assert get_eth_balance(client.w3, receiver) == 9
+
+
+def test_send_tx_batch_with_dependent_transactions(configuration, mock_erc20):
+    (_, _, client, manager) = configuration
+
+    receiver = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+    erc20 = client.w3.eth.contract(address=mock_erc20.hex, abi=ERC20_ABI)
+    amount = 10 * 10 ** erc20.functions.decimals().call()
+
+    # The transferFrom can only be estimated once the approval is mined
+    txs = [
+        PreparedTx("Approve 10 TTOK", erc20.functions.approve(manager.address.hex, amount).build_transaction({"gas": None})),
+        PreparedTx(
+            "Transfer 10 TTOK",
+            erc20.functions.transferFrom(manager.address.hex, receiver.hex, amount).build_transaction({"gas": None}),
+        ),
+    ]
+
+    manager.use_multisend = False
+    nonce = manager.nonce()
+
+    assert manager.send_tx_batch(txs, require_approval=False)
+    assert manager.nonce() == nonce + 2
+    assert get_erc20_balance(client.w3, mock_erc20, receiver) == 10
+
+
+def test_concurrent_tx_batches(configuration):
+    (_, _, client, manager) = configuration
+
+    receiver_one = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+    receiver_two = ETHAddress("0x20f8Bf6a479F320EaD074411a4b0e7944eA8c9C1", client.w3)
+
+    nonce = manager.nonce()
+
+    batches = [
+        [PreparedTx("Transfer 1 ETH", build_transfer_eth(client.w3, manager.address, receiver_one, 1))],
+        [PreparedTx("Transfer 2 ETH", build_transfer_eth(client.w3, manager.address, receiver_two, 2))],
+    ]
+    # Concurrent runs send their batches from their own threads, see AutoTx.arun
+    with ThreadPoolExecutor() as executor:
+        results = list(executor.map(lambda txs: manager.send_tx_batch(txs, require_approval=False), batches))
+
+    assert results == [True, True]
+    assert manager.nonce() == nonce + 2
+    assert get_eth_balance(client.w3, receiver_one) == 1
+    assert get_eth_balance(client.w3, receiver_two) == 2
+
+
+def test_send_tx_batch_pipeline_raises_connection_errors(configuration, monkeypatch):
+    (_, _, client, manager) = configuration
+
+    receiver = ETHAddress("0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1", client.w3)
+    txs = [
+        PreparedTx("Transfer 1 ETH", build_transfer_eth(client.w3, manager.address, receiver, 1)),
+        PreparedTx("Transfer 2 ETH", build_transfer_eth(client.w3, manager.address, receiver, 2)),
+    ]
+    build_tx_group = manager.build_tx_group
+
+    def failing_build_tx_group(group, safe_nonce):
+        if safe_nonce > start_nonce:
+            raise requests.exceptions.ConnectionError("Connection refused")
+        return build_tx_group(group, safe_nonce)
+
+    manager.use_multisend = False
+    start_nonce = manager.nonce()
+    monkeypatch.setattr(manager, "build_tx_group", failing_build_tx_group)
+
+    # Not mistaken for a transaction that depends on the one before it, nothing is sent
+    with pytest.raises(requests.exceptions.ConnectionError):
+        manager.execute_tx_pipeline(manager.group_txs(txs), start_nonce)
+
+    assert manager.nonce() == start_nonce
+    assert get_eth_balance(client.w3, receiver) == 0
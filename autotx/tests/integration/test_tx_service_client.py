@@ -0,0 +1,92 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+
+import pytest
+from eth_account import Account
+from eth_typing import URI
+from gnosis.eth import EthereumClient, EthereumNetwork
+from gnosis.eth.constants import NULL_ADDRESS
+from gnosis.safe import SafeTx
+
+from autotx.utils.ethereum.TxServiceClient import TxServiceClient
+
+SAFE_ADDRESS = "0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1"
+
+class StubTxService(ThreadingHTTPServer):
+    def __init__(self, failures_per_nonce: int):
+        super().__init__(("127.0.0.1", 0), StubTxServiceHandler)
+        self.failures_per_nonce = failures_per_nonce
+        self.attempts: dict[int, int] = {}
+        self.posted_nonces: list[int] = []
+        self.lock = Lock()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/"
+
+class StubTxServiceHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        nonce = payload["nonce"]
+
+        with self.server.lock:
+            attempts = self.server.attempts.get(nonce, 0) + 1
+            self.server.attempts[nonce] = attempts
+            failed = attempts <= self.server.failures_per_nonce
+            if not failed:
+                self.server.posted_nonces.append(nonce)
+
+        self.send_response(503 if failed else 201)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+# These tests only need a local HTTP server, not a chain fork
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+@pytest.fixture()
+def stub_tx_service():
+    server = StubTxService(failures_per_nonce=1)
+    thread = Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+def build_safe_txs(count: int) -> list[SafeTx]:
+    client = EthereumClient(URI("http://127.0.0.1:1"))
+    signer = Account.create()
+    safe_txs = []
+    for nonce in range(count):
+        safe_tx = SafeTx(
+            client, SAFE_ADDRESS, SAFE_ADDRESS, 0, b"", 0, 0, 0, 0, NULL_ADDRESS, NULL_ADDRESS,
+            safe_nonce=nonce, safe_version="1.3.0", chain_id=1,
+        )
+        safe_tx.sign(signer.key.hex())
+        safe_txs.append(safe_tx)
+
+    return safe_txs
+
+def test_post_transactions_retries_on_5xx(stub_tx_service):
+    client = TxServiceClient(EthereumNetwork.MAINNET, base_url=stub_tx_service.url, backoff_factor=0)
+
+    client.post_transactions(build_safe_txs(5))
+
+    assert sorted(stub_tx_service.posted_nonces) == [0, 1, 2, 3, 4]
+    assert all(attempts == 2 for attempts in stub_tx_service.attempts.values())
+
+def test_post_transactions_in_nonce_order(stub_tx_service):
+    client = TxServiceClient(EthereumNetwork.MAINNET, base_url=stub_tx_service.url, backoff_factor=0, require_nonce_order=True)
+
+    client.post_transactions(list(reversed(build_safe_txs(5))))
+
+    assert stub_tx_service.posted_nonces == [0, 1, 2, 3, 4]
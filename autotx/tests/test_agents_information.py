@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+import pytest
+
+from autotx.agents import SendTokensAgent, SwapTokensAgent
+from autotx.AutoTx import AutoTx
+from autotx.utils.ethereum.constants import SUPPORTED_NETWORKS
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+@pytest.fixture()
+def auto_tx() -> AutoTx:
+    # Building agents and prompts only needs the address of the smart account
+    manager = SimpleNamespace(address="0x0000000000000000000000000000000000000001")
+    return AutoTx(manager, SUPPORTED_NETWORKS[1], [
+        SendTokensAgent.build_agent_factory(),
+        SwapTokensAgent.build_agent_factory(None, manager.address),
+    ], None)
+
+def test_agents_information_is_compact(auto_tx):
+    agents_information = auto_tx.get_agents_information()
+
+    assert "  " not in agents_information
+    assert "Agent name: send-tokens" in agents_information
+    assert "Agent name: swap-tokens" in agents_information
+    assert "- Transfer ERC20 token(amount: 'number', receiver: 'string', token: 'string') - Prepares" in agents_information
+
+    report = auto_tx.get_prompt_token_report("Send 10 USDC to vitalik.eth")
+
+    assert report["saved"] > 0
+    assert report["total"] == report["instructions"] + report["chat_history"] + report["agents_information"]
+
+def test_agents_information_is_rebuilt_when_agents_change(auto_tx):
+    agents_information = auto_tx.get_agents_information()
+
+    assert auto_tx.get_agents_information() is agents_information
+
+    auto_tx.agents = auto_tx.agents[:1]
+
+    assert "swap-tokens" not in auto_tx.get_agents_information()
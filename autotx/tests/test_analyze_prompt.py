@@ -1,5 +1,6 @@
 from autotx.patch import patch_langchain
 from autotx.utils.agent.build_goal import DefineGoalResponse, analyze_user_prompt
+from autotx.utils.agent.define_plan import analyze_user_prompt_with_tasks
 from autotx.utils.ethereum.helpers.get_dev_account import get_dev_account
 
 patch_langchain()
@@ -22,4 +23,11 @@ def test_not_yet_supported_goal(auto_tx):
 
 def analyze_prompt(prompt, auto_tx) -> DefineGoalResponse:
     agents_information = auto_tx.get_agents_information()
-    return analyze_user_prompt(prompt, agents_information, get_dev_account().address) # We're using dev account but any address would work
\ No newline at end of file
+    return analyze_user_prompt(prompt, agents_information, get_dev_account().address) # We're using dev account but any address would work
+def test_plan_with_missing_amount(auto_tx):
+    (response, tasks, sanitized_tasks) = analyze_user_prompt_with_tasks(
+        "User: Send ETH to 0x90F8bf6A479f320ead074411a4B0e7944Ea8c9C1", auto_tx.get_agents_information(), get_dev_account().address, auto_tx.agents
+    )
+    assert response.type == "missing_info"
+    assert tasks is None
+    assert sanitized_tasks is None
@@ -0,0 +1,122 @@
+import json
+import os
+import socket
+import stat
+import sys
+
+import pytest
+
+from autotx.chain_fork import FORK_RPC_ALIAS, ChainFork, is_ready
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+# Stands in for anvil, answers eth_chainId on the given port and writes how it was started
+FAKE_ANVIL = """#!{python}
+import json, os, sys
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+args = sys.argv[1:]
+with open(os.path.join(os.environ["HOME"], "started.json"), "w") as file:
+    json.dump({{"args": args, "rpc_url": os.environ["CHAIN_RPC_URL"], "config": os.environ["FOUNDRY_CONFIG"]}}, file)
+
+class Handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        body = json.dumps({{"jsonrpc": "2.0", "id": request["id"], "result": "0x1"}}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+HTTPServer(("127.0.0.1", int(args[args.index("--port") + 1])), Handler).serve_forever()
+"""
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Stands in for docker, only writes how it was called
+FAKE_DOCKER = """#!{python}
+import json, sys
+
+with open({calls_path!r}, "a") as file:
+    file.write(json.dumps(sys.argv[1:]) + "\\n")
+"""
+
+@pytest.fixture()
+def fake_anvil(tmp_path, monkeypatch):
+    bin_path = tmp_path / "bin"
+    bin_path.mkdir()
+    anvil = bin_path / "anvil"
+    anvil.write_text(FAKE_ANVIL.format(python=sys.executable))
+    anvil.chmod(anvil.stat().st_mode | stat.S_IEXEC)
+    docker = bin_path / "docker"
+    docker.write_text(FAKE_DOCKER.format(python=sys.executable, calls_path=str(tmp_path / "docker_calls.jsonl")))
+    docker.chmod(docker.stat().st_mode | stat.S_IEXEC)
+
+    monkeypatch.setenv("PATH", f"{bin_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("CHAIN_RPC_URL", "http://mainnet.example")
+
+def test_forks_on_different_ports(fake_anvil, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    forks = [ChainFork(port=free_port(), fork_block_number=19000000, cache_dir=cache_dir) for _ in range(2)]
+
+    try:
+        for fork in forks:
+            fork.start()
+            assert is_ready(fork.rpc_url)
+    finally:
+        for fork in forks:
+            fork.stop()
+
+    # The block is pinned and anvil's RPC cache is kept in the cache folder
+    with open(os.path.join(cache_dir, "started.json")) as file:
+        started = json.load(file)
+    args = started["args"]
+    assert args[args.index("--fork-block-number") + 1] == "19000000"
+    # The RPC URL is read by anvil from the environment through the alias of its config, not from its arguments
+    assert args[args.index("--fork-url") + 1] == FORK_RPC_ALIAS
+    assert started["rpc_url"] == "http://mainnet.example"
+    with open(started["config"]) as file:
+        assert f'{FORK_RPC_ALIAS} = "${{CHAIN_RPC_URL}}"' in file.read()
+
+    for fork in forks:
+        assert not os.path.exists(fork.pid_path())
+
+def test_running_fork_is_reused(fake_anvil, tmp_path):
+    port = free_port()
+    fork = ChainFork(port=port, cache_dir=str(tmp_path / "cache"))
+    fork.start()
+    try:
+        pid = fork.read_pid()
+        ChainFork(port=port, cache_dir=str(tmp_path / "cache")).start()
+
+        assert fork.read_pid() == pid
+    finally:
+        fork.stop()
+
+def test_forks_run_directly_are_stopped_without_docker(fake_anvil, tmp_path):
+    fork = ChainFork(port=free_port(), cache_dir=str(tmp_path / "cache"))
+    fork.start()
+    fork.stop()
+
+    assert not is_ready(fork.rpc_url)
+    assert not os.path.exists(tmp_path / "docker_calls.jsonl")
+
+def test_rpc_url_is_not_on_the_docker_command_line(fake_anvil, tmp_path):
+    fork = ChainFork(port=free_port(), cache_dir=str(tmp_path / "cache"))
+    os.makedirs(fork.cache_dir)
+
+    fork.start_container()
+
+    with open(tmp_path / "docker_calls.jsonl") as file:
+        calls = [json.loads(line) for line in file]
+    run = next(call for call in calls if call[0] == "run")
+    assert "mainnet.example" not in " ".join(arg for call in calls for arg in call)
+    assert run[run.index("--fork-url") + 1] == FORK_RPC_ALIAS
+    assert "CHAIN_RPC_URL" in run
@@ -0,0 +1,30 @@
+import json
+
+import pytest
+
+from autotx.utils.agent.define_plan import parse_define_plan_response
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+def test_goal_with_tasks():
+    task = {"task": "Send 1 ETH", "agent": "send-tokens", "expected_output": "Sent", "context": None, "extra_information": None}
+    content = "Plan: " + json.dumps({"type": "goal", "goal": "Send 1 ETH", "tasks": [task]})
+
+    (response, tasks) = parse_define_plan_response(content)
+
+    assert response.type == "goal"
+    assert response.goal == "Send 1 ETH"
+    assert json.loads(tasks) == {"tasks": [task]}
+
+def test_missing_info_has_no_tasks():
+    (response, tasks) = parse_define_plan_response(json.dumps({"type": "missing_info", "message": "Amount is missing"}))
+
+    assert response.type == "missing_info"
+    assert tasks is None
+
+def test_goal_without_tasks_raises():
+    with pytest.raises(Exception, match="no tasks"):
+        parse_define_plan_response(json.dumps({"type": "goal", "goal": "Send 1 ETH", "tasks": []}))
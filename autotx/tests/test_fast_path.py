@@ -0,0 +1,78 @@
+import pytest
+
+from autotx.utils.agent.fast_path import BalanceIntent, SendIntent, SwapIntent, parse_intents
+from autotx.utils.ethereum.constants import NATIVE_TOKEN_ADDRESS
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+TOKENS = {
+    "eth": NATIVE_TOKEN_ADDRESS,
+    "usdc": "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48",
+    "wbtc": "0x2260FAC5E5542a773Aa44fBCfeDf7C193bc2C599",
+    "ttok": "0x5FbDB2315678afecb367f032d93F642f64180aa3",
+}
+RECEIVER = "0x90F8bf6A479f320ead074411a4B0e7944Ea8c9C1"
+
+def test_send():
+    prompts = [
+        f"Send 10 TTOK to {RECEIVER}",
+        f"Send 10 TTOK coins to the Ethereum address {RECEIVER}",
+        f"Move 10 TTOK to the following address: {RECEIVER}",
+        f"Execute a transaction of 10 TTOK to address {RECEIVER}",
+    ]
+
+    for prompt in prompts:
+        assert parse_intents(prompt, TOKENS) == [SendIntent(10, "ttok", RECEIVER)], prompt
+
+def test_multiple_sends():
+    intents = parse_intents(f"Execute two transactions: send 10 TTOK to {RECEIVER} and 1,000 USDC to vitalik.eth", TOKENS)
+
+    assert intents == [SendIntent(10, "ttok", RECEIVER), SendIntent(1000, "usdc", "vitalik.eth")]
+
+def test_swap():
+    buy_usdc = [SwapIntent(100, "eth", "usdc", exact_input=False)]
+
+    assert parse_intents("Buy 100 USDC with ETH", TOKENS) == buy_usdc
+    assert parse_intents("Buy 100 USDC for ETH", TOKENS) == buy_usdc
+    assert parse_intents("Swap ETH for 100 units of USDC", TOKENS) == buy_usdc
+    assert parse_intents("Use ETH to acquire 100 USDC", TOKENS) == buy_usdc
+    assert parse_intents("Sell 1 ETH for USDC", TOKENS) == [SwapIntent(1, "eth", "usdc", exact_input=True)]
+
+def test_swap_and_send():
+    intents = parse_intents(
+        f"Swap ETH to 0.05 WBTC, then, swap WBTC to 1000 USDC and send 50 USDC to {RECEIVER}", TOKENS
+    )
+
+    assert intents == [
+        SwapIntent(0.05, "eth", "wbtc", exact_input=False),
+        SwapIntent(1000, "wbtc", "usdc", exact_input=False),
+        SendIntent(50, "usdc", RECEIVER),
+    ]
+
+def test_balance():
+    assert parse_intents("What is my USDC balance?", TOKENS) == [BalanceIntent("usdc", None)]
+    assert parse_intents(f"Check the ETH balance of {RECEIVER}", TOKENS) == [BalanceIntent("eth", RECEIVER)]
+
+def test_falls_back_when_not_sure():
+    prompts = [
+        "Hey",
+        "Send 1 ETH",
+        f"Send ETH to {RECEIVER}",
+        f"Send 10 USDC from {RECEIVER}",
+        f"Send all USDC to {RECEIVER}",
+        f"Send 10 USDC to {RECEIVER} if the price of ETH is above 3000",
+        "Swap 10% of my ETH for USDC",
+        "Convert ETH to 0.05 WBTC, subsequently exchange 0.05 WBTC for 1000 USDC",
+        f"Send 10 DOGE to {RECEIVER}",
+        f"Send 10 USDC to {RECEIVER} and swap the rest for ETH",
+        f"Never send 10 USDC to {RECEIVER}",
+        f"Please don’t send 10 USDC to {RECEIVER}",
+        f"Send 10 USDC to {RECEIVER} tomorrow",
+        f"Send 10 USDC to {RECEIVER} minus fees",
+    ]
+
+    for prompt in prompts:
+        assert parse_intents(prompt, TOKENS) is None, prompt
@@ -0,0 +1,38 @@
+import pytest
+
+from autotx.utils.agent.json_stream import JsonStreamParser
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+def feed_in_chunks(text: str, chunk_size: int) -> list:
+    parser = JsonStreamParser()
+    events = []
+    for i in range(0, len(text), chunk_size):
+        events.extend(parser.feed(text[i:i + chunk_size]))
+    return events
+
+def test_fields_and_items():
+    text = '{"type": "goal", "goal": "Send \\"10\\" USDC", "tasks": [{"task": "a", "context": [0]}, {"task": "b {x}"}]}'
+
+    for chunk_size in [1, 3, len(text)]:
+        assert feed_in_chunks(text, chunk_size) == [
+            ("field", "type", "goal"),
+            ("field", "goal", 'Send "10" USDC'),
+            ("item", "tasks", {"task": "a", "context": [0]}),
+            ("item", "tasks", {"task": "b {x}"}),
+            ("end", None, None),
+        ]
+
+def test_type_is_known_before_the_end():
+    parser = JsonStreamParser()
+
+    assert parser.feed('```json\n{"type": "missing_info", "mess') == [("field", "type", "missing_info")]
+    assert parser.feed('age": "Amount"}\n```') == [("field", "message", "Amount"), ("end", None, None)]
+
+def test_nested_values_are_not_fields():
+    events = feed_in_chunks('{"a": {"b": "c"}, "d": ["e"], "f": 1, "g": "h"}', 2)
+
+    assert events == [("field", "g", "h"), ("end", None, None)]
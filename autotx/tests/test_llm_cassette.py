@@ -0,0 +1,137 @@
+import json
+
+import httpx
+from openai import OpenAI
+import pytest
+
+from autotx.utils.llm_cassette import llm_cassette
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+@pytest.fixture(autouse=True)
+def llm_cassettes():
+    yield
+
+class FakeOpenAI:
+    # Answers every request with the next content, as JSON or as server sent events when streamed
+    def __init__(self, contents: list[str]):
+        self.contents = contents
+        self.requests = 0
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        content = self.contents[self.requests]
+        self.requests += 1
+
+        base = {"id": f"chatcmpl-{self.requests}", "created": 0, "model": body["model"]}
+        if not body.get("stream"):
+            return httpx.Response(200, json={
+                **base,
+                "object": "chat.completion",
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15},
+            })
+
+        events = [
+            {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": content[i:i + 4]}, "finish_reason": None}]}
+            for i in range(0, len(content), 4)
+        ]
+        events.append({**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        text = "".join(f"data: {json.dumps(event)}\n\n" for event in events) + "data: [DONE]\n\n"
+        return httpx.Response(200, text=text, headers={"Content-Type": "text/event-stream"})
+
+def build_client(server: FakeOpenAI) -> OpenAI:
+    return OpenAI(base_url="http://fake-openai/v1", api_key="test", http_client=httpx.Client(transport=httpx.MockTransport(server)))
+
+def complete(client: OpenAI, prompt: str, stream: bool = False) -> str:
+    response = client.chat.completions.create(
+        model="gpt-4-turbo-preview", messages=[{"role": "user", "content": prompt}], stream=stream
+    )
+    if stream:
+        return "".join(chunk.choices[0].delta.content or "" for chunk in response)
+    return response.choices[0].message.content
+
+def test_record_and_replay(tmp_path):
+    path = str(tmp_path / "cassette.json")
+    server = FakeOpenAI(['{"type": "goal"}', '{"tasks": []}'])
+    client = build_client(server)
+
+    with llm_cassette.use(path, mode="record"):
+        assert complete(client, "Send 1 ETH") == '{"type": "goal"}'
+        assert complete(client, "Define tasks") == '{"tasks": []}'
+
+    # Indentation of the prompt doesn't matter, and a non-streamed recording can be replayed as a stream
+    with llm_cassette.use(path, mode="replay"):
+        assert complete(client, "  Send 1\n   ETH") == '{"type": "goal"}'
+        assert complete(client, "Define tasks", stream=True) == '{"tasks": []}'
+
+    assert server.requests == 2
+
+def test_replay_fails_on_drift(tmp_path):
+    path = str(tmp_path / "cassette.json")
+    server = FakeOpenAI(['{"type": "goal"}'])
+    client = build_client(server)
+
+    with llm_cassette.use(path, mode="record"):
+        complete(client, "Send 1 ETH to vitalik.eth")
+
+    with llm_cassette.use(path, mode="replay"):
+        with pytest.raises(Exception, match="does not match") as error:
+            complete(client, "Send 2 ETH to vitalik.eth")
+    assert "Send 2 ETH" in str(error.value) and "Send 1 ETH" in str(error.value)
+    # Replay never calls the API
+    assert server.requests == 1
+
+def test_placeholders_are_replayed_with_the_current_value(tmp_path, monkeypatch):
+    path = str(tmp_path / "cassette.json")
+    recorded_address = "0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1"
+    current_address = "0x20f8Bf6a479F320EaD074411a4b0e7944eA8c9C1"
+    server = FakeOpenAI([f"Send 1 ETH from {recorded_address}"])
+    client = build_client(server)
+    monkeypatch.setattr(llm_cassette, "placeholders", {})
+
+    llm_cassette.set_placeholder("smart_account_address", recorded_address)
+    with llm_cassette.use(path, mode="record"):
+        complete(client, f"Send 1 ETH from {recorded_address.lower()}")
+    assert "<smart_account_address>" in open(path).read()
+    assert recorded_address.lower() not in open(path).read().lower()
+
+    llm_cassette.set_placeholder("smart_account_address", current_address)
+    with llm_cassette.use(path, mode="replay"):
+        assert complete(client, f"Send 1 ETH from {current_address}") == f"Send 1 ETH from {current_address}"
+
+def test_auto_records_missing_requests_and_replays_in_order(tmp_path):
+    path = str(tmp_path / "cassette.json")
+    server = FakeOpenAI(["first", "second", "third"])
+    client = build_client(server)
+
+    with llm_cassette.use(path, mode="auto"):
+        assert complete(client, "Hello") == "first"
+        assert complete(client, "Hello") == "second"
+
+    with llm_cassette.use(path, mode="auto"):
+        assert complete(client, "Hello") == "first"
+        assert complete(client, "Hello") == "second"
+        assert complete(client, "Bye", stream=True) == "third"
+
+    assert server.requests == 3
+    assert len(json.load(open(path))["interactions"]) == 3
+
+def test_streams_closed_early_are_recorded_whole(tmp_path):
+    path = str(tmp_path / "cassette.json")
+    server = FakeOpenAI(['{"type": "missing_info", "message": "amount"}'])
+    client = build_client(server)
+
+    with llm_cassette.use(path, mode="record"):
+        response = client.chat.completions.create(
+            model="gpt-4-turbo-preview", messages=[{"role": "user", "content": "Send ETH"}], stream=True
+        )
+        for _ in response:
+            break
+        response.close()
+
+    with llm_cassette.use(path, mode="replay"):
+        assert complete(client, "Send ETH") == '{"type": "missing_info", "message": "amount"}'
@@ -0,0 +1,191 @@
+import asyncio
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+import time
+
+from openai import AsyncOpenAI, OpenAI
+import pytest
+
+from autotx.utils.agent.json_stream import stream_params
+from autotx.utils.llm_telemetry import llm_telemetry
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+@pytest.fixture(autouse=True)
+def llm_cassettes():
+    yield
+
+class FakeOpenAI(BaseHTTPRequestHandler):
+    # Answers every request with the next response of the server, as JSON or as server sent events
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        (status, body) = self.server.responses.pop(0)
+
+        self.send_response(status)
+        if isinstance(body, list):
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for chunk in body:
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.write(b"data: [DONE]\n\n")
+        else:
+            data = json.dumps(body).encode()
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def fake_openai():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAI)
+    server.responses = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+def completion(content: str, usage: dict | None) -> dict:
+    return {
+        "id": "chatcmpl-1",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "gpt-4-0125-preview",
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": usage,
+    }
+
+def chunks(contents: list[str], usage: dict | None) -> list[dict]:
+    result = [
+        {
+            "id": "chatcmpl-1",
+            "object": "chat.completion.chunk",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}],
+        }
+        for content in contents
+    ]
+    if usage:
+        result.append({"id": "chatcmpl-1", "object": "chat.completion.chunk", "created": 0, "model": "gpt-4o-mini", "choices": [], "usage": usage})
+    return result
+
+def build_client(server: ThreadingHTTPServer, client_class=OpenAI):
+    return client_class(base_url=f"http://127.0.0.1:{server.server_port}/v1", api_key="test", max_retries=1)
+
+MESSAGES = [{"role": "user", "content": "Send 1 ETH to vitalik.eth"}]
+USAGE = {"prompt_tokens": 1000, "completion_tokens": 100, "total_tokens": 1100}
+
+def test_calls_are_attributed_to_phases(fake_openai):
+    llm_telemetry.install()
+    client = build_client(fake_openai)
+    fake_openai.responses = [(200, completion("{}", USAGE)), (200, completion("{}", USAGE))]
+
+    with llm_telemetry.run("prompt") as run:
+        with llm_telemetry.phase("goal"):
+            client.chat.completions.create(model="gpt-4-turbo-preview", messages=MESSAGES)
+        with llm_telemetry.phase("agent:send-tokens"):
+            client.chat.completions.create(
+                model="gpt-4-turbo-preview",
+                messages=MESSAGES,
+                tools=[{"type": "function", "function": {"name": "transfer", "parameters": {}}}],
+            )
+            with llm_telemetry.tool("transfer"):
+                pass
+
+    summary = run.summary()
+    assert list(summary) == ["goal", "agent:send-tokens/tool_call", "agent:send-tokens/tool:transfer", "total"]
+    assert summary["goal"]["prompt_tokens"] == 1000
+    assert summary["goal"]["cost_usd"] == pytest.approx(0.013)
+    assert summary["agent:send-tokens/tool:transfer"]["tool_calls"] == 1
+    assert summary["total"]["calls"] == 2
+    assert summary["total"]["completion_tokens"] == 200
+    assert run.to_json()["llm_calls"][0]["model"] == "gpt-4-0125-preview"
+
+def test_retries_are_counted(fake_openai):
+    llm_telemetry.install()
+    client = build_client(fake_openai)
+    fake_openai.responses = [(500, {"error": {"message": "Server error"}}), (200, completion("{}", USAGE))]
+
+    with llm_telemetry.run("prompt") as run:
+        client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+    [record] = run.llm_calls
+    assert record.retries == 1
+    assert record.phase == "other"
+    assert record.error is None
+
+def test_streams_without_usage_are_estimated(fake_openai):
+    llm_telemetry.install()
+    client = build_client(fake_openai)
+    fake_openai.responses = [(200, chunks(['{"type": ', '"goal"}'], USAGE)), (200, chunks(['{"type": ', '"goal"}'], None))]
+
+    with llm_telemetry.run("prompt") as run:
+        with llm_telemetry.phase("plan"):
+            response = client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, **stream_params(True))
+            assert len(list(response)) == 3
+
+            response = client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, stream=True)
+            # Closed early, like read_events does once the reader is done
+            for _ in response:
+                break
+            response.close()
+
+    [streamed, closed] = run.llm_calls
+    assert closed.estimated and closed.stream
+    assert closed.prompt_tokens > 0 and closed.completion_tokens > 0
+    assert closed.first_token_s is not None
+    assert closed.cost_usd is not None
+    assert not streamed.estimated
+    assert streamed.prompt_tokens == 1000
+
+def test_async_streams(fake_openai):
+    llm_telemetry.install()
+    client = build_client(fake_openai, AsyncOpenAI)
+    fake_openai.responses = [(200, chunks(['{"type": ', '"goal"}'], USAGE))]
+
+    async def complete() -> str:
+        response = await client.chat.completions.create(model="gpt-4o-mini", messages=MESSAGES, stream=True)
+        return "".join([chunk.choices[0].delta.content async for chunk in response if chunk.choices])
+
+    with llm_telemetry.run("prompt") as run:
+        with llm_telemetry.phase("tasks"):
+            assert asyncio.run(complete()) == '{"type": "goal"}'
+
+    [record] = run.llm_calls
+    assert record.phase == "tasks"
+    assert record.prompt_tokens == 1000
+
+def test_calls_outside_of_runs_are_not_recorded(fake_openai, tmp_path):
+    llm_telemetry.install()
+    client = build_client(fake_openai)
+    fake_openai.responses = [(200, completion("{}", USAGE))]
+
+    client.chat.completions.create(model="gpt-4o", messages=MESSAGES)
+
+    with llm_telemetry.run("prompt") as run:
+        pass
+    assert run.llm_calls == []
+    assert json.loads(open(run.save(str(tmp_path))).read())["summary"] == {}
+
+def test_stages_are_timed(tmp_path):
+    with llm_telemetry.run("prompt") as run:
+        with llm_telemetry.timing("agents"):
+            time.sleep(0.01)
+        with llm_telemetry.timing("transactions"):
+            pass
+        with llm_telemetry.timing("transactions"):
+            pass
+
+    with llm_telemetry.timing("agents"):
+        pass
+
+    assert list(run.timings) == ["agents", "transactions"]
+    assert run.timings["agents"] >= 0.01
+    assert json.loads(open(run.save(str(tmp_path))).read())["timings"] == run.timings
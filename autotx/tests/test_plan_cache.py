@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from autotx.utils.agent.plan_cache import PlanCache
+from autotx.utils.ethereum.cache import Cache
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+AGENTS_INFORMATION = "Agent name: send-tokens"
+USER = "0x0000000000000000000000000000000000000001"
+RECEIVER_A = "0x10f8Bf6a479F320ead074411A4b0e7944eA8C9c1"
+RECEIVER_B = "0x20f8Bf6a479F320EaD074411a4b0e7944eA8c9C1"
+
+def test_goal_is_reused_with_new_values(tmp_path):
+    plan_cache = PlanCache(Cache(str(tmp_path)), max_entries=256)
+    plan_cache.put_goal(
+        f"Send 10 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, USER,
+        f"Transfer 10 TTOK from the user's address {USER} to {RECEIVER_A.lower()}.",
+    )
+
+    goal = PlanCache(Cache(str(tmp_path)), max_entries=256).get_goal(f"send 5 TTOK to {RECEIVER_B}", AGENTS_INFORMATION, USER)
+
+    assert goal == f"Transfer 5 TTOK from the user's address {USER} to {RECEIVER_B}."
+    assert plan_cache.get_goal(f"Send 10 USDC to {RECEIVER_A}", AGENTS_INFORMATION, USER) is None
+    assert plan_cache.get_goal(f"Send 10 TTOK to {RECEIVER_A}", "Agent name: swap-tokens", USER) is None
+
+def test_tasks_keep_their_context(tmp_path):
+    plan_cache = PlanCache(Cache(str(tmp_path)), max_entries=256)
+    tasks = {
+        "tasks": [
+            {"task": f"Send 1 TTOK to {RECEIVER_A}", "agent": "send-tokens", "expected_output": "1 TTOK sent", "context": None, "extra_information": None},
+            {"task": "Check the balance", "agent": "send-tokens", "expected_output": "Balance", "context": [1, 0], "extra_information": None},
+        ]
+    }
+    plan_cache.put_tasks(f"Send 1 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, json.dumps(tasks))
+
+    cached_tasks = json.loads(plan_cache.get_tasks(f"Send 2 TTOK to {RECEIVER_B}", AGENTS_INFORMATION))
+
+    assert cached_tasks["tasks"][0]["task"] == f"Send 2 TTOK to {RECEIVER_B}"
+    assert cached_tasks["tasks"][0]["expected_output"] == "2 TTOK sent"
+    assert cached_tasks["tasks"][1]["context"] == [1, 0]
+
+def test_outputs_missing_a_value_are_not_cached(tmp_path):
+    plan_cache = PlanCache(Cache(str(tmp_path)), max_entries=256)
+    # The amount was rewritten, a new amount could not be put into this goal
+    plan_cache.put_goal(f"Send 10 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, USER, f"Transfer 10.0 TTOK to {RECEIVER_A}")
+
+    assert plan_cache.get_goal(f"Send 10 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, USER) is None
+
+def test_least_recently_used_goal_is_evicted(tmp_path):
+    plan_cache = PlanCache(Cache(str(tmp_path)), max_entries=2)
+    for token in ["TTOK", "USDC", "DAI"]:
+        if token == "DAI":
+            # Makes the TTOK goal the most recently used one
+            assert plan_cache.get_goal(f"Send 1 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, USER)
+        plan_cache.put_goal(f"Send 1 {token} to {RECEIVER_A}", AGENTS_INFORMATION, USER, f"Transfer 1 {token} to {RECEIVER_A}")
+
+    assert plan_cache.get_goal(f"Send 1 USDC to {RECEIVER_A}", AGENTS_INFORMATION, USER) is None
+    assert plan_cache.get_goal(f"Send 1 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, USER) is not None
+    assert plan_cache.get_goal(f"Send 1 DAI to {RECEIVER_A}", AGENTS_INFORMATION, USER) is not None
+
+@pytest.mark.parametrize("prompt,goal,new_prompt", [
+    (f"Send 2 USDC to {RECEIVER_A}", f"Send 2 USDC to {RECEIVER_A} in 2 separate steps, approving 2 times", f"Send 500 USDC to {RECEIVER_B}"),
+    ("Swap 1 ETH for USDC", "Swap 1 ETH for USDC, 1 transaction", "Swap 3 ETH for USDC"),
+])
+def test_outputs_with_values_not_taken_from_the_prompt_are_not_cached(tmp_path, prompt, goal, new_prompt):
+    plan_cache = PlanCache(Cache(str(tmp_path)), max_entries=256)
+    plan_cache.put_goal(prompt, AGENTS_INFORMATION, USER, goal)
+
+    assert plan_cache.get_goal(new_prompt, AGENTS_INFORMATION, USER) is None
+    assert plan_cache.get_goal(prompt, AGENTS_INFORMATION, USER) is None
+
+def test_plan_cache_is_enabled_by_default(tmp_path, monkeypatch):
+    monkeypatch.delenv("PLAN_CACHE_SIZE", raising=False)
+    plan_cache = PlanCache(Cache(str(tmp_path)))
+    plan_cache.put_goal(f"Send 1 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, USER, f"Transfer 1 TTOK to {RECEIVER_A}")
+
+    assert plan_cache.get_goal(f"Send 3 TTOK to {RECEIVER_B}", AGENTS_INFORMATION, USER) == f"Transfer 3 TTOK to {RECEIVER_B}"
+
+def test_plan_cache_size_0_disables_it(tmp_path, monkeypatch):
+    monkeypatch.setenv("PLAN_CACHE_SIZE", "0")
+    plan_cache = PlanCache(Cache(str(tmp_path)))
+    plan_cache.put_goal(f"Send 1 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, USER, f"Transfer 1 TTOK to {RECEIVER_A}")
+
+    assert plan_cache.get_goal(f"Send 1 TTOK to {RECEIVER_A}", AGENTS_INFORMATION, USER) is None
@@ -0,0 +1,89 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from autotx.utils.agent.task_graph import chain_tasks_without_context, get_task_dependencies, run_task_graph
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+def build_tasks(agents: list[str], contexts: list[list[int] | None]) -> list[SimpleNamespace]:
+    agents_by_name = {name: SimpleNamespace(name=name) for name in agents}
+    tasks: list[SimpleNamespace] = []
+    for agent, context in zip(agents, contexts):
+        tasks.append(SimpleNamespace(agent=agents_by_name[agent], context=None if context is None else [tasks[i] for i in context]))
+    return tasks
+
+def test_get_task_dependencies():
+    tasks = build_tasks(["research", "send", "swap"], [[], [], [0, 1]])
+
+    assert get_task_dependencies(tasks) == [[], [], [0, 1]]
+
+def test_independent_tasks_run_concurrently():
+    tasks = build_tasks(["research", "send", "swap"], [[], [], [0, 1]])
+    barrier = threading.Barrier(2, timeout=5)
+    finished: list[int] = []
+
+    def run_task(i, task):
+        if i < 2:
+            # Only passes if both independent tasks are running at the same time
+            barrier.wait()
+        finished.append(i)
+
+    run_task_graph(tasks, run_task)
+
+    assert sorted(finished[:2]) == [0, 1]
+    assert finished[2] == 2
+
+def test_tasks_of_the_same_agent_run_one_at_a_time():
+    tasks = build_tasks(["send", "send", "research"], [[], [], []])
+    running: set[int] = set()
+    overlaps: list[set[int]] = []
+
+    def run_task(i, task):
+        running.add(i)
+        if {0, 1} <= running:
+            overlaps.append(set(running))
+        time.sleep(0.05)
+        running.discard(i)
+
+    run_task_graph(tasks, run_task)
+
+    assert overlaps == []
+
+def test_failing_task_raises():
+    tasks = build_tasks(["research", "send"], [[], [0]])
+    started: list[int] = []
+
+    def run_task(i, task):
+        started.append(i)
+        raise Exception(f"Task {i} failed")
+
+    with pytest.raises(Exception, match="Task 0 failed"):
+        run_task_graph(tasks, run_task)
+
+    assert started == [0]
+
+def test_tasks_without_context_use_the_previous_task():
+    tasks = build_tasks(["research", "send", "swap", "send"], [None, None, [0], []])
+
+    chain_tasks_without_context(tasks)
+
+    assert get_task_dependencies(tasks) == [[], [0], [0], []]
+
+def test_chained_independent_tasks_run_concurrently():
+    tasks = build_tasks(["send", "swap"], [[], []])
+    barrier = threading.Barrier(2, timeout=5)
+
+    def run_task(i, task):
+        # Only passes if both tasks are running at the same time
+        barrier.wait()
+
+    chain_tasks_without_context(tasks)
+    run_task_graph(tasks, run_task)
+
+    assert get_task_dependencies(tasks) == [[], []]
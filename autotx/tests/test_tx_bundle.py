@@ -0,0 +1,88 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from autotx.AutoTx import AutoTx
+from autotx.utils.PreparedTx import PreparedTx
+from autotx.utils.TxBundle import TxBundle
+
+
+@pytest.fixture(autouse=True)
+def start_and_stop_local_fork():
+    yield
+
+def build_tx(summary: str) -> PreparedTx:
+    return PreparedTx(summary, {"to": "0x0000000000000000000000000000000000000000", "value": 0, "data": "0x"})
+
+def test_sealed_bundle_rejects_transactions():
+    bundle = TxBundle()
+    bundle.append(build_tx("first"))
+
+    transactions = bundle.seal()
+
+    with pytest.raises(Exception, match="sealed"):
+        bundle.append(build_tx("second"))
+
+    assert [tx.summary for tx in transactions] == ["first"]
+    assert len(bundle) == 1
+
+def test_concurrent_runs_have_their_own_bundles(monkeypatch):
+    auto_tx = AutoTx(None, None, [], None)
+    barrier = threading.Barrier(2, timeout=5)
+
+    class FakeCrew:
+        def __init__(self, tasks):
+            self.task = tasks[0]
+
+        def kickoff(self):
+            # The first task of each run waits for the other run, so both write at the same time
+            if self.task.wait:
+                barrier.wait()
+            else:
+                time.sleep(0.05)
+            auto_tx.transactions.append(build_tx(self.task.summary))
+
+    monkeypatch.setattr(auto_tx, "build_crew", FakeCrew)
+
+    def build_tasks(run: str) -> list[SimpleNamespace]:
+        # Independent tasks of different agents, the later task finishes first
+        return [
+            SimpleNamespace(agent=SimpleNamespace(), context=[], summary=f"{run} {i}", wait=i == 0)
+            for i in range(2)
+        ]
+
+    results: dict[str, list[PreparedTx]] = {}
+
+    def run(name: str):
+        results[name] = auto_tx.run_tasks(build_tasks(name))
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in ["a", "b"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [tx.summary for tx in results["a"]] == ["a 0", "a 1"]
+    assert [tx.summary for tx in results["b"]] == ["b 0", "b 1"]
+
+def test_transactions_outside_of_a_task_are_sent_with_the_next_run(monkeypatch):
+    auto_tx = AutoTx(None, None, [], None)
+
+    class FakeCrew:
+        def __init__(self, tasks):
+            self.task = tasks[0]
+
+        def kickoff(self):
+            auto_tx.transactions.append(build_tx(self.task.summary))
+
+    monkeypatch.setattr(auto_tx, "build_crew", FakeCrew)
+
+    auto_tx.transactions.append(build_tx("outside"))
+    assert len(auto_tx.transactions) == 1
+
+    transactions = auto_tx.run_tasks([SimpleNamespace(agent=SimpleNamespace(), context=[], summary="task")])
+
+    assert [tx.summary for tx in transactions] == ["outside", "task"]
+    assert len(auto_tx.transactions) == 0
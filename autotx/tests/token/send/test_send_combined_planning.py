@@ -0,0 +1,19 @@
+from dataclasses import replace
+
+from autotx.patch import patch_langchain
+from autotx.utils.ethereum import get_erc20_balance
+from autotx.utils.ethereum.eth_address import ETHAddress
+
+patch_langchain()
+
+def test_combined_planning_send_erc20(configuration, auto_tx, mock_erc20):
+    (_, _, client, _) = configuration
+    auto_tx.config = replace(auto_tx.config, planning="combined")
+    receiver = ETHAddress("0x90F8bf6A479f320ead074411a4B0e7944Ea8c9C1", client.w3)
+    balance = get_erc20_balance(client.w3, mock_erc20, receiver)
+
+    auto_tx.run(f"Send 10 TTOK to {receiver}", non_interactive=True)
+
+    assert get_erc20_balance(client.w3, mock_erc20, receiver) == balance + 10
+    # The goal and its tasks come from a single completion
+    assert [call.phase for call in auto_tx.last_run_telemetry.llm_calls].count("plan") == 1
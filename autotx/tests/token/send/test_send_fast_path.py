@@ -0,0 +1,28 @@
+from dataclasses import replace
+
+from autotx.utils.ethereum import get_erc20_balance
+from autotx.utils.ethereum.eth_address import ETHAddress
+from autotx.utils.ethereum.get_eth_balance import get_eth_balance
+
+
+def test_fast_path_send_eth(configuration, auto_tx):
+    (_, _, client, _) = configuration
+    auto_tx.config = replace(auto_tx.config, fast_path=True)
+    receiver = ETHAddress("0x90F8bf6A479f320ead074411a4B0e7944Ea8c9C1", client.w3)
+
+    auto_tx.run(f"Send 1 ETH to {receiver}", non_interactive=True)
+
+    assert get_eth_balance(client.w3, receiver) == 1
+    assert auto_tx.last_run_telemetry.llm_calls == []
+
+def test_fast_path_send_erc20(configuration, auto_tx, mock_erc20):
+    (_, _, client, _) = configuration
+    auto_tx.config = replace(auto_tx.config, fast_path=True)
+    receiver = ETHAddress("0x90F8bf6A479f320ead074411a4B0e7944Ea8c9C1", client.w3)
+    balance = get_erc20_balance(client.w3, mock_erc20, receiver)
+
+    auto_tx.run(f"Send 10 TTOK to {receiver} and 1 ETH to {receiver}", non_interactive=True)
+
+    assert get_erc20_balance(client.w3, mock_erc20, receiver) == balance + 10
+    assert get_eth_balance(client.w3, receiver) == 1
+    assert auto_tx.last_run_telemetry.llm_calls == []
@@ -0,0 +1,37 @@
+from threading import Lock
+from typing import Iterable, Iterator
+
+from autotx.utils.PreparedTx import PreparedTx
+
+class TxBundle:
+    transactions: list[PreparedTx]
+    sealed: bool
+
+    def __init__(self):
+        self.transactions = []
+        self.sealed = False
+        self.lock = Lock()
+
+    def append(self, tx: PreparedTx):
+        self.extend([tx])
+
+    def extend(self, txs: Iterable[PreparedTx]):
+        # Transactions added in one call stay next to each other (e.g. an approve and its swap)
+        txs = list(txs)
+        with self.lock:
+            if self.sealed:
+                raise Exception("Transactions can not be added to a bundle that has already been sealed.")
+            self.transactions.extend(txs)
+
+    def seal(self) -> list[PreparedTx]:
+        with self.lock:
+            self.sealed = True
+            return list(self.transactions)
+
+    def __len__(self) -> int:
+        with self.lock:
+            return len(self.transactions)
+
+    def __iter__(self) -> Iterator[PreparedTx]:
+        with self.lock:
+            return iter(list(self.transactions))
@@ -0,0 +1,38 @@
+from crewai import Agent
+from langchain_core.tools import StructuredTool
+
+# The agents information is embedded in every planning prompt, so it is kept as short as possible
+
+def build_agents_information(agents: list[Agent]) -> str:
+    agent_descriptions = []
+    for agent in agents:
+        agent_default_tools: list[StructuredTool] = agent.tools
+        tools_available = "\n".join([f"- {describe_tool(tool)}" for tool in agent_default_tools])
+        agent_descriptions.append(f"Agent name: {agent.name}\nRole: {compact(agent.role)}\nTools available:\n{tools_available}")
+
+    return "\n\n".join(agent_descriptions)
+
+def build_uncompacted_agents_information(agents: list[Agent]) -> str:
+    # The format used before build_agents_information, only kept to report the savings
+    agent_descriptions = []
+    for agent in agents:
+        agent_default_tools: list[StructuredTool] = agent.tools
+        tools_available = "\n".join(
+            [
+                f"  - Name: {tool.name}\n  - Description: {tool.description} \n"
+                for tool in agent_default_tools
+            ]
+        )
+        description = f"Agent name: {agent.name}\nRole: {agent.role}\nTools available:\n{tools_available}"
+        agent_descriptions.append(description)
+
+    return "\n".join(agent_descriptions)
+
+def describe_tool(tool: StructuredTool) -> str:
+    # Descriptions of crewAI tools already start with the tool's name and arguments
+    description = compact(tool.description)
+    return description if description.startswith(tool.name) else f"{compact(tool.name)}: {description}"
+
+def compact(text: str) -> str:
+    # Removes the indentation and line breaks left by dedent-ed docstrings
+    return " ".join(text.split())
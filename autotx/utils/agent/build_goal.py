@@ -2,9 +2,12 @@ import json
 import os
 from textwrap import dedent
 import typing
+from typing import Callable, TypeVar
 
 import openai
 
+from autotx.utils.agent.json_stream import JsonEvent, JsonEventReader, read_events, stream_params
+from autotx.utils.agent.plan_cache import plan_cache
 from autotx.utils.ethereum.eth_address import ETHAddress
 
 class GoalResponse:
@@ -30,6 +33,8 @@ class InvalidPromptResponse:
 
 DefineGoalResponse = typing.Union[GoalResponse, MissingInfoResponse, InvalidPromptResponse]
 
+T = TypeVar("T")
+
 def get_persona(smart_account_address: ETHAddress) -> str:
     return dedent(
         f"""
@@ -39,12 +44,32 @@ def get_persona(smart_account_address: ETHAddress) -> str:
         """
     )
 
-def build_goal(prompt: str, agents_information: str, smart_account_address: ETHAddress, non_interactive: bool) -> str:
-    response: DefineGoalResponse | None = None
+def build_goal(prompt: str, agents_information: str, smart_account_address: ETHAddress, non_interactive: bool, stream: bool = False) -> str:
+    cached_goal = plan_cache.get_goal(prompt, agents_information, smart_account_address.hex)
+    if cached_goal:
+        print("Reusing goal of a previous prompt")
+        return cached_goal
+
+    (response, _, chat_history) = analyze_until_goal(
+        prompt,
+        non_interactive,
+        lambda chat_history: (analyze_user_prompt(chat_history, agents_information, smart_account_address, stream), None),
+    )
+
+    # Goals that needed more input from the user don't only depend on the prompt
+    if chat_history == f"User: {prompt}":
+        plan_cache.put_goal(prompt, agents_information, smart_account_address.hex, response.goal)
+    return response.goal
+
+def analyze_until_goal(
+    prompt: str, non_interactive: bool, analyze: Callable[[str], tuple[DefineGoalResponse, T]]
+) -> tuple[GoalResponse, T, str]:
+    # Asks the user for missing information or a new prompt until the chat history can be turned into a goal.
+    # Returns the goal, whatever else analyze returned with it and the chat history that led to it
     chat_history = f"User: {prompt}"
 
     while True:
-        response = analyze_user_prompt(chat_history, agents_information, smart_account_address)
+        (response, result) = analyze(chat_history)
         if response.type == "missing_info":
             autotx_message = f"Missing information: {response.message}"
 
@@ -62,9 +87,42 @@ def build_goal(prompt: str, agents_information: str, smart_account_address: ETHA
                 chat_history = "User: " + input(f"{autotx_message}\nNew prompt: ")
 
         elif response.type == "goal":
-            return response.goal
+            return (response, result, chat_history)
+
+def analyze_user_prompt(chat_history: str, agents_information: str, smart_account_address: ETHAddress, stream: bool = False) -> DefineGoalResponse:
+    response = openai.chat.completions.create(
+        model=os.environ.get("OPENAI_MODEL_NAME", "gpt-4-turbo-preview"),
+        response_format={"type": "json_object"},
+        messages=build_analyze_prompt_messages(chat_history, agents_information, smart_account_address),
+        **stream_params(stream),
+    )
+
+    if stream:
+        reader = AnalyzePromptReader()
+        read_events(response, reader)
+        return reader.response()
+
+    return parse_analyze_prompt_response(extract_json(response.choices[0].message.content))
 
-def analyze_user_prompt(chat_history: str, agents_information: str, smart_account_address: ETHAddress) -> DefineGoalResponse:
+class AnalyzePromptReader(JsonEventReader):
+    fields: dict[str, str]
+
+    def __init__(self):
+        self.fields = {}
+
+    def add(self, event: JsonEvent) -> bool:
+        (name, key, value) = event
+        if name == "field":
+            self.fields[key] = value
+
+        # The type comes first, the response is complete as soon as the field it needs has arrived
+        needed_field = "goal" if self.fields.get("type") == "goal" else "message"
+        return name == "end" or ("type" in self.fields and needed_field in self.fields)
+
+    def response(self) -> DefineGoalResponse:
+        return parse_analyze_prompt_response(json.dumps(self.fields))
+
+def build_analyze_prompt_messages(chat_history: str, agents_information: str, smart_account_address: ETHAddress) -> list[dict[str, str]]:
     template = dedent(
         """
         Based on the following chat history between you and the user: 
@@ -103,25 +161,20 @@ def analyze_user_prompt(chat_history: str, agents_information: str, smart_accoun
         agents_information=agents_information, chat_history=chat_history
     )
 
-    response = openai.chat.completions.create(
-        model=os.environ.get("OPENAI_MODEL_NAME", "gpt-4-turbo-preview"),
-        response_format={"type": "json_object"},
-        messages=[
-            { "role": "system", "content": get_persona(smart_account_address) },
-            { "role": "user", "content": formatted_template }
-        ],
-    )
-    response = response.choices[0].message.content
+    return [
+        { "role": "system", "content": get_persona(smart_account_address) },
+        { "role": "user", "content": formatted_template }
+    ]
+
+def extract_json(response: str | None) -> str:
     if not response:
         # TODO: Handle bad response
-        pass
+        return ""
 
     # Only keep the JSON part of the response
     bracket_index = response.find('{')
     bracket_last = response.rfind('}')
-    response = response[bracket_index:bracket_last + 1]
-
-    return parse_analyze_prompt_response(response)
+    return response[bracket_index:bracket_last + 1]
 
 def parse_analyze_prompt_response(response: str) -> DefineGoalResponse:
     response = json.loads(response)
@@ -0,0 +1,173 @@
+import json
+import os
+from textwrap import dedent
+
+from crewai import Agent, Task
+import openai
+
+from autotx.utils.agent.build_goal import (
+    AnalyzePromptReader, DefineGoalResponse, analyze_until_goal, extract_json, get_persona, parse_analyze_prompt_response
+)
+from autotx.utils.agent.define_tasks import TasksReader, sanitize_tasks_response
+from autotx.utils.agent.json_stream import JsonEvent, JsonEventReader, read_events, stream_params
+from autotx.utils.agent.plan_cache import plan_cache
+from autotx.utils.ethereum.eth_address import ETHAddress
+
+# Defines the goal and its tasks in one completion, instead of build_goal followed by define_tasks
+
+def define_plan(
+    prompt: str, agents_information: str, smart_account_address: ETHAddress, agents: list[Agent], non_interactive: bool, stream: bool = False
+) -> tuple[str, list[Task]]:
+    cached_plan = get_cached_plan(prompt, agents_information, smart_account_address, agents)
+    if cached_plan:
+        return cached_plan
+
+    def analyze(chat_history: str) -> tuple[DefineGoalResponse, tuple[str | None, list[Task] | None]]:
+        (response, tasks, sanitized_tasks) = analyze_user_prompt_with_tasks(chat_history, agents_information, smart_account_address, agents, stream)
+        return (response, (tasks, sanitized_tasks))
+
+    (response, (tasks, sanitized_tasks), chat_history) = analyze_until_goal(prompt, non_interactive, analyze)
+
+    return finish_plan(prompt, chat_history, agents_information, smart_account_address, response.goal, tasks, sanitized_tasks)
+
+def analyze_user_prompt_with_tasks(
+    chat_history: str, agents_information: str, smart_account_address: ETHAddress, agents: list[Agent], stream: bool = False
+) -> tuple[DefineGoalResponse, str | None, list[Task] | None]:
+    response = openai.chat.completions.create(
+        model=os.environ.get("OPENAI_MODEL_NAME", "gpt-4-turbo-preview"),
+        response_format={"type": "json_object"},
+        messages=build_define_plan_messages(chat_history, agents_information, smart_account_address),
+        **stream_params(stream),
+    )
+
+    if stream:
+        reader = PlanReader(agents)
+        read_events(response, reader)
+        return reader.result()
+
+    return sanitize_plan(parse_define_plan_response(response.choices[0].message.content), agents)
+
+def build_define_plan_messages(chat_history: str, agents_information: str, smart_account_address: ETHAddress) -> list[dict[str, str]]:
+    template = dedent(
+        """
+        Based on the following chat history between you and the user:
+        ```
+        {chat_history}
+        ```
+
+        You must analyze the prompt, define a goal to be executed by the agents and convert it into specific tasks.
+        If the prompt is not clear or missing information, you MUST ask for more information.
+        If the prompt is invalid, unsupported or outside the scope of the agents, you MUST ask for a new prompt.
+        Always ensure you have all the information needed to define the goal that can be executed without prior context.
+
+        The available agents and tools:
+        {agents_information}
+
+        Respond ONLY in one of three of the following JSON formats:
+        1:
+        {{
+            "type": "goal",
+            "goal": "The detailed goal here. No need to mention specific agents or tools. But you MUST mention the user's address.",
+            "tasks": [{{
+                "task": "The description of task to be done with details needed given by user. You MUST include the user's address if needed."
+                "agent": "The agent that best fits to execute the task"
+                "expected_output":"Description of expected output for the task"
+                "context": [int] // Index of tasks that will have their output used as context for this task (Always start from 0). Eg. [1, 3], or [] if the task doesn't need the output of any other task
+                "extra_information": Any extra information as string with description given by the user needed to execute the task, if applicable.
+            }}]
+        }}
+        2:
+        {{
+            "type": "missing_info",
+            "message": "The information that is missing here"
+        }}
+        3:
+        {{
+            "type": "unsupported",
+            "message": "Reason why the prompt is unsupported here"
+        }}
+
+        IMPORTANT: After all tasks are executed, the prepared transactions will be sent to the Ethereum network.
+        """
+    )
+
+    formatted_template = template.format(
+        agents_information=agents_information, chat_history=chat_history
+    )
+
+    return [
+        { "role": "system", "content": get_persona(smart_account_address) },
+        { "role": "user", "content": formatted_template }
+    ]
+
+def parse_define_plan_response(response: str | None) -> tuple[DefineGoalResponse, str | None]:
+    # Returns the goal response and, for goals, the tasks in the format of define_tasks
+    response = extract_json(response)
+    goal_response = parse_analyze_prompt_response(response)
+    if goal_response.type != "goal":
+        return (goal_response, None)
+
+    tasks = json.loads(response).get("tasks")
+    if not tasks:
+        raise Exception("Bad response from OpenAI API for defining the plan, it has no tasks.")
+
+    return (goal_response, json.dumps({ "tasks": tasks }))
+
+def sanitize_plan(plan: tuple[DefineGoalResponse, str | None], agents: list[Agent]) -> tuple[DefineGoalResponse, str | None, list[Task] | None]:
+    (response, tasks) = plan
+    if tasks is None:
+        return (response, None, None)
+
+    print("Tasks", tasks)
+    return (response, tasks, sanitize_tasks_response(tasks, agents))
+
+class PlanReader(JsonEventReader):
+    # The goal fields are read like analyze_user_prompt does, the tasks like define_tasks does
+
+    def __init__(self, agents: list[Agent]):
+        self.prompt_reader = AnalyzePromptReader()
+        self.tasks_reader = TasksReader(agents)
+
+    def add(self, event: JsonEvent) -> bool:
+        prompt_done = self.prompt_reader.add(event)
+        self.tasks_reader.add(event)
+
+        # Missing info and unsupported responses are done without waiting for the end of the response
+        return (prompt_done and self.prompt_reader.fields.get("type") != "goal") or event[0] == "end"
+
+    def result(self) -> tuple[DefineGoalResponse, str | None, list[Task] | None]:
+        response = self.prompt_reader.response()
+        if response.type != "goal":
+            return (response, None, None)
+
+        if not self.tasks_reader.tasks:
+            raise Exception("Bad response from OpenAI API for defining the plan, it has no tasks.")
+
+        return (response, self.tasks_reader.tasks_json(), self.tasks_reader.tasks)
+
+def finish_plan(
+    prompt: str,
+    chat_history: str,
+    agents_information: str,
+    smart_account_address: ETHAddress,
+    goal: str,
+    tasks: str,
+    sanitized_tasks: list[Task],
+) -> tuple[str, list[Task]]:
+    # Plans that needed more input from the user don't only depend on the prompt
+    if chat_history == f"User: {prompt}":
+        plan_cache.put_goal(prompt, agents_information, smart_account_address.hex, goal)
+        plan_cache.put_tasks(goal, agents_information, tasks)
+
+    return (goal, sanitized_tasks)
+
+def get_cached_plan(
+    prompt: str, agents_information: str, smart_account_address: ETHAddress, agents: list[Agent]
+) -> tuple[str, list[Task]] | None:
+    goal = plan_cache.get_goal(prompt, agents_information, smart_account_address.hex)
+    tasks = plan_cache.get_tasks(goal, agents_information) if goal else None
+    if not goal or not tasks:
+        return None
+
+    print("Reusing plan of a previous prompt")
+    return (goal, sanitize_tasks_response(tasks, agents))
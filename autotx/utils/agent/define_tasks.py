@@ -4,7 +4,35 @@ from textwrap import dedent
 from crewai import Agent, Task
 import openai
 
-def define_tasks(goal: str, agents_information: str, agents: list[Agent]) -> list[Task]:
+from autotx.utils.agent.json_stream import JsonEvent, JsonEventReader, read_events, stream_params
+from autotx.utils.agent.plan_cache import plan_cache
+
+def define_tasks(goal: str, agents_information: str, agents: list[Agent], stream: bool = False) -> list[Task]:
+    cached_tasks = plan_cache.get_tasks(goal, agents_information)
+    if cached_tasks:
+        print("Reusing tasks of a previous goal")
+        return parse_define_tasks_response(cached_tasks, agents)
+
+    response = openai.chat.completions.create(
+        model=os.environ.get("OPENAI_MODEL_NAME", "gpt-4-turbo-preview"),
+        response_format={"type": "json_object"},
+        messages=build_define_tasks_messages(goal, agents_information),
+        **stream_params(stream),
+    )
+
+    if stream:
+        reader = TasksReader(agents)
+        read_events(response, reader)
+        (tasks, tasks_json) = (reader.result(), reader.tasks_json())
+    else:
+        tasks = parse_define_tasks_response(response.choices[0].message.content, agents)
+        tasks_json = extract_tasks_json(response.choices[0].message.content)
+
+    plan_cache.put_tasks(goal, agents_information, tasks_json)
+
+    return tasks
+
+def build_define_tasks_messages(goal: str, agents_information: str) -> list[dict[str, str]]:
     template = dedent(
         """
         Based on the following goal: {goal}
@@ -15,7 +43,7 @@ def define_tasks(goal: str, agents_information: str, agents: list[Agent]) -> lis
                 "task": "The description of task to be done with details needed given by user. You MUST include the user's address if needed."
                 "agent": "The agent that best fits to execute the task"
                 "expected_output":"Description of expected output for the task"
-                "context": [int] // Index of tasks that will have their output used as context for this task (Always start from 0), if applicable. Eg. [1, 3] or None
+                "context": [int] // Index of tasks that will have their output used as context for this task (Always start from 0). Eg. [1, 3], or [] if the task doesn't need the output of any other task
                 "extra_information": Any extra information as string with description given by the user needed to execute the task, if applicable.
             }}]
         }}
@@ -32,48 +60,77 @@ def define_tasks(goal: str, agents_information: str, agents: list[Agent]) -> lis
     )
 
     # TODO: Improve how we pass messages. We should use system role
-    response = openai.chat.completions.create(
-        model=os.environ.get("OPENAI_MODEL_NAME", "gpt-4-turbo-preview"),
-        response_format={"type": "json_object"},
-        messages=[{"role": "user", "content": formatted_template}],
-    )
-    response = response.choices[0].message.content
+    return [{"role": "user", "content": formatted_template}]
+
+def parse_define_tasks_response(response: str | None, agents: list[Agent]) -> list[Task]:
     if not response:
         raise Exception("Bad response from OpenAI API for defining tasks.")
 
-    # Only keep the JSON part of the response
-    bracket_index = response.find('{')
-    bracket_last = response.rfind('}')
-    response = response[bracket_index:bracket_last + 1]
+    response = extract_tasks_json(response)
 
     print("Tasks", response)
 
     return sanitize_tasks_response(response, agents)
 
+def extract_tasks_json(response: str) -> str:
+    # Only keep the JSON part of the response
+    bracket_index = response.find('{')
+    bracket_last = response.rfind('}')
+    return response[bracket_index:bracket_last + 1]
+
 def sanitize_tasks_response(response: str, agents: list[Agent]) -> list[Task]:
     tasks = json.loads(response)["tasks"]
     sanitized_tasks: list[Task] = []
     for task in tasks:
-        context: list[Task] = (
-            [sanitized_tasks[c] for c in task["context"]] if task["context"] else []
-        )
-
-        get_agent_by_name = lambda a: a.name.lower() == task["agent"].lower()
-        agent = next(filter(get_agent_by_name, agents), None)
-        description = task["task"]
-        if not agent:
-            raise Exception(f"Agent {task['agent']} not found.", task)
-
-        if task["extra_information"]:
-            description += "\n" + task["extra_information"]
-
-        sanitized_tasks.append(
-            Task(
-                description=description,
-                agent=agent,
-                expected_output=task["expected_output"],
-                context=context,
-            )
-        )
-
-    return sanitized_tasks
\ No newline at end of file
+        sanitized_tasks.append(sanitize_task(task, sanitized_tasks, agents))
+
+    return sanitized_tasks
+
+def sanitize_task(task: dict, sanitized_tasks: list[Task], agents: list[Agent]) -> Task:
+    # The context of a task can only refer to the tasks before it. Without one, the task gets the previous task's output
+    context: list[Task] | None = (
+        [sanitized_tasks[c] for c in task["context"]] if task.get("context") is not None else None
+    )
+
+    get_agent_by_name = lambda a: a.name.lower() == task["agent"].lower()
+    agent = next(filter(get_agent_by_name, agents), None)
+    description = task["task"]
+    if not agent:
+        raise Exception(f"Agent {task['agent']} not found.", task)
+
+    if task.get("extra_information"):
+        description += "\n" + task["extra_information"]
+
+    return Task(
+        description=description,
+        agent=agent,
+        expected_output=task["expected_output"],
+        context=context,
+    )
+
+class TasksReader(JsonEventReader):
+    tasks: list[Task]
+    task_objects: list[dict]
+
+    def __init__(self, agents: list[Agent]):
+        self.agents = agents
+        self.tasks = []
+        self.task_objects = []
+
+    def add(self, event: JsonEvent) -> bool:
+        (name, key, value) = event
+        if name == "item" and key == "tasks":
+            # Tasks are created while the rest of the response is still streamed
+            print("Task", json.dumps(value))
+            self.tasks.append(sanitize_task(value, self.tasks, self.agents))
+            self.task_objects.append(value)
+
+        return name == "end"
+
+    def result(self) -> list[Task]:
+        if not self.tasks:
+            raise Exception("Bad response from OpenAI API for defining tasks.")
+        return self.tasks
+
+    def tasks_json(self) -> str:
+        return json.dumps({ "tasks": self.task_objects })
@@ -0,0 +1,275 @@
+import re
+from dataclasses import dataclass
+from typing import Union
+
+from web3.constants import ADDRESS_ZERO
+
+from autotx.utils.PreparedTx import PreparedTx
+from autotx.utils.ethereum import SafeManager
+from autotx.utils.ethereum.build_transfer_erc20 import build_transfer_erc20
+from autotx.utils.ethereum.build_transfer_eth import build_transfer_eth
+from autotx.utils.ethereum.constants import NATIVE_TOKEN_ADDRESS
+from autotx.utils.ethereum.eth_address import ETHAddress
+from autotx.utils.ethereum.get_erc20_balance import get_erc20_balance
+from autotx.utils.ethereum.get_eth_balance import get_eth_balance
+from autotx.utils.ethereum.uniswap.swap import build_swap_transaction
+
+# Rule based parsing of prompts that only send, swap or check balances of known tokens, so they can skip the LLM.
+# Whenever a prompt doesn't clearly match the rules, parse_intents returns None and the prompt goes through the agents
+
+@dataclass
+class SendIntent:
+    amount: float
+    token: str
+    receiver: str
+
+@dataclass
+class SwapIntent:
+    amount: float
+    token_in: str
+    token_out: str
+    exact_input: bool
+
+@dataclass
+class BalanceIntent:
+    token: str
+    owner: str | None # None for the smart account
+
+Intent = Union[SendIntent, SwapIntent, BalanceIntent]
+
+SEND_WORDS = {"send", "sending", "sent", "transfer", "transferring", "dispatch", "move", "forward", "forwarding", "pay", "payment", "allocate", "give"}
+SWAP_WORDS = {"swap", "swapping", "buy", "purchase", "convert", "converting", "conversion", "exchange", "trade", "sell", "acquire", "get", "turning"}
+# With these the first token is the one received, e.g. "buy 100 USDC with ETH"
+BUY_WORDS = {"buy", "purchase", "acquire", "get"}
+BALANCE_WORDS = {"balance", "balances"}
+
+# Token in comes before token out: "swap ETH for 100 USDC", token out comes before token in: "buy 100 USDC with ETH"
+IN_OUT_CONNECTORS = {"to", "for", "into"}
+OUT_IN_CONNECTORS = {"with", "using", "for"}
+RECEIVER_CONNECTORS = {"to", "for"}
+
+# Words allowed between an amount and its token, e.g. "100 units of USDC"
+AMOUNT_FILLERS = {"units", "of"}
+TOKEN_ALIASES = {"ethereum": "eth", "ether": "eth"}
+# A token followed by these is part of a description, e.g. "the Ethereum address 0x..."
+NOT_A_TOKEN_BEFORE = {"address", "wallet", "account", "network", "mainnet", "chain"}
+
+# Other words the rules understand, e.g. "Execute a transaction of 10 USDC to the following address: 0x...".
+# Any word that isn't known, like "never", "tomorrow" or "fees", sends the prompt through the agents
+FILLER_WORDS = {
+    "a", "an", "the", "my", "please", "execute", "transaction", "transactions", "one", "two", "three", "separate", "in",
+    "following", "coins", "tokens", "use", "what", "is", "check",
+}
+KNOWN_WORDS = (
+    SEND_WORDS | SWAP_WORDS | BALANCE_WORDS | IN_OUT_CONNECTORS | OUT_IN_CONNECTORS | RECEIVER_CONNECTORS
+    | AMOUNT_FILLERS | NOT_A_TOKEN_BEFORE | FILLER_WORDS
+)
+
+CLAUSE_SEPARATOR = re.compile(r"[,;!?]|\.(?=\s|$)|\b(?:and|then|next|finally|lastly|subsequently|followed by)\b", re.IGNORECASE)
+THOUSANDS_SEPARATOR = re.compile(r"(?<=\d),(?=\d{3}\b)")
+WORD_PATTERN = re.compile(r"0x[a-fA-F0-9]{40}\b|[\w-]+(?:\.[\w-]+)*\.eth\b|\d+(?:\.\d+)?|\.\d+|[\w'%$-]+")
+ADDRESS_PATTERN = re.compile(r"^(?:0x[a-fA-F0-9]{40}|[\w-]+(?:\.[\w-]+)*\.eth)$")
+AMOUNT_PATTERN = re.compile(r"^(?:\d+(?:\.\d+)?|\.\d+)$")
+
+def parse_intents(prompt: str, tokens: dict[str, str]) -> list[Intent] | None:
+    prompt = THOUSANDS_SEPARATOR.sub("", prompt)
+    intents: list[Intent] = []
+    kind: str | None = None
+
+    for clause in CLAUSE_SEPARATOR.split(prompt):
+        words = classify_words(WORD_PATTERN.findall(clause), tokens)
+        if words is None:
+            return None
+
+        result = parse_clause(words, kind)
+        if result is None:
+            return None
+
+        (kind, intent) = result
+        if intent:
+            intents.append(intent)
+
+    return intents if intents else None
+
+def classify_words(words: list[str], tokens: dict[str, str]) -> list[tuple[str, str]] | None:
+    # Every word becomes one of ("address", ...), ("amount", ...), ("token", symbol) or ("word", ...)
+    classified: list[tuple[str, str]] = []
+    for (i, word) in enumerate(words):
+        lower_word = word.lower()
+        symbol = TOKEN_ALIASES.get(lower_word, lower_word)
+        next_word = words[i + 1].lower() if i + 1 < len(words) else None
+
+        if AMOUNT_PATTERN.match(word):
+            classified.append(("amount", word))
+        elif ADDRESS_PATTERN.match(word):
+            classified.append(("address", word))
+        elif symbol in tokens and next_word not in NOT_A_TOKEN_BEFORE:
+            classified.append(("token", symbol))
+        elif symbol in tokens or lower_word in KNOWN_WORDS:
+            classified.append(("word", lower_word))
+        else:
+            return None
+
+    return classified
+
+def parse_clause(words: list[tuple[str, str]], previous_kind: str | None) -> tuple[str | None, Intent | None] | None:
+    amounts: list[tuple[float, str, int]] = [] # (amount, token, position of the token)
+    bare_tokens: list[tuple[str, int]] = []
+    addresses: list[tuple[str, int]] = []
+    amount_positions: set[int] = set()
+
+    for (i, (word_type, value)) in enumerate(words):
+        if word_type == "amount":
+            token_position = find_amount_token(words, i)
+            if token_position is None:
+                return None
+            amount = float(value)
+            if amount <= 0:
+                return None
+            amounts.append((amount, words[token_position][1], token_position))
+            amount_positions.add(token_position)
+        elif word_type == "address":
+            addresses.append((value, i))
+
+    for (i, (word_type, value)) in enumerate(words):
+        if word_type == "token" and i not in amount_positions:
+            bare_tokens.append((value, i))
+
+    # Clauses like "then" or "in two separate transactions"
+    if not amounts and not bare_tokens and not addresses:
+        return (previous_kind, None)
+
+    plain_words = {value for (word_type, value) in words if word_type == "word"}
+    kinds = [
+        kind for (kind, kind_words) in [("send", SEND_WORDS), ("swap", SWAP_WORDS), ("balance", BALANCE_WORDS)]
+        if plain_words & kind_words
+    ]
+    if len(kinds) > 1:
+        return None
+
+    kind = kinds[0] if kinds else previous_kind
+    if not kinds and addresses and amounts:
+        kind = "send"
+
+    if kind == "send":
+        intent = parse_send(words, amounts, bare_tokens, addresses)
+    elif kind == "swap":
+        intent = parse_swap(words, amounts, bare_tokens, addresses)
+    elif kind == "balance":
+        intent = parse_balance(amounts, bare_tokens, addresses)
+    else:
+        return None
+
+    return (kind, intent) if intent else None
+
+def find_amount_token(words: list[tuple[str, str]], position: int) -> int | None:
+    for i in range(position + 1, len(words)):
+        (word_type, value) = words[i]
+        if word_type == "token":
+            return i
+        if word_type != "word" or value not in AMOUNT_FILLERS:
+            return None
+    return None
+
+def parse_send(
+    words: list[tuple[str, str]], amounts: list[tuple[float, str, int]], bare_tokens: list[tuple[str, int]], addresses: list[tuple[str, int]]
+) -> SendIntent | None:
+    if len(amounts) != 1 or bare_tokens or len(addresses) != 1:
+        return None
+
+    (amount, token, token_position) = amounts[0]
+    (receiver, receiver_position) = addresses[0]
+
+    # "Send 10 USDC to 0x..." and not "Send 10 USDC from 0x..."
+    between = {value for (word_type, value) in words[token_position + 1:receiver_position] if word_type == "word"}
+    if receiver_position < token_position or not between & RECEIVER_CONNECTORS:
+        return None
+
+    return SendIntent(amount, token, receiver)
+
+def parse_swap(
+    words: list[tuple[str, str]], amounts: list[tuple[float, str, int]], bare_tokens: list[tuple[str, int]], addresses: list[tuple[str, int]]
+) -> SwapIntent | None:
+    # One side of the swap has to be given as an amount, the other one is quoted
+    if len(amounts) != 1 or len(bare_tokens) != 1 or addresses:
+        return None
+
+    (amount, amount_token, amount_position) = amounts[0]
+    (bare_token, bare_position) = bare_tokens[0]
+    if amount_token == bare_token:
+        return None
+
+    (first, second) = sorted([(amount_position, amount_token), (bare_position, bare_token)])
+
+    # The amount itself is skipped, "for 100 units of USDC" is connected by "for"
+    between = [
+        value for (word_type, value) in words[first[0] + 1:second[0]]
+        if word_type == "word" and value not in AMOUNT_FILLERS and value not in SWAP_WORDS
+    ]
+    if len(between) != 1:
+        return None
+
+    before_first = {value for (word_type, value) in words[:first[0]] if word_type == "word"}
+    if before_first & BUY_WORDS:
+        if between[0] not in OUT_IN_CONNECTORS:
+            return None
+        (token_out, token_in) = (first[1], second[1])
+    elif between[0] in IN_OUT_CONNECTORS:
+        (token_in, token_out) = (first[1], second[1])
+    elif between[0] in OUT_IN_CONNECTORS:
+        (token_out, token_in) = (first[1], second[1])
+    else:
+        return None
+
+    return SwapIntent(amount, token_in, token_out, exact_input=amount_token == token_in)
+
+def parse_balance(
+    amounts: list[tuple[float, str, int]], bare_tokens: list[tuple[str, int]], addresses: list[tuple[str, int]]
+) -> BalanceIntent | None:
+    if amounts or len(bare_tokens) != 1 or len(addresses) > 1:
+        return None
+
+    return BalanceIntent(bare_tokens[0][0], addresses[0][0] if addresses else None)
+
+def build_intent_transactions(intents: list[Intent], manager: SafeManager, tokens: dict[str, str]) -> list[PreparedTx]:
+    web3 = manager.client.w3
+    transactions: list[PreparedTx] = []
+
+    for intent in intents:
+        if isinstance(intent, SendIntent):
+            receiver = ETHAddress(intent.receiver, web3)
+            if receiver.hex is None:
+                raise Exception(f"Could not resolve {intent.receiver}")
+
+            token_address = tokens[intent.token]
+            if token_address == NATIVE_TOKEN_ADDRESS:
+                tx = build_transfer_eth(web3, ETHAddress(ADDRESS_ZERO, web3), receiver, intent.amount)
+            else:
+                tx = build_transfer_erc20(web3, token_address, receiver, intent.amount)
+
+            transactions.append(PreparedTx(f"Transfer {intent.amount} {intent.token.upper()} to {str(receiver)}", tx))
+        elif isinstance(intent, SwapIntent):
+            transactions.extend(
+                build_swap_transaction(
+                    manager.client,
+                    intent.amount,
+                    tokens[intent.token_in],
+                    tokens[intent.token_out],
+                    manager.address.hex,
+                    intent.exact_input,
+                )
+            )
+        else:
+            owner = ETHAddress(intent.owner, web3) if intent.owner else manager.address
+            if owner.hex is None:
+                raise Exception(f"Could not resolve {intent.owner}")
+
+            token_address = tokens[intent.token]
+            if token_address == NATIVE_TOKEN_ADDRESS:
+                balance = get_eth_balance(web3, owner)
+            else:
+                balance = get_erc20_balance(web3, ETHAddress(token_address, web3), owner)
+
+            print(f"Balance of {str(owner)}: {balance} {intent.token.upper()}")
+
+    return transactions
@@ -0,0 +1,108 @@
+from abc import ABC, abstractmethod
+import inspect
+import json
+from typing import Any
+
+from openai import Stream
+from openai.resources.chat.completions import Completions
+from openai.types.chat import ChatCompletionChunk
+
+# (event, key, value): ("field", key, string) for top level string fields, ("item", key, object) for every
+# object of a top level array and ("end", None, None) once the top level object is closed
+JsonEvent = tuple[str, str | None, Any]
+
+class JsonStreamParser:
+    # Parses a JSON object while it is streamed, so fields and array items can be used as soon as they are complete
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        # Open objects and arrays, "{" or "["
+        self.containers: list[str] = []
+        self.started = False
+        self.finished = False
+        self.in_string = False
+        self.escaped = False
+        self.string_start = 0
+        self.item_start = 0
+        self.key: str | None = None
+        self.expecting_value = False
+
+    def feed(self, text: str) -> list[JsonEvent]:
+        self.buffer += text
+        events: list[JsonEvent] = []
+
+        while self.position < len(self.buffer) and not self.finished:
+            char = self.buffer[self.position]
+
+            if not self.started:
+                # Anything before the object is ignored, like extract_json does
+                if char == "{":
+                    self.started = True
+                    self.containers.append(char)
+            elif self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                    if len(self.containers) == 1:
+                        value = json.loads(self.buffer[self.string_start:self.position + 1])
+                        if self.expecting_value:
+                            events.append(("field", self.key, value))
+                            self.expecting_value = False
+                        else:
+                            self.key = value
+            elif char == '"':
+                self.in_string = True
+                self.string_start = self.position
+            elif char == ":" and len(self.containers) == 1:
+                self.expecting_value = True
+            elif char == "," and len(self.containers) == 1:
+                self.expecting_value = False
+            elif char in "{[":
+                if len(self.containers) == 1:
+                    self.expecting_value = False
+                if self.containers == ["{", "["] and char == "{":
+                    self.item_start = self.position
+                self.containers.append(char)
+            elif char in "}]":
+                self.containers.pop()
+                if self.containers == ["{", "["] and char == "}":
+                    events.append(("item", self.key, json.loads(self.buffer[self.item_start:self.position + 1])))
+                elif not self.containers:
+                    self.finished = True
+                    events.append(("end", None, None))
+
+            self.position += 1
+
+        return events
+
+class JsonEventReader(ABC):
+    # Builds a result from the events of a streamed response, read_events stops reading once it is done
+
+    @abstractmethod
+    def add(self, event: JsonEvent) -> bool:
+        pass
+
+def stream_params(stream: bool) -> dict[str, Any]:
+    if not stream:
+        return {}
+    # Usage is only sent at the end of a stream when it is asked for. Older clients don't know stream_options,
+    # their streams are recorded with estimated usage by the LLM telemetry
+    if "stream_options" in inspect.signature(Completions.create).parameters:
+        return { "stream": True, "stream_options": { "include_usage": True } }
+    return { "stream": True }
+
+def read_events(response: Stream[ChatCompletionChunk], reader: JsonEventReader):
+    parser = JsonStreamParser()
+    try:
+        for chunk in response:
+            content = chunk.choices[0].delta.content if chunk.choices else None
+            for event in parser.feed(content or ""):
+                if reader.add(event):
+                    return
+    finally:
+        # Stops the completion early if the reader is done before the end of the response
+        response.close()
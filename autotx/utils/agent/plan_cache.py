@@ -0,0 +1,168 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import re
+from threading import Lock
+from typing import Any, Callable
+
+from autotx.utils.ethereum.cache import Cache, cache
+
+PLAN_CACHE_FILE_NAME = "plans.json"
+PLAN_CACHE_SIZE = 256
+# Addresses, ENS names and amounts, everything else has to match for a plan to be reused
+PARAMETER_PATTERN = re.compile(r"0x[a-fA-F0-9]{40}\b|\b[\w-]+(?:\.[\w-]+)*\.eth\b|(?<![\w.])\d+(?:\.\d+)?(?!\.?\w)")
+NUMBER_PATTERN = re.compile(r"\d+(?:\.\d+)?")
+# The word after an amount, its token or unit
+UNIT_PATTERN = re.compile(r"\s*([^\W\d][\w-]*)?")
+PLACEHOLDER_PATTERN = re.compile(r"<(param_\d+|user_address)>")
+THOUSANDS_SEPARATOR = re.compile(r"(?<=\d),(?=\d{3}\b)")
+
+class PlanCache:
+    max_entries: int
+
+    def __init__(self, cache: Cache, max_entries: int | None = None):
+        self.cache = cache
+        self.max_entries = int(os.getenv("PLAN_CACHE_SIZE") or PLAN_CACHE_SIZE) if max_entries is None else max_entries
+        self.entries: OrderedDict[str, str] | None = None  # key -> output with placeholders, least recently used first
+        self.lock = Lock()
+
+    def get_goal(self, prompt: str, agents_information: str, user_address: str) -> str | None:
+        return self.get("goal", prompt, agents_information, {"user_address": user_address}, is_json=False)
+
+    def put_goal(self, prompt: str, agents_information: str, user_address: str, goal: str):
+        self.put("goal", prompt, agents_information, {"user_address": user_address}, goal, is_json=False)
+
+    def get_tasks(self, goal: str, agents_information: str) -> str | None:
+        return self.get("tasks", goal, agents_information, {}, is_json=True)
+
+    def put_tasks(self, goal: str, agents_information: str, tasks: str):
+        self.put("tasks", goal, agents_information, {}, tasks, is_json=True)
+
+    def get(self, kind: str, text: str, agents_information: str, known: dict[str, str], is_json: bool) -> str | None:
+        if self.max_entries <= 0:
+            return None
+
+        (template, parameters) = parameterize(text, known)
+        key = plan_key(kind, template, agents_information)
+
+        with self.lock:
+            entries = self.load()
+            output = entries.get(key)
+            if output is None:
+                return None
+            entries.move_to_end(key)
+
+        return map_output(output, is_json, lambda value: fill_placeholders(value, parameters))
+
+    def put(self, kind: str, text: str, agents_information: str, known: dict[str, str], output: str, is_json: bool):
+        if self.max_entries <= 0:
+            return
+
+        (template, parameters) = parameterize(text, known)
+        literals = find_literals(text)
+        try:
+            output_template = map_output(output, is_json, lambda value: insert_placeholders(value, parameters, literals))
+        except Exception:
+            return
+
+        # A plan is only reusable if every value of the prompt can be found in it, otherwise a new value would be ignored
+        if any(f"<{name}>" not in output_template for name in parameters if name not in known):
+            return
+
+        key = plan_key(kind, template, agents_information)
+        with self.lock:
+            entries = self.load()
+            entries[key] = output_template
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+            self.cache.write(PLAN_CACHE_FILE_NAME, json.dumps(list(entries.items())))
+
+    def load(self) -> OrderedDict[str, str]:
+        if self.entries is None:
+            try:
+                self.entries = OrderedDict(json.loads(self.cache.read(PLAN_CACHE_FILE_NAME)))
+            except Exception:
+                self.entries = OrderedDict()
+        return self.entries
+
+    def clear(self):
+        with self.lock:
+            self.entries = OrderedDict()
+            self.cache.remove(PLAN_CACHE_FILE_NAME)
+
+def parameterize(text: str, known: dict[str, str]) -> tuple[str, dict[str, str]]:
+    # "Send 10 USDC to 0xabc" -> "send <param_0> usdc to <param_1>", the same value always gets the same placeholder
+    text = THOUSANDS_SEPARATOR.sub("", text)
+    parameters: dict[str, str] = dict(known)
+    names = {value.lower(): name for (name, value) in known.items()}
+
+    def replace(match: re.Match) -> str:
+        value = match.group(0)
+        if value.lower() not in names:
+            name = f"param_{len(parameters) - len(known)}"
+            names[value.lower()] = name
+            parameters[name] = value
+        return f"<{names[value.lower()]}>"
+
+    template = " ".join(PARAMETER_PATTERN.sub(replace, text).lower().split()).strip(" .!?")
+    return (template, parameters)
+
+def find_literals(text: str) -> set[tuple[str, str]]:
+    # "Send 10 USDC to 0xabc" -> {("10", "usdc"), ("0xabc", "")}
+    text = THOUSANDS_SEPARATOR.sub("", text)
+    return {literal(match) for match in PARAMETER_PATTERN.finditer(text)}
+
+def literal(match: re.Match) -> tuple[str, str]:
+    # Amounts are told apart by their unit, the "1" of "1 ETH" is not the one of "1 transaction"
+    value = match.group(0).lower()
+    if not NUMBER_PATTERN.fullmatch(value):
+        return (value, "")
+    unit = UNIT_PATTERN.match(match.string, match.end()).group(1)
+    return (value, (unit or "").lower())
+
+def insert_placeholders(text: str, parameters: dict[str, str], literals: set[tuple[str, str]]) -> str:
+    # Only literals found in the prompt become placeholders. An output that has a value of the prompt
+    # it didn't take from there, like "Send 1 ETH in 1 transaction", can't be reused with other values
+    if PLACEHOLDER_PATTERN.search(text):
+        raise Exception("Output already contains placeholders")
+
+    names = {value.lower(): name for (name, value) in parameters.items()}
+    # Values that aren't in the prompt, like the user's address, are always replaced
+    known_values = {value.lower() for value in parameters.values()} - {value for (value, _) in literals}
+
+    def replace(match: re.Match) -> str:
+        value = match.group(0)
+        if value.lower() not in names:
+            return value
+        if value.lower() not in known_values and literal(match) not in literals:
+            raise Exception(f"Value {value} of the output can't be traced to the prompt")
+        return f"<{names[value.lower()]}>"
+
+    return PARAMETER_PATTERN.sub(replace, THOUSANDS_SEPARATOR.sub("", text))
+
+def fill_placeholders(text: str, parameters: dict[str, str]) -> str:
+    return PLACEHOLDER_PATTERN.sub(lambda match: parameters.get(match.group(1), match.group(0)), text)
+
+def map_output(output: str, is_json: bool, map_string: Callable[[str], str]) -> str:
+    # Only the strings of a JSON output are changed, numbers like task context indices are kept as they are
+    if not is_json:
+        return map_string(output)
+
+    def map_value(value: Any) -> Any:
+        if isinstance(value, str):
+            return map_string(value)
+        elif isinstance(value, list):
+            return [map_value(item) for item in value]
+        elif isinstance(value, dict):
+            return {key: map_value(item) for (key, item) in value.items()}
+        return value
+
+    return json.dumps(map_value(json.loads(output)))
+
+def plan_key(kind: str, template: str, agents_information: str) -> str:
+    agents_hash = hashlib.sha256(agents_information.encode()).hexdigest()
+    return hashlib.sha256(f"{kind}\n{agents_hash}\n{template}".encode()).hexdigest()
+
+plan_cache = PlanCache(cache)
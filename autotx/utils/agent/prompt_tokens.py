@@ -0,0 +1,35 @@
+from functools import cache
+import os
+
+import tiktoken
+
+# Without the tokenizer files (e.g. offline) tokens are estimated from the length of the text
+CHARACTERS_PER_TOKEN = 4
+
+@cache
+def get_encoding() -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.encoding_for_model(os.environ.get("OPENAI_MODEL_NAME", "gpt-4-turbo-preview"))
+    except KeyError:
+        return get_base_encoding()
+    except Exception:
+        return None
+
+def get_base_encoding() -> tiktoken.Encoding | None:
+    try:
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+def count_tokens(text: str) -> int:
+    encoding = get_encoding()
+    if encoding is None:
+        return (len(text) + CHARACTERS_PER_TOKEN - 1) // CHARACTERS_PER_TOKEN
+    return len(encoding.encode(text))
+
+def print_token_report(report: dict[str, int]):
+    method = "counted" if get_encoding() else f"estimated at {CHARACTERS_PER_TOKEN} characters per token"
+    print(f"Prompt tokens per section ({method}):")
+    width = max(len(section) for section in report)
+    for (section, tokens) in report.items():
+        print(f"  {section.ljust(width)}  {tokens:>6}")
@@ -0,0 +1,50 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+import contextvars
+from typing import Callable
+
+from crewai import Task
+
+DEFAULT_MAX_PARALLEL_TASKS = 4
+
+def get_task_dependencies(tasks: list[Task]) -> list[list[int]]:
+    # The context of a task holds the tasks it was given by index in define_tasks
+    indices = {id(task): i for i, task in enumerate(tasks)}
+    return [[indices[id(context_task)] for context_task in (task.context or [])] for task in tasks]
+
+def chain_tasks_without_context(tasks: list[Task]):
+    # A task without context (None, unlike [] for a task that doesn't need any other) is given the output of the task
+    # before it, like crewAI's sequential process does. Every task runs in its own crew, so it is set on the task itself
+    for (previous_task, task) in zip(tasks, tasks[1:]):
+        if task.context is None:
+            task.context = [previous_task]
+
+def run_task_graph(tasks: list[Task], run_task: Callable[[int, Task], None], max_parallel_tasks: int = DEFAULT_MAX_PARALLEL_TASKS):
+    # Starts every task as soon as the tasks in its context are done, lowest index first.
+    # Tasks of the same agent never run at the same time, a crewAI agent keeps state for the task it executes
+    dependencies = get_task_dependencies(tasks)
+    done: set[int] = set()
+    running: dict[Future, int] = {}
+    busy_agents: set[int] = set()
+
+    with ThreadPoolExecutor(max_workers=max_parallel_tasks) as executor:
+        while len(done) < len(tasks):
+            for i, task in enumerate(tasks):
+                if i in done or i in running.values() or len(running) >= max_parallel_tasks:
+                    continue
+                if id(task.agent) in busy_agents or not all(dependency in done for dependency in dependencies[i]):
+                    continue
+
+                busy_agents.add(id(task.agent))
+                # Tasks run in a copy of the caller's context, e.g. for the LLM telemetry of the run
+                running[executor.submit(contextvars.copy_context().run, run_task, i, task)] = i
+
+            if not running:
+                raise Exception("Tasks can not be scheduled, their context has circular dependencies.")
+
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in sorted(finished, key=lambda future: running[future]):
+                i = running.pop(future)
+                busy_agents.discard(id(tasks[i].agent))
+                # Raises the error of a failed task, the running ones are awaited before leaving the executor
+                future.result()
+                done.add(i)
@@ -1,7 +1,9 @@
 import sys
+import threading
 from typing import Optional
 
 from web3 import Web3
+from web3.exceptions import ContractLogicError
 
 from autotx.utils.ethereum.get_eth_balance import get_eth_balance
 from autotx.utils.PreparedTx import PreparedTx
@@ -12,21 +14,40 @@ from .deploy_safe_with_create2 import deploy_safe_with_create2
 from .deploy_multicall import deploy_multicall
 from .get_erc20_balance import get_erc20_balance
 from .constants import MULTI_SEND_ADDRESS, GAS_PRICE_MULTIPLIER
+from .TxServiceClient import TxServiceClient
+from .fee_oracle import fee_oracle
 from eth_account import Account
 from gnosis.eth import EthereumClient, EthereumNetwork
 from gnosis.eth.constants import NULL_ADDRESS
 from gnosis.eth.multicall import Multicall
 from gnosis.safe import Safe, SafeOperation, SafeTx
+from gnosis.safe.exceptions import SafeServiceException
 from gnosis.safe.multi_send import MultiSend, MultiSendOperation, MultiSendTx
-from web3.types import TxParams
-from gnosis.safe.api import TransactionServiceApi
+from web3.logs import DISCARD
+from web3.types import TxParams, TxReceipt
+from hexbytes import HexBytes
 from gnosis.safe.api.base_api import SafeAPIException
 
 
+class SafeTxResult:
+    summary: str
+    safe_nonce: int
+    tx_hash: str | None
+    status: str # "success" | "reverted" | "cancelled"
+
+    def __init__(self, summary: str, safe_nonce: int, tx_hash: str | None, status: str):
+        self.summary = summary
+        self.safe_nonce = safe_nonce
+        self.tx_hash = tx_hash
+        self.status = status
+
+
 class SafeManager:
     multisend: MultiSend | None = None
     safe_nonce: int | None = None
     gas_multiplier: float | None = GAS_PRICE_MULTIPLIER
+    use_multisend: bool = True
+    tx_service: TxServiceClient | None = None
     dev_account: Account | None = None
     address: ETHAddress
 
@@ -38,6 +59,7 @@ class SafeManager:
     ):
         self.client = client
         self.web3 = self.client.w3
+        self.batch_lock = threading.Lock()
         self.agent = agent
         self.safe = safe
         self.use_tx_service = False
@@ -84,11 +106,15 @@ class SafeManager:
         self.use_tx_service = True
         self.network = network
         self.transaction_service_url = transaction_service_url
+        self.tx_service = TxServiceClient(network, ethereum_client=self.client, base_url=transaction_service_url)
     
     def disconnect_tx_service(self):
+        if self.tx_service:
+            self.tx_service.close()
         self.use_tx_service = False
         self.network = None
         self.transaction_service_url = None
+        self.tx_service = None
 
     def connect_multisend(self, address: str):
         self.multisend = MultiSend(self.client, address=address)
@@ -149,14 +175,30 @@ class SafeManager:
 
         safe_tx.call(tx_sender_address=self.dev_account.address)
 
-        tx_hash, _ = safe_tx.execute(
-            tx_sender_private_key=self.dev_account.key.hex()
-        )
+        tx_hash = self.submit_safe_tx(safe_tx)
 
         print(f"Executed safe tx hash: {tx_hash.hex()}")
 
         return tx_hash
 
+    def submit_safe_tx(self, safe_tx: SafeTx, tx_gas: Optional[int] = None, tx_nonce: Optional[int] = None, fee_params: Optional[TxParams] = None) -> HexBytes:
+        # Same as SafeTx.execute, but with the fees (EIP-1559 or legacy) coming from the fee oracle
+        tx_params: TxParams = {
+            "from": self.dev_account.address,
+            **(fee_params or fee_oracle.fee_params(self.web3)),
+        }
+        if tx_gas:
+            tx_params["gas"] = tx_gas
+        if tx_nonce is not None:
+            tx_params["nonce"] = tx_nonce
+
+        tx = safe_tx.w3_tx.build_transaction(tx_params)
+        tx["gas"] = tx_gas or max(tx["gas"] + 75000, safe_tx.recommended_gas())
+
+        return self.client.send_unsigned_transaction(
+            tx, private_key=self.dev_account.key.hex(), retry=tx_nonce is None
+        )
+
     def execute_multisend_tx(self, txs: list[TxParams], safe_nonce: Optional[int] = None):
         if not self.dev_account:
             raise ValueError("Dev account not set. This function should not be called in production.")
@@ -167,35 +209,40 @@ class SafeManager:
 
         safe_tx.call(tx_sender_address=self.dev_account.address)
 
-        tx_hash, _ = safe_tx.execute(
-            tx_sender_private_key=self.dev_account.key.hex()
-        )
+        tx_hash = self.submit_safe_tx(safe_tx)
+
+        print(f"Executed safe multisend tx hash: {tx_hash.hex()}")
 
         return tx_hash
     
     def post_transaction(self, tx: TxParams, safe_nonce: Optional[int] = None):
-        try:
-            ts_api = TransactionServiceApi(
-                self.network, ethereum_client=self.client, base_url=self.transaction_service_url
-            )
-
-            safe_tx = self.build_tx(tx, safe_nonce)
-            safe_tx.sign(self.agent.key.hex())
+        safe_tx = self.build_tx(tx, safe_nonce)
+        safe_tx.sign(self.agent.key.hex())
 
-            ts_api.post_transaction(safe_tx)
-        except SafeAPIException as e:
-            if "is not an owner or delegate" in str(e):
-                sys.exit(f"Agent with address {self.agent.address} is not a signer of the safe with address {self.address.hex}. Please add it and try again") 
+        self.post_safe_txs([safe_tx])
 
     def post_multisend_transaction(self, txs: list[TxParams], safe_nonce: Optional[int] = None):
-        ts_api = TransactionServiceApi(
-            self.network, ethereum_client=self.client, base_url=self.transaction_service_url
-        )
-
         tx = self.build_multisend_tx(txs, safe_nonce)
         tx.sign(self.agent.key.hex())
 
-        ts_api.post_transaction(tx)
+        self.post_safe_txs([tx])
+
+    def post_tx_groups(self, groups: list[list[PreparedTx]], start_nonce: int):
+        safe_txs: list[SafeTx] = []
+        for i, group in enumerate(groups):
+            safe_tx = self.build_tx_group(group, start_nonce + i)
+            safe_tx.sign(self.agent.key.hex())
+            safe_txs.append(safe_tx)
+
+        self.post_safe_txs(safe_txs)
+
+    def post_safe_txs(self, safe_txs: list[SafeTx]):
+        try:
+            self.tx_service.post_transactions(safe_txs)
+        except SafeAPIException as e:
+            if "is not an owner or delegate" in str(e):
+                sys.exit(f"Agent with address {self.agent.address} is not a signer of the safe with address {self.address.hex}. Please add it and try again")
+            raise
 
     def send_tx(self, tx: TxParams, safe_nonce: Optional[int] = None) -> str | None:
         if self.use_tx_service:
@@ -205,22 +252,217 @@ class SafeManager:
             hash = self.execute_tx(tx, safe_nonce)
             return hash.hex()
 
+    def send_multisend_tx(self, txs: list[TxParams], safe_nonce: Optional[int] = None) -> str | None:
+        if self.use_tx_service:
+            self.post_multisend_transaction(txs, safe_nonce)
+            return None
+        else:
+            hash = self.execute_multisend_tx(txs, safe_nonce)
+            return hash.hex()
+
+    def can_pack_tx(self, tx: TxParams) -> bool:
+        # Contract creations (no "to") can not be delegate-called through MultiSend
+        return self.multisend is not None and bool(tx.get("to"))
+
+    def group_txs(self, txs: list[PreparedTx]) -> list[list[PreparedTx]]:
+        if not self.use_multisend:
+            return [[tx] for tx in txs]
+
+        # Consecutive packable transactions are merged into one MultiSend batch, order is preserved
+        groups: list[list[PreparedTx]] = []
+        for tx in txs:
+            if groups and self.can_pack_tx(tx.tx) and self.can_pack_tx(groups[-1][-1].tx):
+                groups[-1].append(tx)
+            else:
+                groups.append([tx])
+
+        return groups
+
+    def build_tx_group(self, group: list[PreparedTx], safe_nonce: int) -> SafeTx:
+        if len(group) == 1:
+            return self.build_tx(group[0].tx, safe_nonce)
+
+        safe_tx = self.build_multisend_tx([prepared_tx.tx for prepared_tx in group], safe_nonce)
+        safe_tx.safe_tx_gas = self.safe.estimate_tx_gas(safe_tx.to, safe_tx.value, safe_tx.data, safe_tx.operation)
+        safe_tx.base_gas = self.safe.estimate_tx_base_gas(safe_tx.to, safe_tx.value, safe_tx.data, safe_tx.operation, NULL_ADDRESS, safe_tx.safe_tx_gas)
+
+        return safe_tx
+
+    def execute_tx_pipeline(self, groups: list[list[PreparedTx]], start_nonce: int) -> list[SafeTxResult]:
+        safe_txs = self.build_tx_pipeline(groups, start_nonce)
+        if safe_txs is None:
+            return self.execute_tx_groups(groups, start_nonce)
+
+        (tx_hashes, sender_nonce, fee_params) = self.submit_tx_pipeline(safe_txs, start_nonce)
+
+        results: list[SafeTxResult] = []
+        failed = False
+        for i, (group, tx_hash) in enumerate(zip(groups, tx_hashes)):
+            if failed:
+                status = self.cancel_pending_tx(tx_hash, sender_nonce + i, fee_params)
+            else:
+                receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+                status = "success" if self.is_successful_receipt(receipt) else "reverted"
+                failed = status != "success"
+
+            results.extend(
+                SafeTxResult(prepared_tx.summary, start_nonce + i, tx_hash.hex(), status) for prepared_tx in group
+            )
+
+        return results
+
+    def build_tx_pipeline(self, groups: list[list[PreparedTx]], start_nonce: int) -> list[SafeTx] | None:
+        # Everything is built and signed before anything is submitted, so a failing estimation sends nothing.
+        # Returns None when a group can only be estimated once the groups before it are mined, e.g. a swap after its approval
+        if not self.dev_account:
+            raise ValueError("Dev account not set. This function should not be called in production.")
+
+        safe_txs: list[SafeTx] = []
+        for i, group in enumerate(groups):
+            try:
+                safe_tx = self.build_tx_group(group, start_nonce + i)
+            except Exception as e:
+                if i == 0 or not is_revert_error(e):
+                    raise
+                print(f"Transaction {i + 1} depends on the ones before it ({e}), executing the transactions one at a time")
+                return None
+            safe_tx.sign(self.agent.key.hex())
+            safe_txs.append(safe_tx)
+
+        return safe_txs
+
+    def execute_tx_groups(self, groups: list[list[PreparedTx]], start_nonce: int) -> list[SafeTxResult]:
+        # Each group is built, estimated and simulated once the groups before it are mined
+        results: list[SafeTxResult] = []
+        failed = False
+        for i, group in enumerate(groups):
+            tx_hash: HexBytes | None = None
+            if failed:
+                status = "cancelled"
+            else:
+                try:
+                    safe_tx = self.build_tx_group(group, start_nonce + i)
+                    safe_tx.sign(self.agent.key.hex())
+                    safe_tx.call(tx_sender_address=self.dev_account.address)
+                except Exception as e:
+                    if not is_revert_error(e):
+                        raise
+                    # It would revert, so it is not sent
+                    print(f"Transaction {i + 1} can not be executed: {e}")
+                    status = "reverted"
+                else:
+                    tx_hash = self.submit_safe_tx(safe_tx)
+                    print(f"Executed safe tx hash: {tx_hash.hex()} (nonce: {start_nonce + i})")
+                    receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+                    status = "success" if self.is_successful_receipt(receipt) else "reverted"
+                failed = status != "success"
+
+            results.extend(
+                SafeTxResult(prepared_tx.summary, start_nonce + i, tx_hash.hex() if tx_hash else None, status) for prepared_tx in group
+            )
+
+        return results
+
+    def submit_tx_pipeline(self, safe_txs: list[SafeTx], start_nonce: int) -> tuple[list[HexBytes], int, TxParams]:
+        # Only the first transaction can be simulated, the rest depend on nonces that are not yet on chain
+        safe_txs[0].call(tx_sender_address=self.dev_account.address)
+
+        sender_nonce = self.web3.eth.get_transaction_count(self.dev_account.address, block_identifier="pending")
+        fee_params = fee_oracle.fee_params(self.web3)
+
+        tx_hashes: list[HexBytes] = []
+        for i, safe_tx in enumerate(safe_txs):
+            tx_hash = self.submit_safe_tx(
+                safe_tx,
+                tx_gas=safe_tx.recommended_gas(),
+                tx_nonce=sender_nonce + i,
+                fee_params=fee_params,
+            )
+            print(f"Submitted safe tx hash: {tx_hash.hex()} (nonce: {start_nonce + i})")
+            tx_hashes.append(tx_hash)
+
+        return (tx_hashes, sender_nonce, fee_params)
+
+    def cancel_pending_tx(self, tx_hash: HexBytes, sender_nonce: int, fee_params: TxParams) -> str:
+        signed_tx = self.sign_cancel_tx(sender_nonce, fee_params)
+
+        try:
+            cancel_hash = self.web3.eth.send_raw_transaction(signed_tx.rawTransaction)
+        except ValueError:
+            # The original transaction has already been mined
+            receipt = self.web3.eth.wait_for_transaction_receipt(tx_hash)
+            return "success" if self.is_successful_receipt(receipt) else "reverted"
+
+        self.web3.eth.wait_for_transaction_receipt(cancel_hash)
+
+        return "cancelled"
+
+    def sign_cancel_tx(self, sender_nonce: int, fee_params: TxParams):
+        # Replaces the pending transaction with an empty one from the same sender and nonce.
+        # A legacy gas price of twice the original max fee outbids both legacy and EIP-1559 transactions
+        max_fee = fee_params.get("maxFeePerGas", fee_params.get("gasPrice"))
+        cancel_tx: TxParams = {
+            "from": self.dev_account.address,
+            "to": self.dev_account.address,
+            "value": 0,
+            "gas": 21000,
+            "gasPrice": max_fee * 2,
+            "nonce": sender_nonce,
+            "chainId": self.client.get_chain_id(),
+        }
+        return self.dev_account.sign_transaction(cancel_tx)
+
+    def is_successful_receipt(self, receipt: TxReceipt) -> bool:
+        if receipt["status"] != 1:
+            return False
+
+        # The Safe does not revert when the inner call fails if safe_tx_gas is set, it emits ExecutionFailure instead
+        failures = self.safe.contract.events.ExecutionFailure().process_receipt(receipt, errors=DISCARD)
+
+        return len(failures) == 0
+
     def send_tx_batch(self, txs: list[PreparedTx], require_approval: bool, safe_nonce: Optional[int] = None) -> bool: # Returns true if successful
         if not txs:
             print("No transactions to send.")
             return True
 
+        # Batches of runs in other threads on the same Safe are sent one after the other, so their nonces don't collide
+        with self.batch_lock:
+            (start_nonce, groups) = self.prepare_tx_batch(txs, safe_nonce)
+
+            if not self.confirm_tx_batch(require_approval):
+                return False
+
+            if self.use_tx_service:
+                print("Sending transactions to your smart account...")
+
+                self.post_tx_groups(groups, start_nonce)
+
+                return self.finish_tx_batch_posting(groups, start_nonce, safe_nonce)
+            else:
+                print("Executing transactions...")
+
+                results = self.execute_tx_pipeline(groups, start_nonce)
+
+                return self.finish_tx_batch_execution(results, groups, start_nonce, safe_nonce)
+
+    def prepare_tx_batch(self, txs: list[PreparedTx], safe_nonce: Optional[int] = None) -> tuple[int, list[list[PreparedTx]]]:
         start_nonce = self.track_nonce(safe_nonce)
+        groups = self.group_txs(txs)
 
+        nonces = [start_nonce + i for i, group in enumerate(groups) for _ in group]
         transactions_info = "\n".join(
             [
-                f"{i + 1}. {tx.summary} (nonce: {start_nonce + i})"
+                f"{i + 1}. {tx.summary} (nonce: {nonces[i]})"
                 for i, tx in enumerate(txs)
             ]
         )
 
         print(f"Batched transactions:\n{transactions_info}")
 
+        return (start_nonce, groups)
+
+    def confirm_tx_batch(self, require_approval: bool) -> bool:
         if self.use_tx_service:
             if require_approval:
                 response = input("Do you want the above transactions to be sent to your smart account? (y/n): ")
@@ -230,16 +472,6 @@ class SafeManager:
                     return False
             else:
                 print("Non-interactive mode enabled. Transactions will be sent to your smart account without approval.")
-
-            print("Sending transactions to your smart account...")
-
-
-            for i, tx in enumerate([prepared_tx.tx for prepared_tx in txs]):
-                self.send_tx(tx, start_nonce + i)
-
-            print("Transactions sent to your smart account for signing.")
-            
-            return True
         else:
             if require_approval:
                 response = input("Do you want to execute the above transactions? (y/n): ")
@@ -250,14 +482,33 @@ class SafeManager:
             else:
                 print("Non-interactive mode enabled. Transactions will be executed without approval.")
 
-            print("Executing transactions...")
+        return True
 
-            for i, tx in enumerate([prepared_tx.tx for prepared_tx in txs]):
-                self.send_tx(tx, start_nonce + i)
-        
-            print("Transactions executed.")
+    def finish_tx_batch_posting(self, groups: list[list[PreparedTx]], start_nonce: int, safe_nonce: Optional[int]) -> bool:
+        if safe_nonce is None:
+            self.safe_nonce = start_nonce + len(groups) - 1
 
-            return True
+        print("Transactions sent to your smart account for signing.")
+
+        return True
+
+    def finish_tx_batch_execution(self, results: list[SafeTxResult], groups: list[list[PreparedTx]], start_nonce: int, safe_nonce: Optional[int]) -> bool:
+        for i, result in enumerate(results):
+            print(f"{i + 1}. {result.summary} (nonce: {result.safe_nonce}): {result.status}")
+
+        success = all(result.status == "success" for result in results)
+
+        if safe_nonce is None:
+            # After a failure the on-chain nonce is the only reliable source
+            self.safe_nonce = start_nonce + len(groups) - 1 if success else None
+
+        if not success:
+            print("Transactions execution failed.")
+            return False
+
+        print("Transactions executed.")
+
+        return True
 
     def send_empty_tx(self, safe_nonce: Optional[int] = None):
         tx: TxParams = {
@@ -282,7 +533,8 @@ class SafeManager:
         return self.safe.retrieve_nonce()
     
     def gas_price(self) -> int:
-        return self.web3.eth.gas_price if self.gas_multiplier is None else int(self.web3.eth.gas_price * self.gas_multiplier)
+        gas_price = fee_oracle.gas_price(self.web3)
+        return gas_price if self.gas_multiplier is None else int(gas_price * self.gas_multiplier)
 
     def track_nonce(self, safe_nonce: Optional[int] = None) -> int:
         if safe_nonce is None:
@@ -297,3 +549,10 @@ class SafeManager:
     @staticmethod
     def is_valid_safe(client: EthereumClient, address: ETHAddress) -> bool:
         return is_valid_safe(client, address)
+
+def is_revert_error(error: Exception) -> bool:
+    # Estimation and simulation failures of a transaction, connection errors and timeouts of the node are not
+    if isinstance(error, (ContractLogicError, SafeServiceException)):
+        return True
+    # Nodes report reverts as RPC errors, which web3 raises as a ValueError
+    return isinstance(error, ValueError) and "revert" in str(error).lower()
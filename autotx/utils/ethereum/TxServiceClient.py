@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import BoundedSemaphore
+from typing import Optional
+
+import requests
+from gnosis.eth import EthereumClient, EthereumNetwork
+from gnosis.safe import SafeTx
+from gnosis.safe.api import TransactionServiceApi
+from urllib3.util.retry import Retry
+
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+class TxServiceClient(TransactionServiceApi):
+    max_concurrency: int
+    max_retries: int
+    backoff_factor: float
+    require_nonce_order: bool
+
+    def __init__(
+        self,
+        network: EthereumNetwork,
+        ethereum_client: Optional[EthereumClient] = None,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        require_nonce_order: bool = False,
+    ):
+        # Needed by `_prepare_http_session`, which is called from the base constructor
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.require_nonce_order = require_nonce_order
+        self.semaphore = BoundedSemaphore(max_concurrency)
+
+        super().__init__(network, ethereum_client=ethereum_client, base_url=base_url)
+
+    def _prepare_http_session(self) -> requests.Session:
+        retry = Retry(
+            total=self.max_retries,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=["GET", "POST", "DELETE"],
+            backoff_factor=self.backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.max_concurrency,
+            pool_block=True,
+            max_retries=retry,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _get_request(self, url: str) -> requests.Response:
+        with self.semaphore:
+            return super()._get_request(url)
+
+    def _post_request(self, url: str, payload: dict) -> requests.Response:
+        with self.semaphore:
+            return super()._post_request(url, payload)
+
+    def _delete_request(self, url: str, payload: dict) -> requests.Response:
+        with self.semaphore:
+            return super()._delete_request(url, payload)
+
+    def post_transactions(self, safe_txs: list[SafeTx]):
+        safe_txs = sorted(safe_txs, key=lambda safe_tx: safe_tx.safe_nonce)
+
+        if self.require_nonce_order or len(safe_txs) <= 1:
+            for safe_tx in safe_txs:
+                self.post_transaction(safe_tx)
+            return
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = [executor.submit(self.post_transaction, safe_tx) for safe_tx in safe_txs]
+
+        # Errors are surfaced in nonce order, the first failing nonce wins
+        for future in futures:
+            future.result()
+
+    def close(self):
+        self.http_session.close()
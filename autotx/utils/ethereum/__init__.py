@@ -9,6 +9,7 @@ from .transfer_erc20 import transfer_erc20
 from .build_transfer_eth import build_transfer_eth
 from .build_transfer_erc20 import build_transfer_erc20
 from .get_erc20_balance import get_erc20_balance
+from .get_balances import get_balances
 from .SafeManager import SafeManager
 from .load_w3 import load_w3
 from .build_approve_erc20 import build_approve_erc20
@@ -28,6 +29,7 @@ __all__ = [
     "build_transfer_erc20",
     "build_approve_erc20",
     "get_erc20_balance",
+    "get_balances",
     "get_erc20_info",
     "SafeManager",
     "load_w3",
@@ -2,16 +2,17 @@ from web3 import Web3
 from web3.types import TxParams
 
 from autotx.utils.ethereum.eth_address import ETHAddress
-from .constants import GAS_PRICE_MULTIPLIER
+from .fee_oracle import fee_oracle
 from .erc20_abi import ERC20_ABI
+from .token_metadata import token_metadata
 
 def build_transfer_erc20(web3: Web3, token_address: str, to: ETHAddress, value: float):
     erc20 = web3.eth.contract(address=token_address, abi=ERC20_ABI)
-    decimals = erc20.functions.decimals().call()
+    decimals = token_metadata.decimals(web3, token_address)
     tx: TxParams = erc20.functions.transfer(
         to.hex, int(value * 10**decimals)
     ).build_transaction(
-        {"gas": None, "gasPrice": web3.eth.gas_price * GAS_PRICE_MULTIPLIER}
+        {"gas": None, **fee_oracle.fee_params(web3)}
     )
 
     return tx
@@ -1,13 +1,16 @@
 import os
 from typing import Optional
 
+CACHE_DIR = ".cache"
+
 
 class Cache:
     folder: str = None
 
-    def __init__(self, folder: Optional[str] = ".cache"):
-        self.folder = folder
-        os.makedirs(folder, exist_ok=True)
+    # Defaults to the CACHE_DIR env variable, e.g. to isolate parallel benchmark workers
+    def __init__(self, folder: Optional[str] = None):
+        self.folder = folder or os.getenv("CACHE_DIR") or CACHE_DIR
+        os.makedirs(self.folder, exist_ok=True)
 
     def read(self, file_name: str) -> str | None:
         try:
@@ -1,3 +1,4 @@
+import os
 from gnosis.eth import EthereumNetwork
 
 MASTER_COPY_ADDRESS = "0xd9Db270c1B5E3Bd161E8c8503c55cEABeE709552"
@@ -5,7 +6,9 @@ MASTER_COPY_L2_ADDRESS = "0xfb1bffC9d739B8D520DaF37dF666da4C687191EA"
 PROXY_FACTORY_ADDRESS = "0xa6B71E26C5e0845f74c812102Ca7114b6a896AB2"
 MULTI_SEND_ADDRESS = "0xA238CBeb142c10Ef7Ad8442C6D1f9E89e07e7761"
 GAS_PRICE_MULTIPLIER = 1.1
-FORK_RPC_URL = "http://localhost:8545"
+# Set FORK_PORT in the environment to use a fork on another port, e.g. for parallel test shards
+FORK_PORT = int(os.getenv("FORK_PORT") or 8545)
+FORK_RPC_URL = f"http://localhost:{FORK_PORT}"
 NATIVE_TOKEN_ADDRESS = "0xEeeeeEeeeEeEeeEeEeEeeEEEeeeeEeeeeeeeEEeE"
 
 class NetworkInfo:
@@ -6,6 +6,7 @@ from gnosis.safe.safe_create2_tx import SafeCreate2TxBuilder
 
 
 from .send_tx import send_tx
+from .fee_oracle import fee_oracle
 from .constants import GAS_PRICE_MULTIPLIER, MASTER_COPY_ADDRESS, PROXY_FACTORY_ADDRESS
 
 def deploy_safe_with_create2(client: EthereumClient, account: Account, signers: list[str], threshold: int) -> str:
@@ -45,7 +46,7 @@ def deploy_safe_with_create2(client: EthereumClient, account: Account, signers:
         {
             "to": safe_creation_tx.safe_address,
             "value": safe_creation_tx.payment,
-            "gasPrice": int(w3.eth.gas_price * GAS_PRICE_MULTIPLIER)
+            **fee_oracle.fee_params(w3),
         },
         account=account,
     )
@@ -58,7 +59,7 @@ def deploy_safe_with_create2(client: EthereumClient, account: Account, signers:
         safe_creation_tx.safe_setup_data,
         salt_nonce,
         safe_creation_tx.gas,
-        int(w3.eth.gas_price * GAS_PRICE_MULTIPLIER),
+        int(fee_oracle.gas_price(w3) * GAS_PRICE_MULTIPLIER),
     )
 
     print("Deploying safe address: ", safe_address, ", tx: ", ethereum_tx_sent.tx_hash.hex())
@@ -0,0 +1,160 @@
+import json
+import re
+import time
+from threading import Lock
+from typing import Any
+
+from ens import abis
+from ens.utils import is_none_or_zero_address, normal_name_to_hash, normalize_name
+from gnosis.eth import EthereumClient
+from web3 import Web3
+from web3.contract.contract import ContractFunction
+from web3.exceptions import ContractLogicError
+
+from .cache import Cache, cache
+from .fee_oracle import provider_key
+
+ENS_CACHE_FILE_NAME = "ens.json"
+ENS_TTL = 24 * 60 * 60
+# Unresolved names are retried sooner, they may be registered or configured in the meantime
+ENS_NEGATIVE_TTL = 10 * 60
+ENS_NAME_PATTERN = re.compile(r"\b[\w-]+(?:\.[\w-]+)*\.eth\b")
+
+class EnsCache:
+    ttl: float
+    negative_ttl: float
+
+    def __init__(self, cache: Cache, ttl: float = ENS_TTL, negative_ttl: float = ENS_NEGATIVE_TTL):
+        self.cache = cache
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.entries: dict[str, dict[str, Any]] | None = None  # "chain_id:name" -> {"address", "resolved_at"}
+        self.chain_ids: dict[str | int, int] = {}
+        self.lock = Lock()
+
+    def resolve(self, web3: Web3, name: str) -> str | None:
+        chain_id = self.chain_id(web3)
+        normal_name = normalize_name(name)
+
+        (found, address) = self.lookup(chain_id, normal_name)
+        if found:
+            return address
+
+        address = web3.ens.address(normal_name)
+        self.store(chain_id, {normal_name: address})
+
+        return address
+
+    def resolve_many(self, client: EthereumClient, names: list[str]) -> dict[str, str | None]:
+        # Names that are not cached are resolved together, see query_addresses
+        chain_id = self.chain_id(client.w3)
+        addresses: dict[str, str | None] = {}
+        missing_names: list[str] = []
+
+        for name in dict.fromkeys(normalize_name(name) for name in names):
+            (found, address) = self.lookup(chain_id, name)
+            if found:
+                addresses[name] = address
+            else:
+                missing_names.append(name)
+
+        if missing_names:
+            resolved_addresses = query_addresses(client, missing_names)
+            self.store(chain_id, resolved_addresses)
+            addresses.update(resolved_addresses)
+
+        return addresses
+
+    def lookup(self, chain_id: int, name: str) -> tuple[bool, str | None]:
+        with self.lock:
+            entry = self.load().get(f"{chain_id}:{name}")
+
+        if not entry:
+            return (False, None)
+
+        ttl = self.ttl if entry["address"] else self.negative_ttl
+        if time.time() - entry["resolved_at"] >= ttl:
+            return (False, None)
+
+        return (True, entry["address"])
+
+    def store(self, chain_id: int, addresses: dict[str, str | None]):
+        with self.lock:
+            entries = self.load()
+            for name, address in addresses.items():
+                entries[f"{chain_id}:{name}"] = {"address": address, "resolved_at": time.time()}
+            self.cache.write(ENS_CACHE_FILE_NAME, json.dumps(entries))
+
+    def chain_id(self, web3: Web3) -> int:
+        key = provider_key(web3)
+        if key not in self.chain_ids:
+            self.chain_ids[key] = web3.eth.chain_id
+        return self.chain_ids[key]
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        if self.entries is None:
+            try:
+                self.entries = json.loads(self.cache.read(ENS_CACHE_FILE_NAME))
+            except Exception:
+                self.entries = {}
+        return self.entries
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self.cache.remove(ENS_CACHE_FILE_NAME)
+
+
+def find_ens_names(text: str) -> list[str]:
+    return ENS_NAME_PATTERN.findall(text)
+
+
+def query_addresses(client: EthereumClient, names: list[str]) -> dict[str, str | None]:
+    # Looks up the resolvers of all names in one eth_call and then their addresses in another.
+    # Names without their own resolver (wildcards) or with an offchain resolver go through web3.ens
+    web3 = client.w3
+    nodes = [normal_name_to_hash(name) for name in names]
+    registry = web3.eth.contract(address=web3.ens.ens.address, abi=abis.ENS)
+
+    resolver_addresses = call_functions(client, [registry.functions.resolver(node) for node in nodes])
+
+    resolved_names = [
+        (name, node, resolver_address)
+        for name, node, resolver_address in zip(names, nodes, resolver_addresses)
+        if not is_none_or_zero_address(resolver_address)
+    ]
+    results = call_functions(client, [
+        web3.eth.contract(address=resolver_address, abi=abis.PUBLIC_RESOLVER_2).functions.addr(node)
+        for (_, node, resolver_address) in resolved_names
+    ])
+
+    addresses: dict[str, str | None] = {}
+    for (name, _, _), address in zip(resolved_names, results):
+        if address is not None:
+            addresses[name] = None if is_none_or_zero_address(address) else Web3.to_checksum_address(address)
+
+    for name in names:
+        if name not in addresses:
+            addresses[name] = web3.ens.address(name)
+
+    return addresses
+
+
+def call_functions(client: EthereumClient, functions: list[ContractFunction]) -> list[Any]:
+    if not functions:
+        return []
+
+    if client.multicall:
+        results = client.multicall.try_aggregate(functions)
+        return [result.return_data_decoded if result.success else None for result in results]
+
+    results = []
+    for function in functions:
+        try:
+            results.append(function.call())
+        except (ContractLogicError, ValueError):
+            results.append(None)
+    return results
+
+
+ens_cache = EnsCache(cache)
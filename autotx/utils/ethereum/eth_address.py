@@ -1,18 +1,27 @@
+from functools import lru_cache
 from web3 import Web3
 
+from autotx.utils.ethereum.ens_cache import ens_cache
+
 class ETHAddress:
     hex: str
     ens_domain: str | None
 
     def __init__(self, hex_or_ens: str, web3: Web3):
         if hex_or_ens.endswith(".eth"):
-            self.hex = web3.ens.address(hex_or_ens)
+            self.hex = ens_cache.resolve(web3, hex_or_ens)
             self.ens_domain = hex_or_ens
-        elif Web3.is_address(hex_or_ens):
-            self.hex = Web3.to_checksum_address(hex_or_ens)
-            self.ens_domain = None
         else:
-            raise ValueError(f"Invalid address: {hex_or_ens}")
-        
+            checksum_address = to_checksum_address(hex_or_ens)
+            if checksum_address is None:
+                raise ValueError(f"Invalid address: {hex_or_ens}")
+            self.hex = checksum_address
+            self.ens_domain = None
+
     def __repr__(self) -> str:
         return f"{self.ens_domain}({self.hex})" if self.ens_domain else self.hex
+
+@lru_cache(maxsize=1024)
+def to_checksum_address(address: str) -> str | None:
+    # Checksumming hashes the address, the same few addresses are checksummed over and over
+    return Web3.to_checksum_address(address) if Web3.is_address(address) else None
@@ -0,0 +1,102 @@
+import os
+from statistics import median
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable
+
+from web3 import Web3
+from web3.types import FeeHistory, TxParams
+
+from .constants import GAS_PRICE_MULTIPLIER
+
+# Roughly one mainnet block, within this window the cached values are used without any RPC
+DEFAULT_TTL = 12.0
+FEE_HISTORY_BLOCK_COUNT = 10
+PRIORITY_FEE_PERCENTILE = 50
+# Headroom for the base fee to rise before the transaction is included (each full block raises it by 12.5%)
+BASE_FEE_MULTIPLIER = 2
+
+
+class FeeOracle:
+    ttl: float
+    mode: str | None # "eip1559" | "legacy", defaults to the FEE_MODE env variable
+
+    def __init__(self, ttl: float = DEFAULT_TTL, mode: str | None = None):
+        self.ttl = ttl
+        self.mode = mode
+        self.entries: dict[tuple, tuple[int, float, Any]] = {}  # key -> (block number, fetched at, value)
+        self.lock = Lock()
+
+    def gas_price(self, web3: Web3) -> int:
+        return self.get(web3, ("gas_price",), lambda: web3.eth.gas_price)
+
+    def fee_history(self, web3: Web3, block_count: int, reward_percentiles: list[float]) -> FeeHistory:
+        return self.get(
+            web3,
+            ("fee_history", block_count, tuple(reward_percentiles)),
+            lambda: web3.eth.fee_history(block_count, "latest", reward_percentiles),
+        )
+
+    def fee_params(self, web3: Web3) -> TxParams:
+        mode = self.mode or os.getenv("FEE_MODE") or "eip1559"
+        if mode == "eip1559":
+            fees = self.eip1559_fees(web3)
+            if fees:
+                return fees
+
+        return {"gasPrice": int(self.gas_price(web3) * GAS_PRICE_MULTIPLIER)}
+
+    def eip1559_fees(self, web3: Web3) -> TxParams | None:
+        try:
+            history = self.fee_history(web3, FEE_HISTORY_BLOCK_COUNT, [PRIORITY_FEE_PERCENTILE])
+        except ValueError:
+            # Node does not support eth_feeHistory
+            return None
+
+        # The last entry is the base fee of the next block, missing on chains without EIP-1559
+        base_fees = history.get("baseFeePerGas") or []
+        if not base_fees or not base_fees[-1]:
+            return None
+
+        rewards = [reward[0] for reward in history.get("reward") or [] if reward]
+        priority_fee = int(median(rewards)) if rewards else 0
+
+        return {
+            "maxFeePerGas": base_fees[-1] * BASE_FEE_MULTIPLIER + priority_fee,
+            "maxPriorityFeePerGas": priority_fee,
+        }
+
+    def get(self, web3: Web3, key: tuple, fetch: Callable[[], Any]) -> Any:
+        key = (provider_key(web3),) + key
+        now = monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+        if entry and now - entry[1] < self.ttl:
+            return entry[2]
+
+        # Past the TTL the value is still valid as long as no new block has been mined
+        block_number = web3.eth.block_number
+        if entry and entry[0] == block_number:
+            with self.lock:
+                self.entries[key] = (block_number, now, entry[2])
+            return entry[2]
+
+        value = fetch()
+        with self.lock:
+            self.entries[key] = (block_number, now, value)
+
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+def provider_key(web3: Web3) -> str | int:
+    # Different Web3 instances pointing to the same node share cached values
+    return getattr(web3.provider, "endpoint_uri", None) or id(web3.provider)
+
+
+fee_oracle = FeeOracle()
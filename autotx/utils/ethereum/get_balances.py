@@ -0,0 +1,79 @@
+from gnosis.eth import EthereumClient
+from web3 import Web3
+
+from autotx.utils.ethereum.eth_address import ETHAddress
+from .constants import NATIVE_TOKEN_ADDRESS, NetworkInfo
+from .erc20_abi import ERC20_ABI
+from .token_metadata import token_metadata
+
+def get_balances(client: EthereumClient, network: NetworkInfo, addresses: list[ETHAddress]) -> dict[str, dict[str, float]]:
+    # Returns balances by address and token symbol, the native token included
+    web3 = client.w3
+    native_symbol = next((symbol for symbol, address in network.tokens.items() if address == NATIVE_TOKEN_ADDRESS), "eth")
+    tokens = {
+        symbol: Web3.to_checksum_address(address)
+        for symbol, address in network.tokens.items()
+        if address != NATIVE_TOKEN_ADDRESS
+    }
+
+    if client.multicall:
+        raw_balances = get_raw_balances_with_multicall(client, list(tokens.values()), addresses)
+    else:
+        raw_balances = get_raw_balances_with_batch_request(client, list(tokens.values()), addresses)
+
+    balances: dict[str, dict[str, float]] = {}
+    for address, (eth_balance, *token_balances) in zip(addresses, raw_balances):
+        balances[address.hex] = {native_symbol: eth_balance / 10 ** 18}
+        for (symbol, token_address), balance in zip(tokens.items(), token_balances):
+            balances[address.hex][symbol] = balance / 10 ** token_metadata.decimals(web3, token_address)
+
+    return balances
+
+def get_raw_balances_with_multicall(client: EthereumClient, tokens: list[str], addresses: list[ETHAddress]) -> list[list[int]]:
+    # A single eth_call to the Multicall contract, which can also read ETH balances
+    web3 = client.w3
+    multicall = client.multicall
+    functions = []
+    for address in addresses:
+        functions.append(multicall.contract.functions.getEthBalance(address.hex))
+        functions.extend(
+            web3.eth.contract(address=token, abi=ERC20_ABI).functions.balanceOf(address.hex) for token in tokens
+        )
+
+    results = multicall.try_aggregate(functions, require_success=False)
+    values = [
+        result.return_data_decoded if result.success and isinstance(result.return_data_decoded, int) else 0
+        for result in results
+    ]
+
+    return split_by_address(values, len(tokens) + 1)
+
+def get_raw_balances_with_batch_request(client: EthereumClient, tokens: list[str], addresses: list[ETHAddress]) -> list[list[int]]:
+    # No Multicall deployed, fall back to one JSON-RPC batch request
+    erc20 = client.w3.eth.contract(abi=ERC20_ABI)
+    queries = []
+    for address in addresses:
+        queries.append({"jsonrpc": "2.0", "method": "eth_getBalance", "params": [address.hex, "latest"], "id": len(queries)})
+        for token in tokens:
+            data = erc20.encodeABI(fn_name="balanceOf", args=[address.hex])
+            queries.append({"jsonrpc": "2.0", "method": "eth_call", "params": [{"to": token, "data": data}, "latest"], "id": len(queries)})
+
+    response = client.http_session.post(client.ethereum_node_url, json=queries, timeout=client.slow_timeout)
+    if not response.ok:
+        raise ConnectionError(f"Error connecting to {client.ethereum_node_url}: {response.text}")
+
+    results = response.json()
+    # If there's an error some nodes return a json instead of a list
+    if isinstance(results, dict):
+        raise ValueError(f"Batch request error: {results}")
+
+    results = sorted(results, key=lambda result: result["id"])
+    values = [
+        int(result["result"], 16) if result.get("result") not in (None, "0x") else 0
+        for result in results
+    ]
+
+    return split_by_address(values, len(tokens) + 1)
+
+def split_by_address(values: list[int], size: int) -> list[list[int]]:
+    return [values[i:i + size] for i in range(0, len(values), size)]
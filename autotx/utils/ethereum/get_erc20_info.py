@@ -1,13 +1,11 @@
 from web3 import Web3
 
 from autotx.utils.ethereum.eth_address import ETHAddress
-from .erc20_abi import ERC20_ABI
+from .token_metadata import token_metadata
 
 def get_erc20_info(web3: Web3, token_address: ETHAddress) -> tuple[str, str, int]:
-    MockERC20 = web3.eth.contract(address=token_address.hex, abi=ERC20_ABI)
-
-    name = MockERC20.functions.name().call()
-    symbol = MockERC20.functions.symbol().call()
-    decimals = MockERC20.functions.decimals().call()
+    name = token_metadata.name(web3, token_address.hex)
+    symbol = token_metadata.symbol(web3, token_address.hex)
+    decimals = token_metadata.decimals(web3, token_address.hex)
 
     return name, symbol, decimals
\ No newline at end of file
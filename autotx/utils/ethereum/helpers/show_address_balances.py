@@ -1,17 +1,11 @@
-from web3 import Web3
+from gnosis.eth import EthereumClient
 
-from autotx.utils.ethereum import get_erc20_balance, get_eth_balance
-from autotx.utils.ethereum.constants import NATIVE_TOKEN_ADDRESS, NetworkInfo
+from autotx.utils.ethereum.constants import NetworkInfo
 from autotx.utils.ethereum.eth_address import ETHAddress
+from autotx.utils.ethereum.get_balances import get_balances
 
-def show_address_balances(web3: Web3, network: NetworkInfo, address: ETHAddress):
-    eth_balance = get_eth_balance(web3, address)
-    print(f"ETH balance: {eth_balance}")
+def show_address_balances(client: EthereumClient, network: NetworkInfo, address: ETHAddress):
+    balances = get_balances(client, network, [address])[address.hex]
 
-    tokens = network.tokens
-    for token in tokens:
-        if tokens[token] == NATIVE_TOKEN_ADDRESS:
-            continue
-        token_address = ETHAddress(tokens[token], web3)
-        balance = get_erc20_balance(web3, token_address, address)
+    for token, balance in balances.items():
         print(f"{token.upper()} balance: {balance}")
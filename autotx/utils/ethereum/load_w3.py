@@ -1,6 +1,6 @@
 from web3 import Web3
 from autotx.utils.ethereum.constants import FORK_RPC_URL
+from autotx.utils.ethereum.provider_registry import provider_registry
 
 def load_w3() -> Web3:
-    web3 = Web3(Web3.HTTPProvider(FORK_RPC_URL))
-    return web3
\ No newline at end of file
+    return provider_registry.get_web3(FORK_RPC_URL)
\ No newline at end of file
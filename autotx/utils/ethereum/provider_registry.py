@@ -0,0 +1,105 @@
+import json
+import os
+from collections import Counter
+from threading import Lock
+from typing import Any
+
+import requests
+from eth_typing import URI
+from gnosis.eth import EthereumClient
+from web3 import Web3
+
+from .constants import FORK_RPC_URL
+
+DEFAULT_POOL_SIZE = 10
+DEFAULT_RETRY_COUNT = 1
+
+
+class PooledEthereumClient(EthereumClient):
+    def __init__(self, ethereum_node_url: URI, pool_size: int, retry_count: int, on_response: Any):
+        # The base constructor prepares the http session, so the pool settings have to be set first
+        self.pool_size = pool_size
+        self.on_response = on_response
+        super().__init__(ethereum_node_url, retry_count=retry_count)
+
+    def _prepare_http_session(self, retry_count: int) -> requests.Session:
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_size,
+            max_retries=retry_count,
+            pool_block=False,
+        )
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.hooks["response"].append(self.on_response)
+        return session
+
+
+# One client, and so one keep-alive session, per RPC url shared by the configuration, the agents and their tools
+class ProviderRegistry:
+    pool_size: int | None # defaults to the RPC_POOL_SIZE env variable
+    retry_count: int | None # defaults to the RPC_RETRY_COUNT env variable
+
+    def __init__(self, pool_size: int | None = None, retry_count: int | None = None):
+        self.pool_size = pool_size
+        self.retry_count = retry_count
+        self.clients: dict[str, EthereumClient] = {}
+        self.http_requests: Counter[str] = Counter()  # rpc url -> http requests
+        self.rpc_calls: dict[str, Counter[str]] = {}  # rpc url -> rpc method -> calls, batched calls included
+        self.lock = Lock()
+
+    def get_client(self, rpc_url: str = FORK_RPC_URL) -> EthereumClient:
+        with self.lock:
+            client = self.clients.get(rpc_url)
+        if client:
+            return client
+
+        # Built outside the lock, the client already makes requests (counted under the lock) while connecting
+        client = PooledEthereumClient(
+            URI(rpc_url),
+            pool_size=self.pool_size or int(os.getenv("RPC_POOL_SIZE") or DEFAULT_POOL_SIZE),
+            retry_count=self.retry_count if self.retry_count is not None else int(os.getenv("RPC_RETRY_COUNT") or DEFAULT_RETRY_COUNT),
+            on_response=lambda response, *args, **kwargs: self.count_response(rpc_url, response),
+        )
+        with self.lock:
+            return self.clients.setdefault(rpc_url, client)
+
+    def get_web3(self, rpc_url: str = FORK_RPC_URL) -> Web3:
+        return self.get_client(rpc_url).w3
+
+    def count_response(self, rpc_url: str, response: requests.Response):
+        try:
+            payload = json.loads(response.request.body or "null")
+        except ValueError:
+            payload = None
+
+        requests_payload = payload if isinstance(payload, list) else [payload]
+        methods = [request["method"] for request in requests_payload if isinstance(request, dict) and "method" in request]
+
+        with self.lock:
+            self.http_requests[rpc_url] += 1
+            self.rpc_calls.setdefault(rpc_url, Counter()).update(methods)
+
+    def request_counts(self, rpc_url: str = FORK_RPC_URL) -> dict[str, int]:
+        with self.lock:
+            return dict(self.rpc_calls.get(rpc_url, Counter()))
+
+    def total_request_counts(self) -> Counter[str]:
+        # Calls per method, of all rpc urls
+        with self.lock:
+            return sum(self.rpc_calls.values(), Counter())
+
+    def reset_counters(self):
+        with self.lock:
+            self.http_requests.clear()
+            self.rpc_calls.clear()
+
+    def close(self):
+        with self.lock:
+            for client in self.clients.values():
+                client.http_session.close()
+            self.clients.clear()
+
+
+provider_registry = ProviderRegistry()
@@ -6,7 +6,7 @@ from web3.types import TxParams
 
 from autotx.utils.ethereum.eth_address import ETHAddress
 
-from .constants import GAS_PRICE_MULTIPLIER
+from .fee_oracle import fee_oracle
 
 def send_eth(account: Account, to: ETHAddress, value: float, web3: Web3) -> tuple[str, TxReceipt]:
     bytes_address: Address = Address(bytes.fromhex(account.address[2:]))
@@ -17,7 +17,7 @@ def send_eth(account: Account, to: ETHAddress, value: float, web3: Web3) -> tupl
         'from': account.address,
         'to': to.hex,
         'value': int(value * 10 ** 18),
-        'gasPrice': int(web3.eth.gas_price * GAS_PRICE_MULTIPLIER),
+        **fee_oracle.fee_params(web3),
         'nonce': nonce,
         'chainId': web3.eth.chain_id
     }
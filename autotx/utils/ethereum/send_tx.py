@@ -2,6 +2,8 @@ from eth_account import Account
 from web3 import Web3
 from web3.types import TxParams
 
+from .fee_oracle import fee_oracle
+
 def send_tx(w3: Web3, tx: TxParams, account: Account) -> bytes:
     tx["from"] = account.address
     if "nonce" not in tx:
@@ -10,7 +12,7 @@ def send_tx(w3: Web3, tx: TxParams, account: Account) -> bytes:
         )
 
     if "gasPrice" not in tx and "maxFeePerGas" not in tx:
-        tx["gasPrice"] = w3.eth.gas_price
+        tx.update(fee_oracle.fee_params(w3))
 
     if "gas" not in tx:
         tx["gas"] = w3.eth.estimate_gas(tx)
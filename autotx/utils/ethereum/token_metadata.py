@@ -0,0 +1,74 @@
+import json
+from threading import Lock
+from typing import Any, Callable
+
+from web3 import Web3
+
+from .cache import Cache, cache
+from .erc20_abi import ERC20_ABI
+from .fee_oracle import provider_key
+
+TOKEN_METADATA_FILE_NAME = "token-metadata.json"
+
+# Name, symbol and decimals never change for a deployed token, so entries never expire.
+# Symbols are always read from the token, the lowercase symbols of NetworkInfo.tokens lose casings like stETH
+class TokenMetadataCache:
+    def __init__(self, cache: Cache):
+        self.cache = cache
+        self.entries: dict[str, dict[str, Any]] | None = None  # "chain_id:address" -> {"name", "symbol", "decimals"}
+        self.chain_ids: dict[str | int, int] = {}
+        self.lock = Lock()
+
+    def decimals(self, web3: Web3, token_address: str) -> int:
+        return self.get(web3, token_address, "decimals", lambda erc20: erc20.functions.decimals().call())
+
+    def symbol(self, web3: Web3, token_address: str) -> str:
+        return self.get(web3, token_address, "symbol", lambda erc20: erc20.functions.symbol().call())
+
+    def name(self, web3: Web3, token_address: str) -> str:
+        return self.get(web3, token_address, "name", lambda erc20: erc20.functions.name().call())
+
+    def get(self, web3: Web3, token_address: str, field: str, fetch: Callable[[Any], Any]) -> Any:
+        chain_id = self.chain_id(web3)
+        key = f"{chain_id}:{token_address.lower()}"
+
+        with self.lock:
+            entries = self.load()
+            value = entries.get(key, {}).get(field)
+
+        if value is not None:
+            return value
+
+        erc20 = web3.eth.contract(address=Web3.to_checksum_address(token_address), abi=ERC20_ABI)
+        value = fetch(erc20)
+
+        with self.lock:
+            entries.setdefault(key, {})[field] = value
+            self.save()
+
+        return value
+
+    def chain_id(self, web3: Web3) -> int:
+        key = provider_key(web3)
+        if key not in self.chain_ids:
+            self.chain_ids[key] = web3.eth.chain_id
+        return self.chain_ids[key]
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        if self.entries is None:
+            try:
+                self.entries = json.loads(self.cache.read(TOKEN_METADATA_FILE_NAME))
+            except Exception:
+                self.entries = {}
+        return self.entries
+
+    def save(self):
+        self.cache.write(TOKEN_METADATA_FILE_NAME, json.dumps(self.entries))
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self.cache.remove(TOKEN_METADATA_FILE_NAME)
+
+
+token_metadata = TokenMetadataCache(cache)
@@ -1,22 +1,23 @@
 from eth_account import Account
 from web3 import Web3
-from web3.middleware import construct_sign_and_send_raw_middleware
 
 from autotx.utils.ethereum.eth_address import ETHAddress
 
-from .constants import GAS_PRICE_MULTIPLIER
+from .fee_oracle import fee_oracle
 
 from .erc20_abi import ERC20_ABI
+from .token_metadata import token_metadata
 
 def transfer_erc20(web3: Web3, token_address: ETHAddress, from_account: Account, to: ETHAddress, value: float):
-    account_middleware = construct_sign_and_send_raw_middleware(from_account)
-    web3.middleware_onion.add(account_middleware)
-
     erc20 = web3.eth.contract(address=token_address.hex, abi=ERC20_ABI)
-    decimals = erc20.functions.decimals().call()
-
-    tx_hash = erc20.functions.transfer(to.hex, int(value * 10 ** decimals)).transact({"from": from_account.address, "gasPrice": int(web3.eth.gas_price * GAS_PRICE_MULTIPLIER)})
+    decimals = token_metadata.decimals(web3, token_address.hex)
 
-    web3.middleware_onion.remove(account_middleware)
+    # Signed locally instead of with a signing middleware, the web3 instance is shared by concurrent tasks
+    tx = erc20.functions.transfer(to.hex, int(value * 10 ** decimals)).build_transaction({
+        "from": from_account.address,
+        "nonce": web3.eth.get_transaction_count(from_account.address, block_identifier="pending"),
+        **fee_oracle.fee_params(web3),
+    })
+    signed_tx = from_account.sign_transaction(tx)
 
-    return tx_hash
\ No newline at end of file
+    return web3.eth.send_raw_transaction(signed_tx.rawTransaction)
@@ -0,0 +1,117 @@
+import json
+import time
+from threading import Lock
+from typing import Any
+
+from gnosis.eth.constants import NULL_ADDRESS
+from gnosis.eth.oracles.uniswap_v3 import UniswapV3Oracle
+from web3 import Web3
+
+from autotx.utils.ethereum.cache import Cache, cache
+
+POOL_REGISTRY_FILE_NAME = "uniswap-pools.json"
+POOL_REGISTRY_TTL = 60 * 60
+FEE_TIERS = [100, 500, 3000, 10000]
+
+# Pools are never removed, but new fee tiers can be deployed for a pair, so entries are refreshed after a TTL
+class PoolRegistry:
+    ttl: float
+
+    def __init__(self, cache: Cache, ttl: float = POOL_REGISTRY_TTL):
+        self.cache = cache
+        self.ttl = ttl
+        self.entries: dict[str, dict[str, Any]] | None = None  # "chain_id:token0:token1" -> {"fee_tiers", "updated_at"}
+        self.lock = Lock()
+
+    def fee_tiers(self, uniswap: UniswapV3Oracle, token_a_address: str, token_b_address: str) -> list[int]:
+        # Fee tiers with a deployed pool for the pair
+        return self.fee_tiers_for_pairs(uniswap, [(token_a_address, token_b_address)])[sort_tokens(token_a_address, token_b_address)]
+
+    def fee_tiers_for_pairs(self, uniswap: UniswapV3Oracle, pairs: list[tuple[str, str]]) -> dict[tuple[str, str], list[int]]:
+        # Keyed by the sorted, lowercased pair; all missing or stale pairs are looked up together
+        chain_id = uniswap.ethereum_client.get_chain_id()
+        sorted_pairs = list(dict.fromkeys(sort_tokens(token_a, token_b) for (token_a, token_b) in pairs))
+        fee_tiers: dict[tuple[str, str], list[int]] = {}
+        stale_fee_tiers: dict[tuple[str, str], list[int]] = {}
+
+        with self.lock:
+            entries = self.load()
+            for pair in sorted_pairs:
+                entry = entries.get(pair_key(chain_id, pair))
+                if not entry or "fee_tiers" not in entry:
+                    continue
+                if time.time() - entry["updated_at"] < self.ttl:
+                    fee_tiers[pair] = entry["fee_tiers"]
+                else:
+                    stale_fee_tiers[pair] = entry["fee_tiers"]
+
+        missing_pairs = [pair for pair in sorted_pairs if pair not in fee_tiers]
+        if not missing_pairs:
+            return fee_tiers
+
+        try:
+            queried_fee_tiers = query_fee_tiers(uniswap, missing_pairs)
+        except Exception as e:
+            if all(pair in stale_fee_tiers for pair in missing_pairs):
+                print(f"Failed to refresh Uniswap pools, using cached fee tiers: {e}")
+                return {**fee_tiers, **stale_fee_tiers}
+            raise
+
+        with self.lock:
+            entries = self.load()
+            for pair, pair_fee_tiers in queried_fee_tiers.items():
+                entries[pair_key(chain_id, pair)] = {"fee_tiers": pair_fee_tiers, "updated_at": time.time()}
+            self.cache.write(POOL_REGISTRY_FILE_NAME, json.dumps(entries))
+
+        return {**fee_tiers, **queried_fee_tiers}
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        if self.entries is None:
+            try:
+                self.entries = json.loads(self.cache.read(POOL_REGISTRY_FILE_NAME))
+            except Exception:
+                self.entries = {}
+        return self.entries
+
+    def clear(self):
+        with self.lock:
+            self.entries = {}
+            self.cache.remove(POOL_REGISTRY_FILE_NAME)
+
+
+def sort_tokens(token_a: str, token_b: str) -> tuple[str, str]:
+    token_a_lower = token_a.lower()
+    token_b_lower = token_b.lower()
+    return (token_b_lower, token_a_lower) if token_a_lower > token_b_lower else (token_a_lower, token_b_lower)
+
+
+def pair_key(chain_id: int, pair: tuple[str, str]) -> str:
+    return f"{chain_id}:{pair[0]}:{pair[1]}"
+
+
+def query_fee_tiers(uniswap: UniswapV3Oracle, pairs: list[tuple[str, str]]) -> dict[tuple[str, str], list[int]]:
+    # Looks up the pool of every fee tier for every pair in a single eth_call when Multicall is available
+    client = uniswap.ethereum_client
+    functions = [
+        uniswap.factory.functions.getPool(Web3.to_checksum_address(token0), Web3.to_checksum_address(token1), fee)
+        for (token0, token1) in pairs
+        for fee in FEE_TIERS
+    ]
+
+    if client.multicall:
+        results = client.multicall.try_aggregate(functions)
+        pool_addresses = [result.return_data_decoded if result.success else NULL_ADDRESS for result in results]
+    else:
+        pool_addresses = [function.call() for function in functions]
+
+    return {
+        pair: [
+            fee
+            for fee, pool_address in zip(FEE_TIERS, pool_addresses[i * len(FEE_TIERS):(i + 1) * len(FEE_TIERS)])
+            if pool_address != NULL_ADDRESS
+        ]
+        for i, pair in enumerate(pairs)
+    }
+
+
+pool_registry = PoolRegistry(cache)
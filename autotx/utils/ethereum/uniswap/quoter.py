@@ -0,0 +1,40 @@
+from gnosis.eth.oracles.uniswap_v3 import UniswapV3Oracle
+from web3.contract.contract import Contract, ContractFunction
+from web3.exceptions import ContractLogicError
+
+from autotx.utils.ethereum.uniswap.quoter_v2_abi import QUOTER_V2_ABI
+
+# https://docs.uniswap.org/contracts/v3/reference/deployments, by chain id
+QUOTER_V2_ADDRESSES = {
+    1: "0x61fFE014bA17989E743c5F6cB21bF9697530B21e",
+    10: "0x61fFE014bA17989E743c5F6cB21bF9697530B21e",
+    137: "0x61fFE014bA17989E743c5F6cB21bF9697530B21e",
+    8453: "0x3d4e44Eb1374240CE5F1B871ab261CD16335B76a",
+    42161: "0x61fFE014bA17989E743c5F6cB21bF9697530B21e",
+    11155111: "0xEd1f6473345F45b75F8179591dd5bA1888cf2FB3",
+}
+
+
+def get_quoter(uniswap: UniswapV3Oracle) -> Contract:
+    chain_id = uniswap.ethereum_client.get_chain_id()
+    address = QUOTER_V2_ADDRESSES.get(chain_id)
+    if address is None:
+        raise Exception(f"Swaps are not supported on chain {chain_id}, it has no Uniswap QuoterV2 deployment")
+    return uniswap.w3.eth.contract(address=address, abi=QUOTER_V2_ABI)
+
+
+def call_quotes(uniswap: UniswapV3Oracle, functions: list[ContractFunction]) -> list[list | None]:
+    # QuoterV2 functions revert internally to simulate the swap, so they are only ever eth_call-ed.
+    # A quote that fails (e.g. not enough liquidity for the amount) is returned as None
+    multicall = uniswap.ethereum_client.multicall
+    if multicall:
+        results = multicall.try_aggregate(functions)
+        return [result.return_data_decoded if result.success else None for result in results]
+
+    results = []
+    for function in functions:
+        try:
+            results.append(function.call())
+        except (ContractLogicError, ValueError):
+            results.append(None)
+    return results
@@ -0,0 +1,115 @@
+from gnosis.eth.oracles.uniswap_v3 import UniswapV3Oracle
+from web3 import Web3
+
+from autotx.utils.ethereum.constants import SUPPORTED_NETWORKS
+from autotx.utils.ethereum.uniswap.pool_registry import pool_registry, sort_tokens
+from autotx.utils.ethereum.uniswap.quoter import call_quotes, get_quoter
+
+# Intermediate tokens for 2-hop routes, besides the wrapped native token
+HUB_TOKENS = ["usdc"]
+
+class Route:
+    tokens: list[str]
+    fees: list[int]
+    amount_in: int
+    amount_out: int
+    gas_estimate: int
+
+    def __init__(self, tokens: list[str], fees: list[int], amount_in: int, amount_out: int, gas_estimate: int):
+        self.tokens = tokens
+        self.fees = fees
+        self.amount_in = amount_in
+        self.amount_out = amount_out
+        self.gas_estimate = gas_estimate
+
+    @property
+    def is_single_hop(self) -> bool:
+        return len(self.fees) == 1
+
+    def encode_path(self, exact_input: bool) -> bytes:
+        # Exact output paths are encoded from the output token back to the input token
+        if exact_input:
+            return encode_path(self.tokens, self.fees)
+        else:
+            return encode_path(self.tokens[::-1], self.fees[::-1])
+
+
+def encode_path(tokens: list[str], fees: list[int]) -> bytes:
+    path = bytes.fromhex(tokens[0][2:])
+    for fee, token in zip(fees, tokens[1:]):
+        path += fee.to_bytes(3, "big") + bytes.fromhex(token[2:])
+    return path
+
+
+def get_hub_tokens(uniswap: UniswapV3Oracle) -> list[str]:
+    network = SUPPORTED_NETWORKS.get(uniswap.ethereum_client.get_chain_id())
+    hubs = [uniswap.weth_address]
+    if network:
+        hubs.extend(Web3.to_checksum_address(network.tokens[symbol]) for symbol in HUB_TOKENS if symbol in network.tokens)
+    return hubs
+
+
+def find_candidate_routes(
+    token_in_address: str,
+    token_out_address: str,
+    hub_tokens: list[str],
+    fee_tiers: dict[tuple[str, str], list[int]],
+) -> list[tuple[list[str], list[int]]]:
+    # Direct routes through every pool of the pair, plus 2-hop routes through every pool combination of each hub
+    candidates = [
+        ([token_in_address, token_out_address], [fee])
+        for fee in fee_tiers.get(sort_tokens(token_in_address, token_out_address), [])
+    ]
+
+    for hub in hub_tokens:
+        if hub.lower() in (token_in_address.lower(), token_out_address.lower()):
+            continue
+        for fee_in in fee_tiers.get(sort_tokens(token_in_address, hub), []):
+            for fee_out in fee_tiers.get(sort_tokens(hub, token_out_address), []):
+                candidates.append(([token_in_address, hub, token_out_address], [fee_in, fee_out]))
+
+    return candidates
+
+
+def find_best_route(
+    uniswap: UniswapV3Oracle,
+    token_in_address: str,
+    token_out_address: str,
+    amount: int,
+    exact_input: bool,
+) -> Route:
+    # Quotes all candidate routes in a single multicall, picking the most output for exact input
+    # or the least input for exact output. Ties go to the route with fewer hops
+    hub_tokens = get_hub_tokens(uniswap)
+    pairs = [(token_in_address, token_out_address)]
+    for hub in hub_tokens:
+        pairs.extend([(token_in_address, hub), (hub, token_out_address)])
+
+    fee_tiers = pool_registry.fee_tiers_for_pairs(uniswap, pairs)
+    candidates = find_candidate_routes(token_in_address, token_out_address, hub_tokens, fee_tiers)
+
+    quoter = get_quoter(uniswap)
+    functions = []
+    for (tokens, fees) in candidates:
+        if exact_input:
+            functions.append(quoter.functions.quoteExactInput(encode_path(tokens, fees), amount))
+        else:
+            functions.append(quoter.functions.quoteExactOutput(encode_path(tokens[::-1], fees[::-1]), amount))
+
+    routes = []
+    for (tokens, fees), result in zip(candidates, call_quotes(uniswap, functions)):
+        if result is None:
+            continue
+        (quoted_amount, _, _, gas_estimate) = result
+        if exact_input:
+            routes.append(Route(tokens, fees, amount, quoted_amount, gas_estimate))
+        else:
+            routes.append(Route(tokens, fees, quoted_amount, amount, gas_estimate))
+
+    if not routes:
+        raise Exception(f"No Uniswap route found to swap {token_in_address} for {token_out_address}")
+
+    if exact_input:
+        return max(routes, key=lambda route: (route.amount_out, -len(route.fees)))
+    else:
+        return min(routes, key=lambda route: (route.amount_in, len(route.fees)))
@@ -1,93 +1,42 @@
 from gnosis.eth import EthereumClient
 from gnosis.eth.oracles.uniswap_v3 import UniswapV3Oracle
-import requests
 
 
 from web3.contract.contract import Contract
 
 from autotx.utils.PreparedTx import PreparedTx
-from autotx.utils.ethereum.constants import GAS_PRICE_MULTIPLIER, NATIVE_TOKEN_ADDRESS
+from autotx.utils.ethereum.constants import NATIVE_TOKEN_ADDRESS
 
 from autotx.utils.ethereum.erc20_abi import ERC20_ABI
+from autotx.utils.ethereum.fee_oracle import fee_oracle
+from autotx.utils.ethereum.token_metadata import token_metadata
+from autotx.utils.ethereum.uniswap.route_finder import Route, find_best_route
 from autotx.utils.ethereum.weth_abi import WETH_ABI
 
 
-SLIPPAGE = 0.05
+# Amounts come from an on-chain quote, so slippage only has to cover price movement until the swap is mined
+SLIPPAGE = 0.005
 SQRT_PRICE_LIMIT = 0
 
 
-def get_swap_information(
-    amount: float,
-    token_in_decimals: int,
-    token_out_decimals: int,
-    price: float,
-    exact_input: bool,
-):
+def get_swap_information(route: Route, exact_input: bool):
     if exact_input:
-        amount_compared_with_token = amount * price
-        minimum_amount_out = int(amount_compared_with_token * 10**token_out_decimals)
-        amount_out = int(minimum_amount_out - (minimum_amount_out * SLIPPAGE))
-        return (amount_out, int(amount * 10**token_in_decimals), "exactInputSingle")
+        amount_out = int(route.amount_out - (route.amount_out * SLIPPAGE))
+        return (amount_out, route.amount_in, "exactInputSingle" if route.is_single_hop else "exactInput")
     else:
-        amount_compared_with_token = amount / price
-        max_amount_in = int(amount_compared_with_token * 10**token_in_decimals)
-        amount_in = int(max_amount_in + (max_amount_in * SLIPPAGE))
-        return (
-            int(amount * 10**token_out_decimals),
-            amount_in,
-            "exactOutputSingle",
-        )
+        amount_in = int(route.amount_in + (route.amount_in * SLIPPAGE))
+        return (route.amount_out, amount_in, "exactOutputSingle" if route.is_single_hop else "exactOutput")
 
 
-def get_best_fee_tier(token_in_address: str, token_out_address: str) -> int:
-    token_in_lower = token_in_address.lower()
-    token_out_lower = token_out_address.lower()
-    reversed = token_in_lower > token_out_lower
-
-    (token0, token1) = (
-        (token_out_lower, token_in_lower)
-        if reversed
-        else (token_in_lower, token_out_lower)
-    )
-
-    data = {
-        "query": """
-            query GetPools($token0: String, $token1: String) {
-                pools(
-                    where: {
-                        token0: $token0
-                        token1: $token1
-                    }
-                ) {
-                    id
-                    feeTier
-                    sqrtPrice
-                    liquidity
-                    token0 {
-                        id
-                        symbol
-                    }
-                    token1 {
-                        id
-                        symbol
-                    }
-                }
-            }
-        """,
-        "variables": {"token0": token0, "token1": token1},
-    }
-    url = "https://api.thegraph.com/subgraphs/name/uniswap/uniswap-v3"
-    response = requests.post(url, json=data)
-
-    if response.status_code == 200:
-        if not "data" in response.json():
-            raise Exception(f"Request failed with response: {response.json()}")
-        pools = response.json()["data"]["pools"]
-
-        max_liquidity_pool = max(pools, key=lambda x: int(x["liquidity"]))
-        return int(max_liquidity_pool["feeTier"])
+def get_swap_params(route: Route, method: str, recipient: str, amount_in: int, amount_out: int) -> tuple:
+    if method == "exactInputSingle":
+        return (route.tokens[0], route.tokens[-1], route.fees[0], recipient, amount_in, amount_out, SQRT_PRICE_LIMIT)
+    elif method == "exactOutputSingle":
+        return (route.tokens[0], route.tokens[-1], route.fees[0], recipient, amount_out, amount_in, SQRT_PRICE_LIMIT)
+    elif method == "exactInput":
+        return (route.encode_path(True), recipient, amount_in, amount_out)
     else:
-        raise Exception(f"Request failed with status code: {response.status_code}")
+        return (route.encode_path(False), recipient, amount_out, amount_in)
 
 
 def build_swap_transaction(
@@ -100,6 +49,7 @@ def build_swap_transaction(
 ) -> list[PreparedTx]:
     uniswap = UniswapV3Oracle(etherem_client)
     web3 = etherem_client.w3
+    fee_params = fee_oracle.fee_params(web3)
 
     token_in_is_native = token_in_address == NATIVE_TOKEN_ADDRESS
     token_out_is_native = token_out_address == NATIVE_TOKEN_ADDRESS
@@ -121,7 +71,7 @@ def build_swap_transaction(
                 token_out.functions.deposit().build_transaction(
                     {
                         "from": _from,
-                        "gasPrice": int(web3.eth.gas_price * GAS_PRICE_MULTIPLIER),
+                        **fee_params,
                         "gas": None,
                         "value": int(amount * 10**18),
                     }
@@ -137,7 +87,7 @@ def build_swap_transaction(
                 token_out.functions.withdraw(int(amount * 10**18)).build_transaction(
                     {
                         "from": _from,
-                        "gasPrice": int(web3.eth.gas_price * GAS_PRICE_MULTIPLIER),
+                        **fee_params,
                         "gas": None,
                     }
                 ),
@@ -146,16 +96,20 @@ def build_swap_transaction(
         return transactions
 
 
-    price = uniswap.get_price(token_in.address, token_out.address)
+    token_in_decimals = token_metadata.decimals(web3, token_in.address)
+    token_out_decimals = token_metadata.decimals(web3, token_out.address)
 
-    token_in_decimals = token_in.functions.decimals().call()
-    token_out_decimals = token_out.functions.decimals().call()
-    (amount_out, amount_in, method) = get_swap_information(
-        amount, token_in_decimals, token_out_decimals, price, exact_input
+    route = find_best_route(
+        uniswap,
+        token_in.address,
+        token_out.address,
+        int(amount * 10 ** (token_in_decimals if exact_input else token_out_decimals)),
+        exact_input,
     )
+    (amount_out, amount_in, method) = get_swap_information(route, exact_input)
 
-    token_in_symbol = token_in.functions.symbol().call()
-    token_out_symbol = token_out.functions.symbol().call()
+    token_in_symbol = token_metadata.symbol(web3, token_in.address)
+    token_out_symbol = token_metadata.symbol(web3, token_out.address)
 
     if not token_in_is_native:
         allowance = token_in.functions.allowance(_from, uniswap.router_address).call()
@@ -165,7 +119,7 @@ def build_swap_transaction(
             ).build_transaction(
                 {
                     "from": _from,
-                    "gasPrice": int(web3.eth.gas_price * GAS_PRICE_MULTIPLIER),
+                    **fee_params,
                 }
             )
             transactions.append(
@@ -175,22 +129,13 @@ def build_swap_transaction(
                 )
             )
 
-    fee = get_best_fee_tier(token_in.address, token_out.address)
     swap_transaction = uniswap.router.functions[method](
-        (
-            token_in.address,
-            token_out.address,
-            fee,
-            _from,
-            amount_out if method == "exactOutputSingle" else amount_in,
-            amount_in if method == "exactOutputSingle" else amount_out,
-            SQRT_PRICE_LIMIT,
-        )
+        get_swap_params(route, method, _from, amount_in, amount_out)
     ).build_transaction(
         {
             "value": amount_in if token_in_is_native else 0,
             "gas": None,
-            "gasPrice": int(web3.eth.gas_price * GAS_PRICE_MULTIPLIER),
+            **fee_params,
         }
     )
     transactions.append(
@@ -204,7 +149,7 @@ def build_swap_transaction(
         tx = token_out.functions.withdraw(amount_out).build_transaction(
             {
                 "from": _from,
-                "gasPrice": int(web3.eth.gas_price * GAS_PRICE_MULTIPLIER),
+                **fee_params,
                 "gas": None,
             }
         )
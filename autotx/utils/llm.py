@@ -1,4 +1,12 @@
 from langchain_openai import ChatOpenAI
 import os
 
-open_ai_llm = ChatOpenAI(temperature=0, model=os.environ.get("OPENAI_MODEL_NAME", "gpt-4-turbo-preview")) # type: ignore
\ No newline at end of file
+from autotx.utils.llm_cassette import llm_cassette
+from autotx.utils.llm_telemetry import llm_telemetry
+
+# Every completion of a run is recorded, see AutoTx.run. The cassettes are installed first,
+# so replayed completions are recorded by the telemetry too
+llm_cassette.install()
+llm_telemetry.install()
+
+open_ai_llm = ChatOpenAI(temperature=0, model=os.environ.get("OPENAI_MODEL_NAME", "gpt-4-turbo-preview")) # type: ignore
@@ -0,0 +1,363 @@
+from contextlib import contextmanager
+import difflib
+from functools import wraps
+import hashlib
+import json
+import os
+import re
+from threading import Lock
+from typing import Any, Callable, Iterator
+
+from openai import NotGiven
+from openai.resources.chat.completions import AsyncCompletions, Completions
+from openai.types.chat import ChatCompletion, ChatCompletionChunk
+
+# "off" calls the API, "record" calls the API and overwrites the cassette, "replay" only replays recorded responses
+# and fails on requests that weren't recorded, "auto" replays what is recorded and calls the API to record what is missing
+LLM_CASSETTE_MODES = ["off", "record", "replay", "auto"]
+# Parameters that don't change the response, streamed and non-streamed requests share their recording
+IGNORED_PARAMS = {"stream", "stream_options", "timeout", "extra_headers", "extra_query", "extra_body", "user"}
+# Characters per chunk when a recording is replayed as a stream
+REPLAY_CHUNK_SIZE = 16
+MAX_DIFF_LINES = 60
+
+class Cassette:
+    def __init__(self, path: str, mode: str):
+        if mode not in LLM_CASSETTE_MODES:
+            raise Exception(f"Unknown LLM cassette mode: {mode}, expected one of {', '.join(LLM_CASSETTE_MODES)}")
+
+        self.path = path
+        self.mode = mode
+        self.interactions: list[dict[str, Any]] = []
+        if mode in ["replay", "auto"] and os.path.exists(path):
+            with open(path, "r") as file:
+                self.interactions = json.load(file)["interactions"]
+        # Identical requests get their recorded responses in order, recorded responses count as replayed
+        self.replay_counts: dict[str, int] = {}
+        self.changed = False
+        self.lock = Lock()
+
+    def replay(self, key: str, request: dict[str, Any]) -> dict[str, Any] | None:
+        # Returns None when the request has to be sent to the API
+        if self.mode == "record":
+            return None
+
+        with self.lock:
+            responses = [interaction["response"] for interaction in self.interactions if interaction["key"] == key]
+            count = self.replay_counts.get(key, 0)
+            if count < len(responses):
+                self.replay_counts[key] = count + 1
+                return responses[count]
+            # Repeated requests get the last response, unless missing ones can be recorded
+            if responses and self.mode == "replay":
+                return responses[-1]
+
+            if self.mode == "replay":
+                raise Exception(f"LLM request does not match any recording of {self.path}:\n{self.diff(request)}")
+
+        return None
+
+    def record(self, key: str, request: dict[str, Any], response: dict[str, Any]):
+        if self.mode not in ["record", "auto"]:
+            return
+
+        with self.lock:
+            self.interactions.append({"key": key, "request": request, "response": response})
+            self.replay_counts[key] = self.replay_counts.get(key, 0) + 1
+            self.changed = True
+
+    def save(self):
+        if not self.changed:
+            return
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as file:
+            json.dump({"interactions": self.interactions}, file, indent=2)
+        self.changed = False
+
+    def diff(self, request: dict[str, Any]) -> str:
+        # The differences with the most similar recorded request, to see how a prompt drifted
+        if not self.interactions:
+            return "The cassette has no recordings."
+
+        lines = json.dumps(request, indent=2, sort_keys=True).splitlines()
+        recordings = [json.dumps(interaction["request"], indent=2, sort_keys=True).splitlines() for interaction in self.interactions]
+        closest = max(recordings, key=lambda recording: difflib.SequenceMatcher(None, recording, lines).ratio())
+
+        diff = list(difflib.unified_diff(closest, lines, "recorded", "requested", n=1, lineterm=""))
+        if len(diff) > MAX_DIFF_LINES:
+            diff = diff[:MAX_DIFF_LINES] + [f"... {len(diff) - MAX_DIFF_LINES} more lines"]
+        return "\n".join(diff)
+
+class LlmCassette:
+    # Records the chat completions of the openai package, including the ones of the agents' ChatOpenAI,
+    # and replays them for requests with the same normalized parameters
+
+    def __init__(self):
+        self.cassette: Cassette | None = None
+        # Values that differ between machines, like the address of the smart account the tests deploy.
+        # They are recorded as their placeholder and replayed with the value of the current machine
+        self.placeholders: dict[str, str] = {}
+        self.installed = False
+
+    def set_placeholder(self, name: str, value: str):
+        self.placeholders[f"<{name}>"] = value
+
+    def install(self):
+        if self.installed:
+            return
+        self.installed = True
+
+        llm_cassette = self
+        create = Completions.create
+        acreate = AsyncCompletions.create
+
+        @wraps(create)
+        def cassette_create(self, *args, **kwargs):
+            cassette = llm_cassette.cassette
+            if cassette is None:
+                return create(self, *args, **kwargs)
+
+            request = normalize_request(kwargs, llm_cassette.placeholders)
+            key = request_key(request)
+            recorded_response = cassette.replay(key, request)
+            if recorded_response is not None:
+                return replay_response(fill_placeholders(recorded_response, llm_cassette.placeholders), kwargs)
+
+            response = create(self, *args, **kwargs)
+            record = lambda completion: cassette.record(key, request, insert_placeholders(completion, llm_cassette.placeholders))
+            if kwargs.get("stream"):
+                return RecordingChunks(response, record)
+            record(response.model_dump(mode="json"))
+            return response
+
+        @wraps(acreate)
+        async def acassette_create(self, *args, **kwargs):
+            cassette = llm_cassette.cassette
+            if cassette is None:
+                return await acreate(self, *args, **kwargs)
+
+            request = normalize_request(kwargs, llm_cassette.placeholders)
+            key = request_key(request)
+            recorded_response = cassette.replay(key, request)
+            if recorded_response is not None:
+                return areplay_response(fill_placeholders(recorded_response, llm_cassette.placeholders), kwargs)
+
+            response = await acreate(self, *args, **kwargs)
+            record = lambda completion: cassette.record(key, request, insert_placeholders(completion, llm_cassette.placeholders))
+            if kwargs.get("stream"):
+                return AsyncRecordingChunks(response, record)
+            record(response.model_dump(mode="json"))
+            return response
+
+        Completions.create = cassette_create # type: ignore
+        AsyncCompletions.create = acassette_create # type: ignore
+
+    @contextmanager
+    def use(self, path: str, mode: str | None = None) -> Iterator[Cassette | None]:
+        mode = mode or os.getenv("LLM_CASSETTE_MODE") or "off"
+
+        if mode == "off":
+            yield None
+            return
+
+        self.install()
+        cassette = Cassette(path, mode)
+        previous_cassette = self.cassette
+        self.cassette = cassette
+        try:
+            yield cassette
+        finally:
+            self.cassette = previous_cassette
+            cassette.save()
+
+def normalize_request(kwargs: dict[str, Any], placeholders: dict[str, str] | None = None) -> dict[str, Any]:
+    # Whitespace is collapsed so indentation changes of the prompt templates don't count as drift,
+    # and values of the placeholders are replaced so recordings can be replayed on other machines
+    def normalize(value: Any) -> Any:
+        if isinstance(value, str):
+            return " ".join(value.split())
+        elif isinstance(value, dict):
+            return {key: normalize(item) for (key, item) in value.items() if not isinstance(item, NotGiven)}
+        elif isinstance(value, (list, tuple)):
+            return [normalize(item) for item in value]
+        elif hasattr(value, "model_dump"):
+            return normalize(value.model_dump(mode="json"))
+        return value
+
+    return insert_placeholders(normalize({key: value for (key, value) in kwargs.items() if key not in IGNORED_PARAMS}), placeholders or {})
+
+def insert_placeholders(value: Any, placeholders: dict[str, str]) -> Any:
+    if not placeholders:
+        return value
+    names = {placeholder_value.lower(): name for (name, placeholder_value) in placeholders.items()}
+    pattern = re.compile("|".join(re.escape(placeholder_value) for placeholder_value in names), re.IGNORECASE)
+    return map_strings(value, lambda text: pattern.sub(lambda match: names[match.group(0).lower()], text))
+
+def fill_placeholders(value: Any, placeholders: dict[str, str]) -> Any:
+    if not placeholders:
+        return value
+    pattern = re.compile("|".join(re.escape(name) for name in placeholders))
+    return map_strings(value, lambda text: pattern.sub(lambda match: placeholders[match.group(0)], text))
+
+def map_strings(value: Any, map_string: Callable[[str], str]) -> Any:
+    if isinstance(value, str):
+        return map_string(value)
+    elif isinstance(value, dict):
+        return {key: map_strings(item, map_string) for (key, item) in value.items()}
+    elif isinstance(value, list):
+        return [map_strings(item, map_string) for item in value]
+    return value
+
+def request_key(request: dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode()).hexdigest()
+
+def replay_response(response: dict[str, Any], kwargs: dict[str, Any]) -> Any:
+    if kwargs.get("stream"):
+        return ReplayedChunks(build_chunks(response, kwargs))
+    return ChatCompletion.model_validate(response)
+
+def areplay_response(response: dict[str, Any], kwargs: dict[str, Any]) -> Any:
+    if kwargs.get("stream"):
+        return AsyncReplayedChunks(build_chunks(response, kwargs))
+    return ChatCompletion.model_validate(response)
+
+def build_chunks(response: dict[str, Any], kwargs: dict[str, Any]) -> list[ChatCompletionChunk]:
+    base = {"id": response["id"], "object": "chat.completion.chunk", "created": response["created"], "model": response["model"]}
+    chunks: list[dict[str, Any]] = []
+    for choice in response["choices"]:
+        message = choice["message"]
+        content = message.get("content") or ""
+        deltas: list[dict[str, Any]] = [{"role": "assistant"}]
+        deltas += [{"content": content[i:i + REPLAY_CHUNK_SIZE]} for i in range(0, len(content), REPLAY_CHUNK_SIZE)]
+        deltas += [
+            {"tool_calls": [{"index": index, **tool_call}]} for (index, tool_call) in enumerate(message.get("tool_calls") or [])
+        ]
+        for delta in deltas:
+            chunks.append({**base, "choices": [{"index": choice["index"], "delta": delta, "finish_reason": None}]})
+        chunks.append({**base, "choices": [{"index": choice["index"], "delta": {}, "finish_reason": choice["finish_reason"]}]})
+
+    stream_options = kwargs.get("stream_options")
+    if response.get("usage") and isinstance(stream_options, dict) and stream_options.get("include_usage"):
+        chunks.append({**base, "choices": [], "usage": response["usage"]})
+
+    return [ChatCompletionChunk.model_validate(chunk) for chunk in chunks]
+
+def merge_chunk(completion: dict[str, Any], chunk: ChatCompletionChunk):
+    # Builds the completion of a streamed response, so it can be replayed streamed or not
+    completion.update({"id": chunk.id, "object": "chat.completion", "created": chunk.created, "model": chunk.model})
+    # Clients that don't know stream_options keep the usage of a chunk as a dict
+    usage = getattr(chunk, "usage", None)
+    if usage is not None:
+        completion["usage"] = usage if isinstance(usage, dict) else usage.model_dump(mode="json")
+
+    choices = completion.setdefault("choices", [])
+    for choice in chunk.choices:
+        while len(choices) <= choice.index:
+            choices.append({"index": len(choices), "message": {"role": "assistant", "content": None}, "finish_reason": None})
+        message = choices[choice.index]["message"]
+
+        if choice.delta.content:
+            message["content"] = (message["content"] or "") + choice.delta.content
+        for tool_call in choice.delta.tool_calls or []:
+            tool_calls = message.setdefault("tool_calls", [])
+            while len(tool_calls) <= tool_call.index:
+                tool_calls.append({"id": None, "type": "function", "function": {"name": "", "arguments": ""}})
+            if tool_call.id:
+                tool_calls[tool_call.index]["id"] = tool_call.id
+            if tool_call.function:
+                tool_calls[tool_call.index]["function"]["name"] += tool_call.function.name or ""
+                tool_calls[tool_call.index]["function"]["arguments"] += tool_call.function.arguments or ""
+        if choice.finish_reason:
+            choices[choice.index]["finish_reason"] = choice.finish_reason
+
+class RecordingChunks:
+    # Passes the chunks of a stream on and records the whole completion, even if the stream is closed early
+
+    def __init__(self, stream: Any, record: Callable[[dict[str, Any]], None]):
+        self.stream = stream
+        self.iterator = iter(stream) if not hasattr(stream, "__aiter__") else None
+        self.record = record
+        self.completion: dict[str, Any] = {}
+        self.recorded = False
+
+    def finish(self):
+        if not self.recorded:
+            self.recorded = True
+            self.record(self.completion)
+
+    def __iter__(self):
+        for chunk in self.iterator:
+            merge_chunk(self.completion, chunk)
+            yield chunk
+        self.finish()
+
+    def close(self):
+        for chunk in self.iterator:
+            merge_chunk(self.completion, chunk)
+        self.finish()
+        self.stream.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+class AsyncRecordingChunks(RecordingChunks):
+    def __init__(self, stream: Any, record: Callable[[dict[str, Any]], None]):
+        super().__init__(stream, record)
+        self.aiterator = stream.__aiter__()
+
+    async def __aiter__(self):
+        async for chunk in self.aiterator:
+            merge_chunk(self.completion, chunk)
+            yield chunk
+        self.finish()
+
+    async def close(self):
+        async for chunk in self.aiterator:
+            merge_chunk(self.completion, chunk)
+        self.finish()
+        await self.stream.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+class ReplayedChunks:
+    def __init__(self, chunks: list[ChatCompletionChunk]):
+        self.chunks = chunks
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+class AsyncReplayedChunks(ReplayedChunks):
+    async def __aiter__(self):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def close(self):
+        pass
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        pass
+
+llm_cassette = LlmCassette()
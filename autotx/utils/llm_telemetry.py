@@ -0,0 +1,417 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass
+from functools import wraps
+import json
+import logging
+import os
+from threading import Lock
+import time
+from typing import Any, Iterator
+import uuid
+
+from openai.resources.chat.completions import AsyncCompletions, Completions
+from openai.types import CompletionUsage
+
+from autotx.utils.agent.prompt_tokens import count_tokens
+
+# USD per 1M prompt and completion tokens, models are matched by their longest prefix
+MODEL_PRICES: dict[str, tuple[float, float]] = {
+    "gpt-4-turbo": (10, 30),
+    "gpt-4-0125-preview": (10, 30),
+    "gpt-4-1106-preview": (10, 30),
+    "gpt-4o": (2.5, 10),
+    "gpt-4o-mini": (0.15, 0.6),
+    "gpt-4": (30, 60),
+    "gpt-3.5-turbo": (0.5, 1.5),
+}
+# Completions that are given tools are the agents choosing a tool
+TOOL_CALL_PARAMS = ("tools", "functions", "tool_choice", "function_call")
+# The openai client logs every retry of a request at info level to this logger
+RETRY_LOGGER_NAME = "openai._base_client"
+RETRY_LOG_PREFIX = "Retrying request"
+
+@dataclass
+class LlmCallRecord:
+    phase: str
+    model: str
+    latency_s: float = 0
+    first_token_s: float | None = None
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    # Set when the API didn't return usage, e.g. for streams closed before their end
+    estimated: bool = False
+    retries: int = 0
+    cost_usd: float | None = None
+    stream: bool = False
+    error: str | None = None
+
+@dataclass
+class ToolCallRecord:
+    phase: str
+    tool: str
+    latency_s: float = 0
+    error: str | None = None
+
+class RunTelemetry:
+    def __init__(self, name: str):
+        self.id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.name = name
+        self.started_at = time.time()
+        self.duration_s: float | None = None
+        self.llm_calls: list[LlmCallRecord] = []
+        self.tool_calls: list[ToolCallRecord] = []
+        # Wall time of the stages of the run (planning, agents, transactions) and rpc calls per method
+        self.timings: dict[str, float] = {}
+        self.rpc_calls: dict[str, int] = {}
+        self.lock = Lock()
+
+    def add_llm_call(self, record: LlmCallRecord):
+        with self.lock:
+            self.llm_calls.append(record)
+
+    def add_tool_call(self, record: ToolCallRecord):
+        with self.lock:
+            self.tool_calls.append(record)
+
+    def add_timing(self, stage: str, duration_s: float):
+        with self.lock:
+            self.timings[stage] = self.timings.get(stage, 0) + duration_s
+
+    def summary(self) -> dict[str, dict[str, Any]]:
+        # Totals per phase, in the order the phases were first seen, and of the whole run under "total"
+        phases: dict[str, dict[str, Any]] = {}
+        for record in self.llm_calls:
+            for phase in [record.phase, "total"]:
+                totals = phases.setdefault(phase, new_phase_totals())
+                totals["calls"] += 1
+                totals["latency_s"] += record.latency_s
+                totals["prompt_tokens"] += record.prompt_tokens
+                totals["completion_tokens"] += record.completion_tokens
+                totals["retries"] += record.retries
+                totals["errors"] += 1 if record.error else 0
+                totals["estimated"] = totals["estimated"] or record.estimated
+                if record.cost_usd is not None:
+                    totals["cost_usd"] = (totals["cost_usd"] or 0) + record.cost_usd
+        for record in self.tool_calls:
+            totals = phases.setdefault(record.phase, new_phase_totals())
+            totals["tool_calls"] += 1
+            totals["tool_latency_s"] += record.latency_s
+
+        if "total" in phases:
+            phases["total"] = phases.pop("total")
+        return phases
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+            "summary": self.summary(),
+            "timings": self.timings,
+            "rpc_calls": self.rpc_calls,
+            "llm_calls": [asdict(record) for record in self.llm_calls],
+            "tool_calls": [asdict(record) for record in self.tool_calls],
+        }
+
+    def save(self, folder: str | None = None) -> str:
+        folder = folder or os.getenv("LLM_TELEMETRY_DIR") or os.path.join(os.getenv("CACHE_DIR") or ".cache", "llm-telemetry")
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f"{self.id}.json")
+        with open(path, "w") as file:
+            json.dump(self.to_json(), file, indent=2)
+        return path
+
+    def print_report(self):
+        duration = f" in {self.duration_s:.2f}s" if self.duration_s is not None else ""
+        print(f"LLM calls of run {self.id}{duration}:")
+        print(f"{'Phase':<40} {'Calls':>5} {'Latency':>9} {'Prompt':>8} {'Completion':>10} {'Retries':>7} {'Cost':>9} {'Tools':>5} {'Tool time':>9}")
+        for (phase, totals) in self.summary().items():
+            estimated = "~" if totals["estimated"] else ""
+            cost = f"${totals['cost_usd']:.4f}" if totals["cost_usd"] is not None else "-"
+            print(
+                f"{phase:<40} {totals['calls']:>5} {totals['latency_s']:>8.2f}s "
+                f"{estimated + str(totals['prompt_tokens']):>8} {estimated + str(totals['completion_tokens']):>10} "
+                f"{totals['retries']:>7} {cost:>9} {totals['tool_calls']:>5} {totals['tool_latency_s']:>8.2f}s"
+            )
+        if self.timings:
+            print("Stages: " + ", ".join(f"{stage} {duration:.2f}s" for (stage, duration) in self.timings.items()))
+        if self.rpc_calls:
+            print(f"RPC calls: {sum(self.rpc_calls.values())}")
+
+def new_phase_totals() -> dict[str, Any]:
+    return {
+        "calls": 0,
+        "latency_s": 0.0,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "retries": 0,
+        "errors": 0,
+        "estimated": False,
+        "cost_usd": None,
+        "tool_calls": 0,
+        "tool_latency_s": 0.0,
+    }
+
+class LlmTelemetry:
+    # Records every chat completion made through the openai package, including the ones of the agents' ChatOpenAI.
+    # Calls are attributed to the run and phase of the context they are made in, threads need a copy of that context
+
+    def __init__(self):
+        self.current_run: ContextVar[RunTelemetry | None] = ContextVar("llm_telemetry_run", default=None)
+        self.current_phase: ContextVar[tuple[str, ...]] = ContextVar("llm_telemetry_phase", default=())
+        self.current_call: ContextVar[LlmCallRecord | None] = ContextVar("llm_telemetry_call", default=None)
+        self.installed = False
+
+    def install(self):
+        if self.installed:
+            return
+        self.installed = True
+
+        telemetry = self
+        create = Completions.create
+        acreate = AsyncCompletions.create
+
+        @wraps(create)
+        def recorded_create(self, *args, **kwargs):
+            (run, record) = telemetry.start_call(kwargs)
+            if run is None:
+                return create(self, *args, **kwargs)
+
+            started_at = time.perf_counter()
+            token = telemetry.current_call.set(record)
+            try:
+                response = create(self, *args, **kwargs)
+            except Exception as e:
+                telemetry.finish_call(run, record, started_at, kwargs, error=e)
+                raise
+            finally:
+                telemetry.current_call.reset(token)
+
+            if record.stream:
+                return RecordingStream(response, telemetry, run, record, started_at, kwargs)
+            telemetry.finish_call(run, record, started_at, kwargs, response=response)
+            return response
+
+        @wraps(acreate)
+        async def arecorded_create(self, *args, **kwargs):
+            (run, record) = telemetry.start_call(kwargs)
+            if run is None:
+                return await acreate(self, *args, **kwargs)
+
+            started_at = time.perf_counter()
+            token = telemetry.current_call.set(record)
+            try:
+                response = await acreate(self, *args, **kwargs)
+            except Exception as e:
+                telemetry.finish_call(run, record, started_at, kwargs, error=e)
+                raise
+            finally:
+                telemetry.current_call.reset(token)
+
+            if record.stream:
+                return AsyncRecordingStream(response, telemetry, run, record, started_at, kwargs)
+            telemetry.finish_call(run, record, started_at, kwargs, response=response)
+            return response
+
+        Completions.create = recorded_create # type: ignore
+        AsyncCompletions.create = arecorded_create # type: ignore
+
+        # Retries are counted from the client's logs, its retry loop is internal. The logger has to let info records
+        # through for that, the filter drops the ones below the level that was set before
+        retry_logger = logging.getLogger(RETRY_LOGGER_NAME)
+        retry_logger.addFilter(RetryCounter(self, retry_logger.getEffectiveLevel()))
+        retry_logger.setLevel(min(retry_logger.getEffectiveLevel(), logging.INFO))
+
+    @contextmanager
+    def run(self, name: str) -> Iterator[RunTelemetry]:
+        run = RunTelemetry(name)
+        run_token = self.current_run.set(run)
+        phase_token = self.current_phase.set(())
+        try:
+            yield run
+        finally:
+            run.duration_s = time.time() - run.started_at
+            self.current_phase.reset(phase_token)
+            self.current_run.reset(run_token)
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        token = self.current_phase.set(self.current_phase.get() + (name,))
+        try:
+            yield
+        finally:
+            self.current_phase.reset(token)
+
+    @contextmanager
+    def timing(self, stage: str) -> Iterator[None]:
+        # Unlike phases, stages measure wall time, including the time spent outside of LLM calls
+        run = self.current_run.get()
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            if run is not None:
+                run.add_timing(stage, time.perf_counter() - started_at)
+
+    @contextmanager
+    def tool(self, name: str) -> Iterator[None]:
+        run = self.current_run.get()
+        with self.phase(f"tool:{name}"):
+            record = ToolCallRecord(self.phase_name(), name)
+            started_at = time.perf_counter()
+            try:
+                yield
+            except Exception as e:
+                record.error = type(e).__name__
+                raise
+            finally:
+                record.latency_s = time.perf_counter() - started_at
+                if run is not None:
+                    run.add_tool_call(record)
+
+    def phase_name(self) -> str:
+        return "/".join(self.current_phase.get()) or "other"
+
+    def start_call(self, kwargs: dict[str, Any]) -> tuple[RunTelemetry | None, LlmCallRecord]:
+        phase = self.phase_name()
+        if any(kwargs.get(param) for param in TOOL_CALL_PARAMS):
+            phase += "/tool_call"
+        record = LlmCallRecord(phase, str(kwargs.get("model", "")), stream=bool(kwargs.get("stream")))
+        return (self.current_run.get(), record)
+
+    def count_retry(self):
+        record = self.current_call.get()
+        if record is not None:
+            record.retries += 1
+
+    def finish_call(
+        self,
+        run: RunTelemetry,
+        record: LlmCallRecord,
+        started_at: float,
+        kwargs: dict[str, Any],
+        response: Any = None,
+        usage: Any = None,
+        completion: str | None = None,
+        error: Exception | None = None,
+    ):
+        record.latency_s = time.perf_counter() - started_at
+        if error is not None:
+            record.error = type(error).__name__
+
+        if response is not None:
+            usage = response.usage
+            record.model = response.model or record.model
+            completion = "".join(choice.message.content or "" for choice in response.choices)
+
+        if usage is not None:
+            record.prompt_tokens = usage.prompt_tokens
+            record.completion_tokens = usage.completion_tokens
+        elif error is None:
+            record.estimated = True
+            record.prompt_tokens = count_tokens(json.dumps(kwargs.get("messages", []), default=str))
+            record.completion_tokens = count_tokens(completion or "")
+
+        record.cost_usd = get_cost(record.model, record.prompt_tokens, record.completion_tokens)
+        run.add_llm_call(record)
+
+class RetryCounter(logging.Filter):
+    def __init__(self, telemetry: LlmTelemetry, level: int):
+        super().__init__()
+        self.telemetry = telemetry
+        self.level = level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if isinstance(record.msg, str) and record.msg.startswith(RETRY_LOG_PREFIX):
+            self.telemetry.count_retry()
+        return record.levelno >= self.level
+
+class RecordingStream:
+    # Passes the chunks of a stream on, and records the call once the stream is exhausted or closed
+
+    def __init__(self, stream: Any, telemetry: LlmTelemetry, run: RunTelemetry, record: LlmCallRecord, started_at: float, kwargs: dict[str, Any]):
+        self.stream = stream
+        self.telemetry = telemetry
+        self.run = run
+        self.record = record
+        self.started_at = started_at
+        self.kwargs = kwargs
+        self.usage: Any = None
+        self.content: list[str] = []
+        self.finished = False
+
+    def add_chunk(self, chunk: Any):
+        if self.record.first_token_s is None:
+            self.record.first_token_s = time.perf_counter() - self.started_at
+        if chunk.model:
+            self.record.model = chunk.model
+        # Clients that don't know stream_options keep the usage of a chunk as a dict, see stream_params
+        usage = getattr(chunk, "usage", None)
+        if usage is not None:
+            self.usage = CompletionUsage.model_validate(usage) if isinstance(usage, dict) else usage
+        for choice in chunk.choices:
+            self.content.append(choice.delta.content or "")
+
+    def finish(self, error: Exception | None = None):
+        if self.finished:
+            return
+        self.finished = True
+        self.telemetry.finish_call(
+            self.run, self.record, self.started_at, self.kwargs, usage=self.usage, completion="".join(self.content), error=error
+        )
+
+    def __iter__(self):
+        try:
+            for chunk in self.stream:
+                self.add_chunk(chunk)
+                yield chunk
+        except Exception as e:
+            self.finish(error=e)
+            raise
+        self.finish()
+
+    def close(self):
+        self.stream.close()
+        self.finish()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.stream, name)
+
+class AsyncRecordingStream(RecordingStream):
+    async def __aiter__(self):
+        try:
+            async for chunk in self.stream:
+                self.add_chunk(chunk)
+                yield chunk
+        except Exception as e:
+            self.finish(error=e)
+            raise
+        self.finish()
+
+    async def close(self):
+        await self.stream.close()
+        self.finish()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+def get_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float | None:
+    prefixes = [prefix for prefix in MODEL_PRICES if model.startswith(prefix)]
+    if not prefixes:
+        return None
+
+    (prompt_price, completion_price) = MODEL_PRICES[max(prefixes, key=len)]
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+llm_telemetry = LlmTelemetry()
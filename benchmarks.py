@@ -1,9 +1,27 @@
+import csv
+import glob
+import itertools
+import json
+import math
+import random
 import subprocess
 import sys
 import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
+from queue import Queue
 import re
 
+# Every worker runs its tests against its own fork, on the port after the previous worker's
+WORKERS_BASE_PORT = 8600
+# Stages timed by the runs of a test, see llm_telemetry.timing
+STAGES = ["plan", "goal", "tasks", "agents", "transactions"]
+PERCENTILES = [50, 90, 99]
+# A test regressed if the difference is significant and, for latency, also large enough to matter
+SIGNIFICANCE_LEVEL = 0.05
+MIN_SLOWDOWN = 0.1
+PERMUTATIONS = 10000
+
 def collect_tests(test_path):
     """Collect tests from the specified path."""
     command = ['poetry', 'run', 'pytest', '--collect-only', '-q', test_path]
@@ -11,72 +29,328 @@ def collect_tests(test_path):
     tests = re.findall(r'^autotx\S+', result.stdout, re.MULTILINE)
     return tests
 
-def run_test(test_name, iterations, avg_time_across_tests, completed_tests, remaining_tests):
-    """Runs a specific test multiple times and captures the output and results."""
-    pass_count, fail_count = 0, 0
-    run_times = []
-
-    for iteration in range(1, iterations + 1):
-        cmd = f"poetry run pytest -s {test_name}"
-        start_time = datetime.now()
-        result = subprocess.run(cmd, capture_output=True, text=True, shell=True)
-        end_time = datetime.now()
-        duration = (end_time - start_time).total_seconds()
-        run_times.append(duration)
-
-        test_dir = f"{test_name.replace('/', '_').replace('::', '_')}"
-        iteration_dir = f"{output_dir}/{test_dir}/{'passes' if result.returncode == 0 else 'fails'}/{iteration}"
-        os.makedirs(iteration_dir, exist_ok=True)
-
-        with open(f"{iteration_dir}/stdout.txt", 'w') as f_out, open(f"{iteration_dir}/stderr.txt", 'w') as f_err:
-            f_out.write(result.stdout)
-            f_err.write(result.stderr)
-
-        if result.returncode == 0:
-            pass_count += 1
-        else:
-            fail_count += 1
-
-        # Estimate time after each iteration
-        avg_time_current_test = sum(run_times) / len(run_times)
-        remaining_iterations_current_test = iterations - iteration
-        remaining_time_current_test = avg_time_current_test * remaining_iterations_current_test
-
-        estimated_avg_time_across_tests = 0
-        if avg_time_across_tests:
-            estimated_avg_time_across_tests = (avg_time_across_tests * completed_tests + avg_time_current_test * iterations) / (completed_tests + 1)
-        else:
-            estimated_avg_time_across_tests = avg_time_current_test * iterations
-
-        estimated_time_left = remaining_time_current_test + (estimated_avg_time_across_tests * remaining_tests)
-        total_completion_time = datetime.now() + timedelta(seconds=estimated_time_left)
-
-        print(f"\nIteration {iteration}: {'Pass' if result.returncode == 0 else 'Fail'} in {duration:.2f} seconds")
-        print("=" * 50)
-        print(f"Estimated time until completion for all tests: {estimated_time_left/60:.2f} minutes")
-        print(f"Estimated completion time: {total_completion_time.strftime('%Y-%m-%d %H:%M:%S')}")
-        print("=" * 50)
-
-    return pass_count, fail_count, run_times
-
-def clear_lines(n=1):
-    """Clears a specified number of lines in the terminal."""
-    for _ in range(n):
-        sys.stdout.write('\x1b[1A')  # Move the cursor up by one line
-        sys.stdout.write('\x1b[2K')  # Clear the current line
-
-def print_summary_table(test_path, iterations, tests_results, total_run_time):
+def worker_env(worker):
+    """Environment of a worker's test runs: its own fork port and cache directory."""
+    cache_dir = os.path.abspath(f".cache/workers/{worker}")
+    return {
+        **os.environ,
+        "FORK_PORT": str(WORKERS_BASE_PORT + worker),
+        "CACHE_DIR": cache_dir,
+    }
+
+def run_iteration(test_name, iteration, worker):
+    """Runs one iteration of a test with a worker's environment and saves its output and telemetry."""
+    test_dir = f"{test_name.replace('/', '_').replace('::', '_')}"
+    telemetry_dir = os.path.abspath(f"{output_dir}/{test_dir}/telemetry/{iteration}")
+
+    cmd = f"poetry run pytest -s {test_name}"
+    start_time = datetime.now()
+    result = subprocess.run(cmd, capture_output=True, text=True, shell=True, env={**worker_env(worker), "LLM_TELEMETRY": "true", "LLM_TELEMETRY_DIR": telemetry_dir})
+    end_time = datetime.now()
+    duration = (end_time - start_time).total_seconds()
+
+    iteration_dir = f"{output_dir}/{test_dir}/{'passes' if result.returncode == 0 else 'fails'}/{iteration}"
+    os.makedirs(iteration_dir, exist_ok=True)
+
+    with open(f"{iteration_dir}/stdout.txt", 'w') as f_out, open(f"{iteration_dir}/stderr.txt", 'w') as f_err:
+        f_out.write(result.stdout)
+        f_err.write(result.stderr)
+
+    return {
+        'name': test_name,
+        'iteration': iteration,
+        'worker': worker,
+        'passed': result.returncode == 0,
+        'duration': duration,
+        **read_telemetry(telemetry_dir),
+    }
+
+def read_telemetry(telemetry_dir):
+    """Sums the telemetry of the AutoTx runs of a test iteration, a test can run several prompts."""
+    totals = {
+        'timings': {},
+        'llm_calls': 0,
+        'prompt_tokens': 0,
+        'completion_tokens': 0,
+        'cost_usd': 0.0,
+        'rpc_calls': 0,
+    }
+    for path in sorted(glob.glob(f"{telemetry_dir}/*.json")):
+        with open(path) as file:
+            run = json.load(file)
+        for (stage, duration) in run.get('timings', {}).items():
+            totals['timings'][stage] = totals['timings'].get(stage, 0) + duration
+        llm_totals = run['summary'].get('total', {})
+        totals['llm_calls'] += llm_totals.get('calls', 0)
+        totals['prompt_tokens'] += llm_totals.get('prompt_tokens', 0)
+        totals['completion_tokens'] += llm_totals.get('completion_tokens', 0)
+        totals['cost_usd'] += llm_totals.get('cost_usd') or 0
+        totals['rpc_calls'] += sum(run.get('rpc_calls', {}).values())
+    return totals
+
+def run_tests(tests, iterations, workers):
+    """Runs every iteration of every test, sharded across the workers. Returns the results of all iterations."""
+    jobs = [(test, iteration) for test in tests for iteration in range(1, iterations + 1)]
+    # A worker is only used by one test run at a time, its fork and cache are not shared
+    free_workers = Queue()
+    for worker in range(workers):
+        free_workers.put(worker)
+
+    def run_job(test, iteration):
+        worker = free_workers.get()
+        try:
+            return run_iteration(test, iteration, worker)
+        finally:
+            free_workers.put(worker)
+
+    results = []
+    start_time = datetime.now()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(run_job, test, iteration) for (test, iteration) in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+
+            # Estimate the time left from the wall time so far, which already accounts for the workers
+            elapsed = (datetime.now() - start_time).total_seconds()
+            estimated_time_left = elapsed / len(results) * (len(jobs) - len(results))
+            total_completion_time = datetime.now() + timedelta(seconds=estimated_time_left)
+
+            print(f"\n[{len(results)}/{len(jobs)}] {result['name']} iteration {result['iteration']}: {'Pass' if result['passed'] else 'Fail'} in {result['duration']:.2f} seconds (worker {result['worker']})")
+            print("=" * 50)
+            print(f"Estimated time until completion for all tests: {estimated_time_left/60:.2f} minutes")
+            print(f"Estimated completion time: {total_completion_time.strftime('%Y-%m-%d %H:%M:%S')}")
+            print("=" * 50)
+
+    return results
+
+def aggregate_results(tests, results):
+    """Aggregates the results of the iterations per test, in the order the tests were collected."""
+    tests_results = []
+    for test in tests:
+        test_iterations = sorted((result for result in results if result['name'] == test), key=lambda result: result['iteration'])
+        run_times = [result['duration'] for result in test_iterations]
+        pass_count = sum(1 for result in test_iterations if result['passed'])
+        avg_time = sum(run_times) / len(test_iterations) if test_iterations else 0
+
+        tests_results.append({
+            'name': test,
+            'passes': pass_count,
+            'fails': len(test_iterations) - pass_count,
+            'avg_time': avg_time,
+            **test_statistics(test_iterations),
+            'iterations': test_iterations,
+        })
+
+        test_dir = f"{test.replace('/', '_').replace('::', '_')}"
+        with open(f"{output_dir}/{test_dir}/results.txt", 'w') as result_file:
+            result_file.write(f"Test: {test}\n")
+            for result in test_iterations:
+                result_file.write(f"Iteration {result['iteration']}: {'Pass' if result['passed'] else 'Fail'} in {result['duration']:.2f} seconds\n")
+            result_file.write(f"Average Time: {avg_time:.2f}s\n")
+            result_file.write(f"Passes: {pass_count}, Fails: {len(test_iterations) - pass_count}\n")
+
+        print(f"\nEnded: {test}\n| Passes: {pass_count}, Fails: {len(test_iterations) - pass_count}, Avg Time: {avg_time:.2f}s |")
+
+    return tests_results
+
+def percentile(values, p):
+    """Percentile of the values, interpolated between the closest ranks."""
+    if not values:
+        return None
+    values = sorted(values)
+    rank = (len(values) - 1) * p / 100
+    lower = math.floor(rank)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (rank - lower)
+
+def distribution(values):
+    """Mean and percentiles of the values."""
+    return {
+        'mean': sum(values) / len(values) if values else None,
+        **{f"p{p}": percentile(values, p) for p in PERCENTILES},
+    }
+
+def test_statistics(test_iterations):
+    """Success rate, latency and stage percentiles, and mean LLM and RPC usage of the iterations of a test."""
+    count = len(test_iterations)
+    return {
+        'success_rate': sum(1 for result in test_iterations if result['passed']) / count if count else 0,
+        'latency': distribution([result['duration'] for result in test_iterations]),
+        # Stages are only timed in iterations that reached them
+        'stages': {
+            stage: distribution([result['timings'][stage] for result in test_iterations if stage in result['timings']])
+            for stage in STAGES
+            if any(stage in result['timings'] for result in test_iterations)
+        },
+        'llm_calls': sum(result['llm_calls'] for result in test_iterations) / count if count else 0,
+        'prompt_tokens': sum(result['prompt_tokens'] for result in test_iterations) / count if count else 0,
+        'completion_tokens': sum(result['completion_tokens'] for result in test_iterations) / count if count else 0,
+        'cost_usd': sum(result['cost_usd'] for result in test_iterations) / count if count else 0,
+        'rpc_calls': sum(result['rpc_calls'] for result in test_iterations) / count if count else 0,
+    }
+
+def write_results(test_path, iterations, workers, tests_results, total_run_time):
+    """Writes the results as JSON, with the statistics of every test, and as CSV, with a row per iteration."""
+    with open(f"{output_dir}/results.json", 'w') as results_file:
+        json.dump({
+            'run_from': test_path,
+            'iterations': iterations,
+            'workers': workers,
+            'total_run_time': total_run_time,
+            'tests': tests_results,
+        }, results_file, indent=2)
+
+    with open(f"{output_dir}/results.csv", 'w', newline='') as results_file:
+        writer = csv.writer(results_file)
+        writer.writerow(
+            ['test', 'iteration', 'worker', 'passed', 'duration', *[f"{stage}_time" for stage in STAGES],
+             'llm_calls', 'prompt_tokens', 'completion_tokens', 'cost_usd', 'rpc_calls']
+        )
+        for test_result in tests_results:
+            for result in test_result['iterations']:
+                writer.writerow(
+                    [result['name'], result['iteration'], result['worker'], result['passed'], f"{result['duration']:.3f}",
+                     *[f"{result['timings'][stage]:.3f}" if stage in result['timings'] else '' for stage in STAGES],
+                     result['llm_calls'], result['prompt_tokens'], result['completion_tokens'], f"{result['cost_usd']:.6f}", result['rpc_calls']]
+                )
+
+def load_results(benchmark_dir):
+    """Loads the results of a benchmark directory, by test name."""
+    path = f"{benchmark_dir}/results.json"
+    if not os.path.exists(path):
+        print(f"No results.json found in {benchmark_dir}, it was run before results were recorded as JSON.")
+        sys.exit(1)
+    with open(path) as results_file:
+        return {test_result['name']: test_result for test_result in json.load(results_file)['tests']}
+
+def slowdown_p_value(baseline, candidate):
+    """One-sided permutation test of the candidate values being higher than the baseline ones on average.
+
+    Every split of the values is tried when there are few, a random sample of splits otherwise."""
+    if not baseline or not candidate:
+        return 1.0
+
+    values = baseline + candidate
+    observed = sum(candidate) / len(candidate) - sum(baseline) / len(baseline)
+    indices = range(len(values))
+    if math.comb(len(values), len(candidate)) <= PERMUTATIONS:
+        splits = itertools.combinations(indices, len(candidate))
+    else:
+        rng = random.Random(0)
+        splits = (rng.sample(indices, len(candidate)) for _ in range(PERMUTATIONS))
+
+    total = 0
+    extreme = 0
+    for split in splits:
+        chosen = set(split)
+        candidate_mean = sum(values[i] for i in chosen) / len(candidate)
+        baseline_mean = sum(values[i] for i in indices if i not in chosen) / len(baseline)
+        total += 1
+        # Small tolerance so splits with the same difference as observed are counted despite rounding
+        if candidate_mean - baseline_mean >= observed - 1e-9:
+            extreme += 1
+    return extreme / total
+
+def success_drop_p_value(baseline_passes, baseline_count, candidate_passes, candidate_count):
+    """One-sided Fisher's exact test of the candidate passing less often than the baseline."""
+    total = baseline_count + candidate_count
+    passes = baseline_passes + candidate_passes
+    if total == 0 or candidate_count == 0:
+        return 1.0
+
+    def probability(candidate_passes):
+        return math.comb(passes, candidate_passes) * math.comb(total - passes, candidate_count - candidate_passes) / math.comb(total, candidate_count)
+
+    return sum(probability(x) for x in range(max(0, passes - baseline_count), candidate_passes + 1))
+
+def compare_tests(baseline_result, candidate_result):
+    """Lists the regressions of the candidate results of a test."""
+    regressions = []
+
+    baseline_count = baseline_result['passes'] + baseline_result['fails']
+    candidate_count = candidate_result['passes'] + candidate_result['fails']
+    p_value = success_drop_p_value(baseline_result['passes'], baseline_count, candidate_result['passes'], candidate_count)
+    if p_value < SIGNIFICANCE_LEVEL:
+        regressions.append(
+            f"success rate {baseline_result['success_rate']*100:.0f}% -> {candidate_result['success_rate']*100:.0f}% (p={p_value:.3f})"
+        )
+
+    def durations(test_result, stage):
+        if stage is None:
+            return [result['duration'] for result in test_result['iterations']]
+        return [result['timings'][stage] for result in test_result['iterations'] if stage in result['timings']]
+
+    for stage in [None, *STAGES]:
+        (baseline, candidate) = (durations(baseline_result, stage), durations(candidate_result, stage))
+        if not baseline or not candidate:
+            continue
+        baseline_mean = sum(baseline) / len(baseline)
+        candidate_mean = sum(candidate) / len(candidate)
+        slowdown = (candidate_mean - baseline_mean) / baseline_mean if baseline_mean else 0
+        p_value = slowdown_p_value(baseline, candidate)
+        if slowdown >= MIN_SLOWDOWN and p_value < SIGNIFICANCE_LEVEL:
+            regressions.append(
+                f"{stage or 'latency'} {baseline_mean:.2f}s -> {candidate_mean:.2f}s (+{slowdown*100:.0f}%, p={p_value:.3f})"
+            )
+
+    return regressions
+
+def compare(baseline_dir, candidate_dir):
+    """Prints the changes of every test between two benchmark directories. Returns whether any test regressed."""
+    baseline_results = load_results(baseline_dir)
+    candidate_results = load_results(candidate_dir)
+
+    print(f"Baseline: {baseline_dir}")
+    print(f"Candidate: {candidate_dir}")
+    print("=" * 50)
+    print("Test Name\tSuccess Rate\tP50\tP90\tLLM Tokens\tRPC Calls")
+    print("=" * 50)
+
+    regressed = False
+    for (name, candidate_result) in candidate_results.items():
+        baseline_result = baseline_results.get(name)
+        if baseline_result is None:
+            print(f"{name}\tonly in candidate")
+            continue
+
+        def change(key, format):
+            return f"{format(baseline_result[key])} -> {format(candidate_result[key])}"
+
+        def latency_change(p):
+            return f"{baseline_result['latency'][p]:.1f}s -> {candidate_result['latency'][p]:.1f}s"
+
+        tokens = lambda test_result: test_result['prompt_tokens'] + test_result['completion_tokens']
+        print(
+            f"{name}\t{change('success_rate', lambda rate: f'{rate*100:.0f}%')}\t{latency_change('p50')}\t{latency_change('p90')}"
+            f"\t{tokens(baseline_result):.0f} -> {tokens(candidate_result):.0f}\t{change('rpc_calls', lambda calls: f'{calls:.0f}')}"
+        )
+
+        for regression in compare_tests(baseline_result, candidate_result):
+            regressed = True
+            print(f"\tREGRESSION: {regression}")
+
+    for name in baseline_results:
+        if name not in candidate_results:
+            print(f"{name}\tonly in baseline")
+
+    print("=" * 50)
+    print("Regressions found." if regressed else "No regressions found.")
+    return regressed
+
+def print_summary_table(test_path, iterations, workers, tests_results, total_run_time):
     """Prints a summary table of all tests."""
-  
+
     print(f"Run from: {test_path}")
     print(f"Iterations: {iterations}")
+    print(f"Workers: {workers}")
     print("=" * 50)
-    print("Test Name\tSuccess Rate\tPasses\tFails\tAvg Time")
+    print("Test Name\tSuccess Rate\tPasses\tFails\tAvg Time\tP50\tP90\tP99")
     print("=" * 50)
     for test_result in tests_results:
         succes_rate = (test_result['passes'] / (test_result['passes'] + test_result['fails'])) * 100
         avg_time = f"{test_result['avg_time']:.0f}s" if test_result['avg_time'] < 60 else f"{test_result['avg_time']/60:.2f}m"
-        print(f"{test_result['name']}\t{succes_rate:.0f}%\t{test_result['passes']}\t{test_result['fails']}\t{avg_time}")
+        print(f"{test_result['name']}\t{succes_rate:.0f}%\t{test_result['passes']}\t{test_result['fails']}\t{avg_time}\t{format_percentiles(test_result)}")
 
     print("=" * 50 + "\n")
 
@@ -86,21 +360,30 @@ def print_summary_table(test_path, iterations, tests_results, total_run_time):
     with open(f"{output_dir}/summary.txt", 'w') as summary_file:
         summary_file.write(f"Run from: {test_path}\n")
         summary_file.write(f"Iterations: {iterations}\n")
+        summary_file.write(f"Workers: {workers}\n")
         summary_file.write("=" * 50 + "\n")
-        summary_file.write("Test Name\tSuccess Rate\tPasses\tFails\tAvg Time\n")
+        summary_file.write("Test Name\tSuccess Rate\tPasses\tFails\tAvg Time\tP50\tP90\tP99\n")
         summary_file.write("=" * 50 + "\n")
         for test_result in tests_results:
             succes_rate = (test_result['passes'] / (test_result['passes'] + test_result['fails'])) * 100
             avg_time = f"{test_result['avg_time']:.0f}s" if test_result['avg_time'] < 60 else f"{test_result['avg_time']/60:.2f}m"
-            summary_file.write(f"{test_result['name']}\t{succes_rate:.0f}%\t{test_result['passes']}\t{test_result['fails']}\t{avg_time}\n")
+            summary_file.write(f"{test_result['name']}\t{succes_rate:.0f}%\t{test_result['passes']}\t{test_result['fails']}\t{avg_time}\t{format_percentiles(test_result)}\n")
         summary_file.write(f"Total run time: {total_run_time/60:.2f} minutes\n\n")
 
+def format_percentiles(test_result):
+    return "\t".join(f"{test_result['latency'][f'p{p}']:.1f}s" for p in PERCENTILES)
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python benchmarks.py <path_to_test_file> <iterations>")
+    if len(sys.argv) == 4 and sys.argv[1] == "compare":
+        sys.exit(1 if compare(sys.argv[2], sys.argv[3]) else 0)
+
+    if len(sys.argv) not in [3, 4]:
+        print("Usage: python benchmarks.py <path_to_test_file> <iterations> [workers]")
+        print("       python benchmarks.py compare <baseline_benchmark_dir> <candidate_benchmark_dir>")
         sys.exit(1)
 
     test_path, iterations = sys.argv[1], int(sys.argv[2])
+    workers = int(sys.argv[3]) if len(sys.argv) == 4 else 1
     tests = collect_tests(test_path)
     if not tests:
         print("No tests found.")
@@ -117,42 +400,17 @@ if __name__ == "__main__":
     output_dir = f"benchmarks/{timestamp}"
     os.makedirs(output_dir, exist_ok=True)
 
-    total_tests = len(tests)
-    completed_tests = 0
-    total_run_time = 0
-    remaining_tests = total_tests
-    tests_results = []
-
-    for test in tests:
-        print(f"\nRunning: {test}")
-        avg_time_across_tests = total_run_time / completed_tests if completed_tests else 0
-        pass_count, fail_count, run_times = run_test(test, iterations, avg_time_across_tests, completed_tests, remaining_tests - 1)
-        test_time = sum(run_times)
-        total_run_time += test_time
-        completed_tests += 1
-        remaining_tests -= 1
-        avg_time = test_time / iterations if iterations else 0
+    start_time = datetime.now()
+    results = run_tests(tests, iterations, workers)
+    total_run_time = (datetime.now() - start_time).total_seconds()
 
-        tests_results.append({
-            'name': test,
-            'passes': pass_count,
-            'fails': fail_count,
-            'avg_time': avg_time
-        })
-
-        test_dir = f"{test.replace('/', '_').replace('::', '_')}"
-        with open(f"{output_dir}/{test_dir}/results.txt", 'w') as result_file:
-            result_file.write(f"Test: {test}\n")
-            for i, time in enumerate(run_times, 1):
-                result_file.write(f"Iteration {i}: {'Pass' if i <= pass_count else 'Fail'} in {time:.2f} seconds\n")
-            result_file.write(f"Average Time: {avg_time:.2f}s\n")
-            result_file.write(f"Passes: {pass_count}, Fails: {fail_count}\n")
-            
-        print(f"\nEnded: {test}\n| Passes: {pass_count}, Fails: {fail_count}, Avg Time: {avg_time:.2f}s |")
+    tests_results = aggregate_results(tests, results)
 
     print("\n" + "=" * 50)
     print("All tests completed.")
     print("=" * 50 + "\n")
-    print_summary_table(test_path, iterations, tests_results, total_run_time)
+    print_summary_table(test_path, iterations, workers, tests_results, total_run_time)
+    write_results(test_path, iterations, workers, tests_results, total_run_time)
     print(f"Completed at: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
     print(f"Summary written to: {output_dir}/summary.txt")
+    print(f"Results written to: {output_dir}/results.json and {output_dir}/results.csv")